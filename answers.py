@@ -0,0 +1,59 @@
+import datetime
+import random
+from array import array
+
+
+class AnswerSchedule:
+    """Which answer is the daily word on each date
+
+    Each date's pick comes from its own random.Random seeded with the date's
+    ordinal, which gives exactly the words the bot has always served (it used
+    to reseed the global random module the same way) without touching global
+    RNG state. Picks for a window of dates are precomputed as answer ids, so
+    lookups are an array read; dates outside it are computed on demand.
+    """
+
+    def __init__(self, answers):
+        self.answers = answers
+        self._first = 0  # Ordinal of the first precomputed date
+        self._ids = array('H')
+
+    @staticmethod
+    def pick(ordinal, count):
+        """Answer id for a date ordinal, from an isolated generator"""
+        return random.Random(ordinal).choice(range(count))
+
+    def precompute(self, days_back=366, days_ahead=5 * 366, today=None):
+        """Precompute the picks for a window of dates around today"""
+        today = today or datetime.date.today()
+        first = today.toordinal() - days_back
+        count = len(self.answers)
+        self._ids = array('H', (self.pick(ordinal, count) for ordinal in range(first, first + days_back + days_ahead + 1)))
+        self._first = first
+        return self
+
+    def answer_id(self, date):
+        index = date.toordinal() - self._first
+        if 0 <= index < len(self._ids):
+            return self._ids[index]
+        return self.pick(date.toordinal(), len(self.answers))
+
+    def word(self, date):
+        """Get the answer for a date"""
+        return self.answers[self.answer_id(date)]
+
+    def words_between(self, start, end):
+        """Get [(date, word)] for every date from start to end, inclusive"""
+        days = (end - start).days + 1
+        return [(start + datetime.timedelta(days=i), self.word(start + datetime.timedelta(days=i)))
+                for i in range(max(days, 0))]
+
+    def upcoming(self, days, start=None):
+        """Get the next days answers, starting today"""
+        start = start or datetime.date.today()
+        return self.words_between(start, start + datetime.timedelta(days=days - 1))
+
+    def past(self, days, end=None):
+        """Get the previous days answers, ending yesterday"""
+        end = end or datetime.date.today() - datetime.timedelta(days=1)
+        return self.words_between(end - datetime.timedelta(days=days - 1), end)
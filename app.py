@@ -1,66 +1,149 @@
 import discord
-from discord.ext import commands, tasks
-import random
+from discord.ext import commands
 import datetime
-import json
 import os
 import asyncio
+import aiohttp
 from dotenv import load_dotenv
+from answers import AnswerSchedule
+from diagnostics import LoopWatchdog, Profiler
+from feedback import FeedbackTable, render_feedback
+from game import WordleGame
+from leaderboards import LeaderboardIndex
+from metrics import SIZE_BUCKETS, Metrics
+from mockgateway import point_discord_at
+from rollups import FAIL, SCORES, RollupIndex
+from scheduler import DailySchedule, Job
+from sessions import KeyedLocks, RecentKeys, SessionManager
+from sharding import format_shard_ids, owns_guild, parse_shard_ids
+from solver import Solver, SolverWorkers
+from startup import StartupTimings, sync_command_tree
+from stats import PlayerStats, backfill_guild_stats, combine_stats
+from storage import open_storage
+from usernames import UsernameResolver
+from words import WordIndex
 
 # Load environment variables
 load_dotenv()
 
+STARTUP = StartupTimings()  # Phase timings, logged once setup is done
+
 # Get admin user ID from environment variable
 ADMIN_USER_ID = int(os.getenv('ADMIN_USER_ID', 0))
 
+# Handler, task and data write timings, served in Prometheus format when METRICS_PORT is set
+metrics = Metrics()
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
 
-# official wordle list
+# Sharding: SHARD_COUNT unset runs one gateway connection; a number (or "auto" for Discord's
+# recommendation) runs that many shards in this process. SHARD_IDS, set by sharding.py for each
+# worker process, limits this process to those shards and the guilds on them.
+SHARD_COUNT = os.getenv('SHARD_COUNT')
+SHARD_IDS = parse_shard_ids(os.getenv('SHARD_IDS'))
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(command_prefix='!', intents=intents,
+                                  shard_count=None if SHARD_COUNT == 'auto' else int(SHARD_COUNT),
+                                  shard_ids=SHARD_IDS, http_trace=metrics.http_trace())
+else:
+    bot = commands.Bot(command_prefix='!', intents=intents, http_trace=metrics.http_trace())
+
+# Local testing against mockgateway.py instead of Discord
+if os.getenv('DISCORD_API_URL'):
+    point_discord_at(os.getenv('DISCORD_API_URL'), os.getenv('DISCORD_GATEWAY_URL'))
+
+# official wordle list, packed into a memory-mapped index (rebuilt when the text files change)
 try:
-    with open("wordle-answers-alphabetical.txt") as f:
-        ANSWER_WORDS = [line.strip() for line in f]
-    
-    with open("wordle-allowed-guesses.txt") as f:
-        VALID_GUESSES = set(line.strip() for line in f)
+    with STARTUP.phase("word index"):
+        WORDS = WordIndex("word_index.bin", "wordle-answers-alphabetical.txt", "wordle-allowed-guesses.txt").open()
 except FileNotFoundError:
     print("Error: Word list files not found!")
     print("Make sure wordle-answers-alphabetical.txt and wordle-allowed-guesses.txt are uploaded")
     exit(1)
 
-ALL_VALID_WORDS = set(ANSWER_WORDS).union(VALID_GUESSES)
+ANSWER_WORDS = WORDS.answers  # In answer list order, so the daily word picks are unchanged
+with STARTUP.phase("answer schedule"):
+    ANSWER_SCHEDULE = AnswerSchedule(ANSWER_WORDS).precompute()  # Date -> daily word, years ahead
 
-# Game storage with proper daily results
-active_games = {}  # Maps user ID to game data
-daily_results = {}  # Maps guild_id -> {date: {user_id: result}}
-guild_settings = {}  # Maps guild_id -> {channel_id: str, streak_count: int, last_streak_date: str}
-user_stats = {}  # Maps user_id -> {games_played, games_won, guess_distribution, current_streak, max_streak, total_time, first_guesses}
-DATA_FILE = "wordle_data.json"
+# Feedback codes for every guess x answer, memory-mapped from a cache file (built on first run)
+with STARTUP.phase("feedback table"):
+    FEEDBACK_TABLE = FeedbackTable.for_word_index(WORDS, "feedback_table.bin").open()
+# Hint rankings run in SOLVER_PROCESSES worker processes (0 to rank in the bot's own process)
+SOLVER_PROCESSES = int(os.getenv('SOLVER_PROCESSES', 2))
+SOLVER = Solver(FEEDBACK_TABLE, cache_path="solver_cache.json",
+                workers=SolverWorkers(WORDS, FEEDBACK_TABLE, "solver_cache.json", SOLVER_PROCESSES) if SOLVER_PROCESSES else None)
 
-def load_data():
-    """Load saved game data"""
-    global daily_results, guild_settings, user_stats
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
-                daily_results = data.get('daily_results', {})
-                guild_settings = data.get('guild_settings', {})
-                user_stats = data.get('user_stats', {})
-        except:
-            daily_results = {}
-            guild_settings = {}
-            user_stats = {}
-
-def save_data():
-    """Save game data"""
-    with open(DATA_FILE, 'w') as f:
-        json.dump({
-            'daily_results': daily_results,
-            'guild_settings': guild_settings,
-            'user_stats': user_stats
-        }, f, indent=2)
+# In-progress games by user ID, dropped when idle and snapshotted so they survive restarts
+active_games = SessionManager(ttl=int(os.getenv('GAME_TTL_SECONDS', 1800)),
+                              max_sessions=int(os.getenv('MAX_ACTIVE_GAMES', 10000)),
+                              snapshot_path=f"active_games.shards-{format_shard_ids(SHARD_IDS)}.json"
+                              if SHARD_IDS else "active_games.json")  # One snapshot per worker process
+# Persistent data lives behind the storage backend (see storage.py), which may be shared with other bot processes:
+#   results per guild -> date -> user_id, guild settings {channel_id, streak_count, last_streak_date, streak_checked},
+#   user stats {games_played, games_won, guess_distribution, current_streak, max_streak, total_time, first_guesses}
+with STARTUP.phase("open storage"):
+    storage = open_storage(os.getenv('STORAGE_BACKEND', 'json'),
+                           path=os.getenv('STORAGE_PATH'),
+                           flush_interval_ms=int(os.getenv('DATA_FLUSH_INTERVAL_MS', 500)),
+                           compact_after=int(os.getenv('DATA_COMPACT_AFTER', 1000)))
+username_resolver = UsernameResolver(bot, storage)
+leaderboard_index = LeaderboardIndex(storage)
+daily_rollups = RollupIndex(storage)
+
+def record_data_flush(records, encode_seconds, write_seconds, size):
+    """Time and size of each background data write"""
+    metrics.observe("data_flush_records", records, buckets=(1, 10, 100, 1000, 10000), help_text="Rows per data write")
+    metrics.observe("data_encode_seconds", encode_seconds, help_text="Event loop time spent encoding a data write")
+    metrics.observe("data_write_seconds", write_seconds, help_text="Time to write (and fsync) a data write")
+    metrics.observe("data_write_bytes", size, buckets=SIZE_BUCKETS, help_text="Bytes per data write")
+
+storage.writer.on_flush = record_data_flush
+
+def on_shared_change(row):
+    """Another bot process changed a shared row: refresh what this one built from it"""
+    if row[0] == 'results':
+        daily_rollups.invalidate(row[1], row[2])
+    elif row[0] == 'guild_stats':
+        # The row was already re-read into storage's cache, so this doesn't wait on the store
+        asyncio.create_task(leaderboard_index.refresh(row[1], row[2]))
+
+storage.on_invalidate = on_shared_change  # Only called by shared backends (memory, redis)
+metrics.gauge("active_games", lambda: len(active_games), "Games in progress")
+metrics.gauge("guilds", lambda: len(bot.guilds), "Servers the bot is in")
+metrics.gauge("users", lambda: sum(guild.member_count or 0 for guild in bot.guilds), "Members across those servers")
+metrics.gauge("data_file_bytes", storage.disk_size, "Size of the data files on disk")
+
+# Logs the stack (and handler) whenever something blocks the event loop past the threshold
+loop_watchdog = LoopWatchdog(threshold=int(os.getenv('LOOP_LAG_THRESHOLD_MS', 250)) / 1000,
+                             on_lag=lambda lag: metrics.observe("event_loop_lag_seconds", lag,
+                                                                help_text="How late the loop heartbeat woke up"))
+metrics.gauge("event_loop_stalls", lambda: loop_watchdog.stalls, "Times the event loop was blocked past the threshold")
+profiler = Profiler()  # On-demand CPU / memory capture for /profile6403
+
+def shard_status():
+    """{shard id: (connected, heartbeat latency)} for the shards this process runs"""
+    if isinstance(bot, commands.AutoShardedBot):
+        return {shard_id: (not shard.is_closed(), shard.latency) for shard_id, shard in bot.shards.items()}
+    return {0: (bot.is_ready() and not bot.is_closed(), bot.latency)}
+
+metrics.gauge("shard_up", lambda: {i: int(up) for i, (up, _) in shard_status().items()},
+              "Whether each shard's gateway connection is open", label="shard")
+metrics.gauge("shard_latency_seconds", lambda: {i: latency for i, (_, latency) in shard_status().items()},
+              "Gateway heartbeat latency per shard", label="shard")
+
+# Guesses and give ups on one user's game run one at a time; different users never wait on each other
+game_locks = KeyedLocks(max_keys=int(os.getenv('MAX_ACTIVE_GAMES', 10000)))
+# Recently handled interaction ids, so an interaction Discord delivers twice is only acted on once
+handled_interactions = RecentKeys(max_size=10000)
+
+def first_delivery(interaction, handler):
+    """Whether an interaction is new, rather than a repeat of one already handled"""
+    if handled_interactions.first_time(interaction.id):
+        return True
+    metrics.inc("duplicate_interactions_total", {'handler': handler},
+                help_text="Interactions delivered again and ignored")
+    return False
 
 def get_today_string():
     """Get today's date as string"""
@@ -71,302 +154,175 @@ def get_yesterday_string():
     yesterday = datetime.date.today() - datetime.timedelta(days=1)
     return yesterday.strftime("%Y-%m-%d")
 
-def update_streak(guild_id):
-    """Update the streak count for a guild"""
+async def advance_streak(guild_id, create=False):
+    """Bring a guild's streak up to date, at most once per guild per day
+    
+    The streak counts consecutive days, up to yesterday, on which someone in
+    the guild finished the Wordle. It only has to be worked out once a day:
+    after that (settings['streak_checked'] == today) this is a dict lookup.
+    Returns the guild's settings, or None if it has none and create is False.
+    """
     guild_id = str(guild_id)
     today = get_today_string()
     yesterday = get_yesterday_string()
     
-    if guild_id not in guild_settings:
-        guild_settings[guild_id] = {'streak_count': 0, 'last_streak_date': None, 'channel_id': None}
-    
-    # Ensure all keys exist
-    if 'streak_count' not in guild_settings[guild_id]:
-        guild_settings[guild_id]['streak_count'] = 0
-    if 'last_streak_date' not in guild_settings[guild_id]:
-        guild_settings[guild_id]['last_streak_date'] = None
-    if 'channel_id' not in guild_settings[guild_id]:
-        guild_settings[guild_id]['channel_id'] = None
-    
-    # Check if anyone completed yesterday's Wordle
-    if (guild_id in daily_results and 
-        yesterday in daily_results[guild_id] and 
-        len(daily_results[guild_id][yesterday]) > 0):
-        
-        # If this is the first day or consecutive day, increment streak
-        if (guild_settings[guild_id]['last_streak_date'] is None or 
-            guild_settings[guild_id]['last_streak_date'] == get_date_string_days_ago(2)):
-            guild_settings[guild_id]['streak_count'] += 1
-        else:
-            # Reset streak if there was a gap
-            guild_settings[guild_id]['streak_count'] = 1
-        
-        guild_settings[guild_id]['last_streak_date'] = yesterday
-    else:
-        # No one played yesterday, reset streak
-        if guild_settings[guild_id]['last_streak_date'] == get_date_string_days_ago(2):
-            # Streak was broken yesterday
-            guild_settings[guild_id]['streak_count'] = 0
-            guild_settings[guild_id]['last_streak_date'] = None
-    
-    save_data()
+    settings = storage.get_guild_settings(guild_id)
+    if settings is not None and settings.get('streak_checked') == today:
+        return settings
+    if settings is None and not create:
+        return None
+    
+    played_yesterday = None
+    if settings is None or settings.get('last_streak_date') != yesterday:
+        played_yesterday = len(await storage.get_results(guild_id, yesterday)) > 0
+        # Another call may have brought the streak up to date while the results were read
+        settings = storage.get_guild_settings(guild_id)
+        if settings is not None and settings.get('streak_checked') == today:
+            return settings
+    if settings is None:
+        settings = {'streak_count': 0, 'last_streak_date': None, 'channel_id': None}
+    
+    last_streak_date = settings.get('last_streak_date')
+    if last_streak_date != yesterday:
+        if played_yesterday:
+            # Extend the streak if it reached the day before yesterday, otherwise start over
+            if last_streak_date == get_date_string_days_ago(2):
+                settings['streak_count'] = settings.get('streak_count', 0) + 1
+            else:
+                settings['streak_count'] = 1
+            settings['last_streak_date'] = yesterday
+        elif last_streak_date is not None or settings.get('streak_count'):
+            # No one played yesterday, so the streak is broken
+            settings['streak_count'] = 0
+            settings['last_streak_date'] = None
+    
+    settings['streak_checked'] = today
+    storage.put_guild_settings(guild_id, settings)
+    return settings
+
+async def roll_over_streaks(catch_up=False):
+    """Advance every guild's streak for the new day in one pass, then write them all at once"""
+    advanced = 0
+    for guild_id, settings in list(storage.all_guild_settings().items()):
+        # Other worker processes roll over the guilds on their shards
+        if settings.get('streak_checked') != get_today_string() and owns_guild(bot, guild_id):
+            await advance_streak(guild_id)
+            advanced += 1
+    await storage.flush()
+    print(f"Advanced streaks for {advanced} servers")
 
 def get_date_string_days_ago(days):
     """Get date string for N days ago"""
     target_date = datetime.date.today() - datetime.timedelta(days=days)
     return target_date.strftime("%Y-%m-%d")
 
-def update_user_stats(user_id, won, guesses, first_guess, game_time=None):
-    """Update user statistics after a game"""
+async def update_user_stats(guild_id, user_id, won, guesses, first_guess, game_time=None):
+    """Update a user's statistics in a guild after a game"""
+    guild_id = str(guild_id)
     user_id = str(user_id)
     
-    if user_id not in user_stats:
-        user_stats[user_id] = {
-            'games_played': 0,
-            'games_won': 0,
-            'guess_distribution': {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0, '6': 0},
-            'current_streak': 0,
-            'max_streak': 0,
-            'total_time': 0,
-            'first_guesses': {},
-            'average_guesses': 0.0,
-            'last_played': None
-        }
-    
-    stats = user_stats[user_id]
-    stats['games_played'] += 1
-    
-    if won:
-        stats['games_won'] += 1
-        stats['guess_distribution'][str(guesses)] += 1
-        
-        # Update streak
-        today = get_today_string()
-        yesterday = get_yesterday_string()
-        
-        if stats['last_played'] == yesterday or stats['last_played'] is None:
-            stats['current_streak'] += 1
-        else:
-            stats['current_streak'] = 1
-        
-        if stats['current_streak'] > stats['max_streak']:
-            stats['max_streak'] = stats['current_streak']
-    else:
-        stats['current_streak'] = 0
-    
-    stats['last_played'] = get_today_string()
+    today = get_today_string()
     
-    # Track first guess patterns
-    if first_guess in stats['first_guesses']:
-        stats['first_guesses'][first_guess] += 1
-    else:
-        stats['first_guesses'][first_guess] = 1
+    def record_game(stats):
+        stats = stats or PlayerStats()
+        stats.record(won, guesses, game_time, today)
+        return stats
     
-    # Update average guesses (only for won games)
-    if stats['games_won'] > 0:
-        total_guesses = sum(int(k) * v for k, v in stats['guess_distribution'].items())
-        stats['average_guesses'] = round(total_guesses / stats['games_won'], 2)
+    # Read-modify-write as one atomic update, since other bot processes may share the data
+    stats = await storage.update_guild_stats(guild_id, user_id, record_game)
+    leaderboard_index.record(guild_id, user_id, stats)
     
-    if game_time:
-        stats['total_time'] += game_time
+    # Track first guess patterns (kept per user rather than per server)
+    def count_first_guess(user_data):
+        user_data = user_data or {}
+        first_guesses = user_data.setdefault('first_guesses', {})
+        first_guesses[first_guess] = first_guesses.get(first_guess, 0) + 1
+        return user_data
     
-    save_data()
+    await storage.update_user_stats(user_id, count_first_guess)
 
-def get_keyboard_display(guesses):
-    """Generate a clean visual keyboard that works properly in Discord"""
-    keyboard_layout = [
-        ['Q', 'W', 'E', 'R', 'T', 'Y', 'U', 'I', 'O', 'P'],
-        ['A', 'S', 'D', 'F', 'G', 'H', 'J', 'K', 'L'],
-        ['Z', 'X', 'C', 'V', 'B', 'N', 'M']
-    ]
-    
-    letter_status = {}  # Track best status for each letter
-    
-    # Analyze all guesses to determine letter status
-    for guess, feedback in guesses:
-        for i, letter in enumerate(guess.upper()):
-            if feedback[i] == "🟩":  # Correct position
-                letter_status[letter] = "🟩"
-            elif feedback[i] == "🟨" and letter_status.get(letter) != "🟩":  # Wrong position but in word
-                letter_status[letter] = "🟨"
-            elif feedback[i] == "⬜" and letter not in letter_status:  # Not in word
-                letter_status[letter] = "⬜"
-    
-    # Build visual keyboard display
-    keyboard_display = ""
-    for row in keyboard_layout:
-        row_display = ""
-        for letter in row:
-            if letter in letter_status:
-                if letter_status[letter] == "🟩":
-                    row_display += f"🟩{letter} "  # Green background
-                elif letter_status[letter] == "🟨":
-                    row_display += f"🟨{letter} "  # Yellow background
-                else:  # ⬜
-                    row_display += f"⬜{letter} "  # Gray background
-            else:
-                row_display += f"⬛{letter} "  # Black background (unused)
-        keyboard_display += row_display.rstrip() + "\n"
-
-    
-    return keyboard_display
+async def get_user_overview(user_id):
+    """Get a user's overall stats, combined from every server they play in"""
+    user_id = str(user_id)
+    user_data = await storage.get_user_stats(user_id) or {}
+    guild_stats = await storage.user_guild_stats(user_id)
+    return combine_stats(list(guild_stats.values()), user_data.get('first_guesses'))
 
 def get_daily_word():
     """Get today's word"""
-    today = datetime.date.today()
-    random.seed(today.toordinal())
-    word = random.choice(ANSWER_WORDS)
-    random.seed()
-    return word
+    return ANSWER_SCHEDULE.word(datetime.date.today())
 
 def get_feedback(guess, answer):
-    """Get Wordle feedback"""
-    feedback = []
-    answer_chars = list(answer.lower())
-    guess_chars = list(guess.lower())
-    
-    # First pass: mark correct positions
-    for i in range(5):
-        if guess_chars[i] == answer_chars[i]:
-            feedback.append("🟩")
-            answer_chars[i] = None
-            guess_chars[i] = None
-        else:
-            feedback.append(None)
-    
-    # Second pass: mark wrong positions
-    for i in range(5):
-        if feedback[i] is None:
-            if guess_chars[i] in answer_chars:
-                feedback[i] = "🟨"
-                answer_chars[answer_chars.index(guess_chars[i])] = None
-            else:
-                feedback[i] = "⬜"
-    
-    return "".join(feedback)
-
-class WordleGame:
-    def __init__(self, answer, user_id, guild_id):
-        self.answer = answer.lower()
-        self.guesses = []
-        self.max_guesses = 6
-        self.completed = False
-        self.won = False
-        self.user_id = user_id
-        self.guild_id = guild_id
-        self.start_time = datetime.datetime.now()
-    
-    def make_guess(self, guess):
-        guess = guess.lower()
-        if len(guess) != 5:
-            return False, "Guess must be 5 letters!"
-        
-        if guess in [g[0] for g in self.guesses]:
-            return False, "You already guessed that word!"
-        
-        feedback = get_feedback(guess, self.answer)
-        self.guesses.append((guess, feedback))
-        
-        if guess == self.answer:
-            self.completed = True
-            self.won = True
-        elif len(self.guesses) >= self.max_guesses:
-            self.completed = True
-            self.won = False
-        
-        return True, feedback
-    
-    def get_board_display(self):
-        board = ""
-        for guess, feedback in self.guesses:
-            board += f"`{guess.upper()}` {feedback}\n"
-        
-        # Add empty rows
-        for i in range(len(self.guesses), self.max_guesses):
-            board += "`_____` ⬜⬜⬜⬜⬜\n"
-        
-        return board
-    
-    def get_enhanced_board_display(self):
-        """Enhanced board display with progress indicators"""
-        board = ""
-        for i, (guess, feedback) in enumerate(self.guesses):
-            board += f"**{i+1}.** `{guess.upper()}` {feedback}\n"
-        
-        # Add empty rows with numbers
-        for i in range(len(self.guesses), self.max_guesses):
-            board += f"**{i+1}.** `_____` ⬜⬜⬜⬜⬜\n"
-        
-        return board
-    
-    def get_game_time(self):
-        """Get time spent on the game in seconds"""
-        if self.completed:
-            return (datetime.datetime.now() - self.start_time).total_seconds()
-        return 0
-    
-    def get_result_string(self):
-        """Get the shareable result string like real Wordle"""
-        if not self.completed:
-            return None
-        
-        result = f"Better Wordle {get_today_string()} "
-        if self.won:
-            result += f"{len(self.guesses)}/6\n\n"
-        else:
-            result += "X/6\n\n"
-        
-        # Add just the emoji grid
-        for guess, feedback in self.guesses:
-            result += feedback + "\n"
-        
-        return result
+    """Get the Wordle feedback code for a guess (render it with render_feedback)"""
+    return FEEDBACK_TABLE.code(guess.lower(), answer.lower())
 
-async def post_daily_summary(guild_id):
-    """Post yesterday's results and current streak"""
+async def post_daily_summary(guild_id, job=None):
+    """Post yesterday's results and current streak, returning why if nothing was posted"""
     guild_id = str(guild_id)
     yesterday = get_yesterday_string()
     
-    # Update streak before posting
-    update_streak(guild_id)
-    
-    # Get channel to post in
-    if (guild_id not in guild_settings or 
-        guild_settings[guild_id].get('channel_id') is None):
-        return  # No channel set
+    # Get channel to post in (the streak is brought up to date on the way)
+    settings = await advance_streak(guild_id)
+    if settings is None or settings.get('channel_id') is None:
+        return "no channel set"
     
-    channel_id = guild_settings[guild_id]['channel_id']
+    channel_id = settings['channel_id']
     channel = bot.get_channel(int(channel_id))
     if not channel:
-        return
+        return "channel not found"
+    
+    async def send(embed):
+        # Sent through the summary job when there is one, for rate limiting and retries
+        if job is None:
+            await channel.send(embed=embed)
+        else:
+            await job.call(lambda: channel.send(embed=embed))
     
     # Get yesterday's word
     yesterday_date = datetime.date.today() - datetime.timedelta(days=1)
-    random.seed(yesterday_date.toordinal())
-    yesterday_word = random.choice(ANSWER_WORDS).upper()
-    random.seed()
+    yesterday_word = ANSWER_SCHEDULE.word(yesterday_date).upper()
     
     # Get yesterday's results
-    if (guild_id not in daily_results or 
-        yesterday not in daily_results[guild_id] or 
-        len(daily_results[guild_id][yesterday]) == 0):
+    rollup = await daily_rollups.get(guild_id, yesterday)
+    if rollup.players == 0:
         # No one played yesterday
         embed = discord.Embed(title="📊 Daily Better Wordle Summary", color=0xED4245)
         embed.add_field(name="💔 No Activity Yesterday", 
                        value=f"No one completed yesterday's Better Wordle! 😔\n**Yesterday's word was: {yesterday_word}**\nStreak broken.", 
                        inline=False)
         embed.set_footer(text=f"Date: {yesterday}")
-        await channel.send(embed=embed)
-        return
+        await send(embed)
+        return None
     
-    results_data = daily_results[guild_id][yesterday]
-    streak_count = guild_settings[guild_id].get('streak_count', 0)
+    # Built from the day's running totals, and only rebuilt if a result came in since
+    streak_count = settings.get('streak_count', 0)
+    embed = rollup.memo(('summary', streak_count, yesterday_word),
+                        lambda: get_summary_embed(rollup, yesterday, yesterday_word, streak_count))
     
+    await send(embed)
+    return None
+
+def fit_lines(lines, limit=1024):
+    """Join lines for an embed field, leaving out the last ones if they don't fit"""
+    text = "\n".join(lines)
+    if len(text) <= limit:
+        return text
+    kept = []
+    size = 0
+    for i, line in enumerate(lines):
+        note = f"…and {len(lines) - i} more"
+        if size + len(line) + 1 + len(note) > limit:
+            return "\n".join(kept + [note])
+        kept.append(line)
+        size += len(line) + 1
+
+def get_summary_embed(rollup, date, word, streak_count):
+    """Daily summary embed for a guild's rollup of one day"""
     # Create the enhanced summary embed
     embed = discord.Embed(title="📊 Daily Better Wordle Summary", color=0x5865F2)
     
     # Add yesterday's word
-    embed.add_field(name="🎯 Yesterday's Word", value=f"**{yesterday_word}**", inline=False)
+    embed.add_field(name="🎯 Yesterday's Word", value=f"**{word}**", inline=False)
     
     # Add streak info
     if streak_count > 0:
@@ -378,27 +334,14 @@ async def post_daily_summary(guild_id):
                        value="Here's how everyone did:", 
                        inline=False)
     
-    # Sort results by performance (like the image)
-    sorted_results = sorted(results_data.items(), 
-                           key=lambda x: (not x[1]['won'], x[1]['guesses'] if x[1]['won'] else 999))
-    
-    # Group by score
-    score_groups = {}
-    for user_id, result in sorted_results:
-        if result['won']:
-            score = f"{result['guesses']}/6"
-        else:
-            score = "X/6"
-        
-        if score not in score_groups:
-            score_groups[score] = []
-        score_groups[score].append(result['username'])
-    
     # Format like the image: "👑 4/6: @User1 @User2"
     result_lines = []
-    for score in ["1/6", "2/6", "3/6", "4/6", "5/6", "6/6", "X/6"]:
-        if score in score_groups:
-            users = " • ".join([f"**{name}**" for name in score_groups[score]])
+    for index, score in enumerate(SCORES):
+        names, more = rollup.score_names(index)
+        if names:
+            users = " • ".join([f"**{name}**" for name in names])
+            if more:
+                users += f" +{more} more"
             if score == "1/6":
                 result_lines.append(f"👑 {score}: {users}")
             elif score == "2/6":
@@ -408,61 +351,106 @@ async def post_daily_summary(guild_id):
             else:
                 result_lines.append(f"✅ {score}: {users}")
     
-    embed.add_field(name="🏆 Results", value="\n".join(result_lines), inline=False)
+    embed.add_field(name="🏆 Results", value=fit_lines(result_lines), inline=False)
     
     # Add enhanced stats
-    total_players = len(results_data)
-    winners = sum(1 for r in results_data.values() if r['won'])
-    
-    # Calculate average guesses for winners
-    total_guesses = sum(r['guesses'] for r in results_data.values() if r['won'])
-    avg_guesses = round(total_guesses / winners, 1) if winners > 0 else 0
-    
-    # Find fastest solver if time data exists
-    fastest_time = None
-    fastest_player = None
-    for user_id, result in results_data.items():
-        if result['won'] and 'game_time' in result and result['game_time'] < 300:  # Less than 5 minutes
-            if fastest_time is None or result['game_time'] < fastest_time:
-                fastest_time = result['game_time']
-                fastest_player = result['username']
-    
-    stats_text = f"**Players:** {total_players} | **Success Rate:** {round(winners/total_players*100)}%"
-    if avg_guesses > 0:
-        stats_text += f" | **Avg Guesses:** {avg_guesses}"
-    if fastest_player:
+    stats_text = f"**Players:** {rollup.players} | **Success Rate:** {round(rollup.wins/rollup.players*100)}%"
+    if rollup.average_guesses > 0:
+        stats_text += f" | **Avg Guesses:** {rollup.average_guesses}"
+    if rollup.fastest_player:
+        fastest_time = rollup.fastest_time
         time_str = f"{int(fastest_time // 60)}m {int(fastest_time % 60)}s" if fastest_time >= 60 else f"{int(fastest_time)}s"
-        stats_text += f"\n⚡ **Fastest:** {fastest_player} ({time_str})"
+        stats_text += f"\n⚡ **Fastest:** {rollup.fastest_player} ({time_str})"
     
     embed.add_field(name="📈 Stats", value=stats_text, inline=False)
     
-    embed.set_footer(text=f"Date: {yesterday} • Use /betterwordle to play today!")
+    embed.set_footer(text=f"Date: {date} • Use /betterwordle to play today!")
+    return embed
+
+def is_retryable_error(error):
+    """Whether a failed Discord request is safe to send again
     
-    await channel.send(embed=embed)
+    discord.py has already retried 429s and 5xx errors by the time one gets
+    here, and a message may have been posted despite the error, as after a
+    timeout or a dropped connection. Only a connection that was never made
+    means nothing was sent.
+    """
+    return isinstance(error, aiohttp.ClientConnectorError)
 
-@tasks.loop(hours=24)
-async def daily_summary_task():
-    """Task that runs daily to post summaries"""
-    # Post summary for all guilds that have it enabled
-    for guild_id in guild_settings:
-        if guild_settings[guild_id].get('channel_id'):
-            try:
-                await post_daily_summary(guild_id)
-            except Exception as e:
-                print(f"Error posting daily summary for guild {guild_id}: {e}")
+@metrics.instrument("daily_summary_guild")
+async def daily_summary_worker(guild_id, job):
+    """Post one guild's summary and remember that it's done, so a restarted run skips it"""
+    reason = await post_daily_summary(guild_id, job)
+    if reason is None:
+        settings = storage.get_guild_settings(guild_id)
+        settings['last_summary_date'] = get_yesterday_string()
+        storage.put_guild_settings(guild_id, settings)
+    return reason
+
+summary_job = Job("Daily summary", daily_summary_worker,
+                  concurrency=int(os.getenv('SUMMARY_CONCURRENCY', 10)),
+                  rate_per_second=int(os.getenv('SUMMARY_RATE_PER_SECOND', 25)),
+                  retryable=is_retryable_error)
+
+@metrics.instrument("daily_summaries")
+async def run_daily_summaries(catch_up=False):
+    """Post summaries for every guild that has them enabled and hasn't had today's yet
+    
+    On startup (catch_up) only guilds that have had a summary before are
+    included, which resumes a run that was interrupted without surprising
+    guilds that only just turned summaries on.
+    """
+    yesterday = get_yesterday_string()
+    guild_ids = []
+    for guild_id, settings in list(storage.all_guild_settings().items()):
+        if not settings.get('channel_id') or settings.get('last_summary_date') == yesterday:
+            continue
+        if not owns_guild(bot, guild_id):
+            continue  # Posted by the worker process running this guild's shard
+        if catch_up and settings.get('last_summary_date') is None:
+            continue
+        guild_ids.append(guild_id)
+    
+    if guild_ids or not catch_up:
+        await summary_job.run(yesterday, guild_ids)
+
+# Runs at 12:01 AM every day, plus once at startup to finish any interrupted run
+daily_summary_schedule = DailySchedule(0, 1, run_daily_summaries)
 
-@daily_summary_task.before_loop
-async def before_daily_summary():
-    """Wait until bot is ready before starting the task"""
-    await bot.wait_until_ready()
+# A rerun started from /jobs5310, kept so the task isn't garbage collected mid-run
+summary_rerun_task = None
+
+async def rerun_daily_summaries():
+    """Run the daily summaries outside the schedule"""
+    try:
+        await run_daily_summaries()
+    except Exception as e:
+        print(f"Error rerunning daily summaries: {e}")
+
+# Streaks move on at midnight; anything missed is caught up at startup or on first use
+streak_rollover_schedule = DailySchedule(0, 0, roll_over_streaks)
+
+def get_progress_embed(game, title="🎯 Better Wordle"):
+    """Board, keyboard and progress of a game in progress"""
+    embed = discord.Embed(title=title, color=0x2F3136)
+    embed.add_field(name="📋 Your Progress", value=game.get_enhanced_board_display(), inline=False)
     
-    # Calculate time until next midnight (or a specific time like 12:01 AM)
-    now = datetime.datetime.now()
-    next_run = now.replace(hour=0, minute=1, second=0, microsecond=0) + datetime.timedelta(days=1)
+    # Add keyboard display
+    if game.num_guesses > 0:
+        embed.add_field(name="⌨️ Keyboard", value=f"```\n{game.keyboard.render()}\n```", inline=False)
     
-    # Wait until then
-    wait_seconds = (next_run - now).total_seconds()
-    await asyncio.sleep(wait_seconds)
+    embed.add_field(name=f"📊 Progress: {game.num_guesses}/{game.max_guesses}", value="\u200b", inline=False)
+    return embed
+
+async def add_game_analysis(embed, game, user_id):
+    """Add the skill & luck report to an end-of-game embed, returning whether it was added"""
+    try:
+        analysis = await asyncio.wait_for(game.get_analysis_display(), timeout=10)
+    except Exception as e:
+        print(f"Error analysing game for user {user_id}: {e!r}")
+        return False
+    embed.add_field(name="🧠 Skill & Luck", value=analysis, inline=False)
+    return True
 
 class GuessModal(discord.ui.Modal, title='Make a Guess'):
     def __init__(self, game):
@@ -476,12 +464,15 @@ class GuessModal(discord.ui.Modal, title='Make a Guess'):
         min_length=5,
     )
 
+    @metrics.instrument("guess_submit")
     async def on_submit(self, interaction: discord.Interaction):
+        if not first_delivery(interaction, "guess_submit"):
+            return
         user_id = interaction.user.id
         guess_word = self.guess.value.lower()
         
         # Validate the guess
-        if guess_word not in ALL_VALID_WORDS:
+        if guess_word not in WORDS:
             # Send a clear error message instead of another modal
             try:
                 await interaction.response.send_message(
@@ -496,6 +487,21 @@ class GuessModal(discord.ui.Modal, title='Make a Guess'):
                 )
             return
         
+        # A second submit for the same game (two open modals, a double click) waits for this one
+        async with game_locks.hold(user_id):
+            await self.play_guess(interaction, guess_word)
+    
+    async def play_guess(self, interaction, guess_word):
+        """Make a valid guess and show the board; called holding the game's lock"""
+        user_id = interaction.user.id
+        if self.game.completed or active_games.get(user_id) is not self.game:
+            # The game finished, was given up or expired while this modal was open
+            try:
+                await interaction.response.send_message("This game is already over. Use `/betterwordle` to see your result!", ephemeral=True)
+            except discord.errors.InteractionResponded:
+                await interaction.followup.send("This game is already over.", ephemeral=True)
+            return
+        
         success, feedback = self.game.make_guess(guess_word)
         
         if not success:
@@ -505,61 +511,56 @@ class GuessModal(discord.ui.Modal, title='Make a Guess'):
                 await interaction.followup.send(feedback, ephemeral=True)
             return
         
-        # Create the updated board display
-        embed = discord.Embed(title="🎯 Better Wordle", color=0x2F3136)
-        embed.add_field(name="📋 Your Progress", value=self.game.get_enhanced_board_display(), inline=False)
+        # Rate the guess in the background so the end-of-game analysis is ready instantly
+        self.game.rate_guesses()
+        active_games.touch(user_id)
         
-        # Add keyboard display
-        if len(self.game.guesses) > 0:
-            keyboard = get_keyboard_display(self.game.guesses)
-            embed.add_field(name="⌨️ Keyboard", value=f"```\n{keyboard}\n```", inline=False)
-        
-        embed.add_field(name=f"📊 Progress: {len(self.game.guesses)}/{self.game.max_guesses}", value="\u200b", inline=False)
+        # Create the updated board display
+        embed = get_progress_embed(self.game)
         
         # Show the guess that was just made with better formatting
         embed.add_field(name="✅ Valid Guess!", 
-                       value=f"**'{guess_word.upper()}'** {feedback}", 
+                       value=f"**'{guess_word.upper()}'** {render_feedback(feedback)}", 
                        inline=False)
         
         if self.game.completed:
             # Calculate game time
             game_time = self.game.get_game_time()
-            
-            # Update user statistics
-            first_guess = self.game.guesses[0][0] if self.game.guesses else None
-            update_user_stats(user_id, self.game.won, len(self.game.guesses), first_guess, game_time)
+            guild_id = str(self.game.guild_id)
             
             # Save result to daily results
-            guild_id = str(self.game.guild_id)
             today = get_today_string()
             
-            if guild_id not in daily_results:
-                daily_results[guild_id] = {}
-            if today not in daily_results[guild_id]:
-                daily_results[guild_id][today] = {}
-            
-            daily_results[guild_id][today][str(user_id)] = {
+            result = {
                 'won': self.game.won,
-                'guesses': len(self.game.guesses),
+                'guesses': self.game.num_guesses,
                 'result_string': self.game.get_result_string(),
                 'username': interaction.user.display_name,
                 'game_time': round(game_time)
             }
-            save_data()
+            # Only the first result of the day counts, even if another bot process recorded it
+            if await storage.add_result(guild_id, today, str(user_id), result):
+                daily_rollups.record(guild_id, today, result)
+                
+                # Update user statistics
+                first_guess = self.game.guesses[0][0] if self.game.num_guesses else None
+                await update_user_stats(guild_id, user_id, self.game.won, self.game.num_guesses, first_guess, game_time)
+            username_resolver.remember(guild_id, user_id, interaction.user.display_name)
+            await advance_streak(guild_id, create=True)  # First result of a new day moves the streak on
             
             if self.game.won:
                 # Different colors and messages based on performance
-                if len(self.game.guesses) == 1:
+                if self.game.num_guesses == 1:
                     embed.add_field(name="🤯 INCREDIBLE!", value="Got it in 1 guess! Are you psychic?! 🔮", inline=False)
                     embed.color = 0xFFD700  # Gold
-                elif len(self.game.guesses) <= 2:
-                    embed.add_field(name="🏆 AMAZING!", value=f"Solved in {len(self.game.guesses)} guesses! Brilliant! ⭐", inline=False)
+                elif self.game.num_guesses <= 2:
+                    embed.add_field(name="🏆 AMAZING!", value=f"Solved in {self.game.num_guesses} guesses! Brilliant! ⭐", inline=False)
                     embed.color = 0xFFD700  # Gold
-                elif len(self.game.guesses) <= 4:
-                    embed.add_field(name="🎉 Great job!", value=f"Solved in {len(self.game.guesses)} guesses! Well done! 👏", inline=False)
+                elif self.game.num_guesses <= 4:
+                    embed.add_field(name="🎉 Great job!", value=f"Solved in {self.game.num_guesses} guesses! Well done! 👏", inline=False)
                     embed.color = 0x57F287  # Green
                 else:
-                    embed.add_field(name="✅ Nice work!", value=f"Got it in {len(self.game.guesses)} guesses! 🎯", inline=False)
+                    embed.add_field(name="✅ Nice work!", value=f"Got it in {self.game.num_guesses} guesses! 🎯", inline=False)
                     embed.color = 0x5865F2  # Blue
                 
                 # Add time info if reasonable
@@ -571,79 +572,175 @@ class GuessModal(discord.ui.Modal, title='Make a Guess'):
                 embed.color = 0xED4245  # Red
             
             # Remove the game from active games
-            if user_id in active_games:
-                del active_games[user_id]
+            active_games.remove(user_id)
+            
+            # Answer straight away; if the last guesses are still being rated, the analysis is edited in after
+            analysis_ready = self.game.analysis_ready()
+            if analysis_ready:
+                await add_game_analysis(embed, self.game, user_id)
             
             try:
                 await interaction.response.edit_message(embed=embed, view=None)
             except discord.errors.InteractionResponded:
                 await interaction.edit_original_response(embed=embed, view=None)
+            
+            if not analysis_ready and await add_game_analysis(embed, self.game, user_id):
+                try:
+                    await interaction.edit_original_response(embed=embed)
+                except discord.HTTPException as e:
+                    print(f"Error adding analysis for user {user_id}: {e}")
         else:
-            view = WordleView(self.game)
+            # The message keeps its buttons; leaving out view stops discord.py tracking a view per message
             try:
-                await interaction.response.edit_message(embed=embed, view=view)
+                await interaction.response.edit_message(embed=embed)
             except discord.errors.InteractionResponded:
-                await interaction.edit_original_response(embed=embed, view=view)
+                await interaction.edit_original_response(embed=embed)
 
 class WordleView(discord.ui.View):
-    def __init__(self, game):
-        super().__init__(timeout=300)
-        self.game = game
+    """Game buttons; persistent (stable custom_ids, no timeout) so they keep working after a restart"""
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    async def get_game(self, interaction):
+        """Get the clicking user's game, telling them if it is gone"""
+        game = active_games.get(interaction.user.id)
+        if game is None or game.completed:
+            await interaction.response.send_message("This game has expired. Use `/betterwordle` to start again!", ephemeral=True)
+            return None
+        return game
 
-    @discord.ui.button(label='Make Guess', style=discord.ButtonStyle.primary, emoji='✏️')
+    @classmethod
+    def buttons(cls):
+        """The game buttons for a new message
+        
+        Clicks are routed by custom_id to the one WordleView registered at
+        startup, so the message gets a stopped view: discord.py sends its
+        buttons but doesn't keep it around, which it otherwise would for as
+        long as the message lives.
+        """
+        view = cls()
+        view.stop()
+        return view
+
+    @discord.ui.button(label='Make Guess', style=discord.ButtonStyle.primary, emoji='✏️', custom_id='betterwordle:guess')
+    @metrics.instrument("guess_button")
     async def make_guess(self, interaction: discord.Interaction, button: discord.ui.Button):
-        modal = GuessModal(self.game)
+        game = await self.get_game(interaction)
+        if game is None:
+            return
+        modal = GuessModal(game)
         await interaction.response.send_modal(modal)
     
-    @discord.ui.button(label='Give Up', style=discord.ButtonStyle.danger, emoji='❌')
+    @discord.ui.button(label='Give Up', style=discord.ButtonStyle.danger, emoji='❌', custom_id='betterwordle:give_up')
+    @metrics.instrument("give_up_button")
     async def give_up(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if not first_delivery(interaction, "give_up_button"):
+            return
         user_id = interaction.user.id
-        
-        embed = discord.Embed(title="🎯 Better Wordle - Game Over", color=0xED4245)
-        embed.add_field(name="You gave up!", value=f"The word was: **{self.game.answer.upper()}**", inline=False)
-        embed.add_field(name="Your Progress", value=self.game.get_board_display(), inline=False)
-        
-        # Remove the game from active games
-        if user_id in active_games:
-            del active_games[user_id]
-        
-        await interaction.response.edit_message(embed=embed, view=None)
+        # Not while a guess on the same game is being handled
+        async with game_locks.hold(user_id):
+            game = await self.get_game(interaction)
+            if game is None:
+                return
+            
+            embed = discord.Embed(title="🎯 Better Wordle - Game Over", color=0xED4245)
+            embed.add_field(name="You gave up!", value=f"The word was: **{game.answer.upper()}**", inline=False)
+            embed.add_field(name="Your Progress", value=game.get_board_display(), inline=False)
+            
+            # Remove the game from active games; its guesses don't need rating anymore
+            active_games.remove(user_id)
+            game.close()
+            
+            await interaction.response.edit_message(embed=embed, view=None)
+
+async def setup_hook():
+    """Runs once, after login and before connecting to the gateway"""
+    with STARTUP.phase("load data"), metrics.timer("data_load_seconds", help_text="Time to load saved data"):
+        storage.load()  # Load saved data
+        if not await storage.has_guild_stats():
+            # First start with per-server stats: build them from saved results
+            backfill_guild_stats(storage)
+    storage.start()
+    
+    # Bring back games that were in progress before a restart; their buttons keep working
+    with STARTUP.phase("restore games"):
+        restored = active_games.restore(lambda data: WordleGame.from_snapshot(data, SOLVER, get_today_string()))
+        bot.add_view(WordleView())
+    active_games.start()
+    print(f"Restored {restored} active games")
+    
+    loop_watchdog.start()
+    
+    streak_rollover_schedule.start()
+    
+    # Compute (or load) the opening hint ranking before anyone asks for it
+    asyncio.create_task(SOLVER.run(SOLVER.warm))
+    
+    # Syncing is a rate-limited call, so only sync when the commands changed, and from one worker
+    if SHARD_IDS is None or 0 in SHARD_IDS:
+        try:
+            with STARTUP.phase("command sync"):
+                synced = await sync_command_tree(bot.tree, bot.application_id, "command_tree_hash.txt",
+                                                 force=os.getenv('FORCE_COMMAND_SYNC') == '1')
+            print(f'Synced {synced} commands' if synced is not None else 'Commands unchanged, skipped sync')
+        except Exception as e:
+            print(f'Failed to sync: {e}')
+    
+    metrics_port = os.getenv('METRICS_PORT')
+    if metrics_port:
+        try:
+            await metrics.start_server(os.getenv('METRICS_HOST', '127.0.0.1'), int(metrics_port))
+            print(f"Serving metrics on port {metrics_port}")
+        except Exception as e:
+            print(f"Failed to start metrics server: {e}")
+    
+    print(STARTUP.summary())
+
+bot.setup_hook = setup_hook
 
 @bot.event
 async def on_ready():
+    # Runs again after every reconnect; everything that must happen once is in setup_hook
     print(f'Bot logged in as {bot.user}')
     
-    load_data()  # Load saved data
-    
-    # Start the daily summary task
-    if not daily_summary_task.is_running():
-        daily_summary_task.start()
-        print("Daily summary task started")
-    
-    # Simple sync - just try to sync and don't worry about complications
-    try:
-        synced = await bot.tree.sync()
-        print(f'Synced {len(synced)} commands')
-    except Exception as e:
-        print(f'Failed to sync: {e}')
+    # Start the daily summary schedule once channels are cached
+    if not daily_summary_schedule.is_running():
+        daily_summary_schedule.start()
+        print("Daily summary schedule started")
+
+@bot.event
+async def on_shard_ready(shard_id):
+    print(f"Shard {shard_id} ready")
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    print(f"Shard {shard_id} disconnected")
+
+@bot.event
+async def on_shard_resumed(shard_id):
+    print(f"Shard {shard_id} resumed")
 
 @bot.tree.command(name="betterwordle", description="Start a new Better Wordle game!")
+@metrics.instrument("betterwordle")
 async def betterwordle(interaction: discord.Interaction):
     user_id = interaction.user.id
     guild_id = interaction.guild_id
     
-    # Check if user already has an active game
-    if user_id in active_games:
-        await interaction.response.send_message("You already have an active game! Finish it first or use the 'Give Up' button.", ephemeral=True)
+    # Look up today's result first, so nothing waits between checking for a game and starting one
+    today = get_today_string()
+    result = await storage.get_result(str(guild_id), today, str(user_id))
+    
+    # If user already has an active game, show it again so they can carry on
+    game = active_games.get(user_id)
+    if game is not None:
+        active_games.touch(user_id)
+        embed = get_progress_embed(game, title="🎯 Better Wordle - Resuming your game")
+        await interaction.response.send_message(embed=embed, view=WordleView.buttons(), ephemeral=True)
         return
     
     # Check if user already completed today's Wordle
-    today = get_today_string()
-    if (str(guild_id) in daily_results and 
-        today in daily_results[str(guild_id)] and 
-        str(user_id) in daily_results[str(guild_id)][today]):
+    if result is not None:
         
-        result = daily_results[str(guild_id)][today][str(user_id)]
         embed = discord.Embed(title="🎯 Already Completed!", color=0x5865F2)
         embed.add_field(name="You've already played today!", 
                        value=f"Your result:\n```\n{result['result_string']}\n```", inline=False)
@@ -654,13 +751,13 @@ async def betterwordle(interaction: discord.Interaction):
     
     # Get today's word
     word = get_daily_word()
-    game = WordleGame(word, user_id, guild_id)
-    active_games[user_id] = game
+    game = WordleGame(word, user_id, guild_id, SOLVER, today)
+    active_games.add(user_id, game)
     
     # Create initial embed with enhanced design
     embed = discord.Embed(title="🎯 Better Wordle - Daily Challenge", color=0x5865F2)
     embed.add_field(name="📋 Your Progress", value=game.get_enhanced_board_display(), inline=False)
-    embed.add_field(name=f"📊 Progress: {len(game.guesses)}/{game.max_guesses}", value="\u200b", inline=False)
+    embed.add_field(name=f"📊 Progress: {game.num_guesses}/{game.max_guesses}", value="\u200b", inline=False)
     embed.add_field(name="🎮 How to Play", 
                    value="Click **'Make Guess'** to enter your 5-letter word!\n" +
                          "🟩 = Correct letter and position\n" +
@@ -672,61 +769,90 @@ async def betterwordle(interaction: discord.Interaction):
                    inline=False)
     embed.set_footer(text="💡 Tip: Common starting words include ADIEU, SLATE, or CRANE!")
     
-    view = WordleView(game)
-    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+    await interaction.response.send_message(embed=embed, view=WordleView.buttons(), ephemeral=True)
 
 # Removed /play command - redundant with /wordlebot
 
 # Removed /guess command - using interactive UI instead
 
+@bot.tree.command(name="hint", description="Get a hint for your current Better Wordle game")
+@metrics.instrument("hint")
+async def hint(interaction: discord.Interaction):
+    game = active_games.get(interaction.user.id)
+    if game is None or game.completed:
+        await interaction.response.send_message("You don't have an active game! Use `/betterwordle` to start one.", ephemeral=True)
+        return
+    
+    active_games.touch(interaction.user.id)
+    
+    # Ranking can take a moment on big candidate sets, so answer the interaction first
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    remaining, suggestions = await SOLVER.run(SOLVER.hint, game.guesses)
+    
+    embed = discord.Embed(title="💡 Better Wordle Hint", color=0xFEE75C)
+    embed.add_field(name="🔎 Possible Answers", 
+                   value=f"**{remaining}** word{'s' if remaining != 1 else ''} still fit your clues", 
+                   inline=False)
+    if suggestions:
+        lines = [f"**{word.upper()}** - {bits:.2f} bits" for word, bits in suggestions]
+        embed.add_field(name="🧠 Best Next Guesses", value="\n".join(lines), inline=False)
+    embed.set_footer(text="Bits = expected information gained. Higher narrows it down more!")
+    
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
 @bot.tree.command(name="results", description="View today's Wordle results for this server")
+@metrics.instrument("results")
 async def results(interaction: discord.Interaction):
     guild_id = str(interaction.guild_id)
     today = get_today_string()
     
     embed = discord.Embed(title=f"📊 Daily Better Wordle Results - {today}", color=0x5865F2)
     
-    if guild_id not in daily_results or today not in daily_results[guild_id]:
+    rollup = await daily_rollups.get(guild_id, today)
+    if rollup.players == 0:
         embed.add_field(name="No Results Yet", value="No one has completed today's Better Wordle yet!\nUse `/betterwordle` to start playing!", inline=False)
         await interaction.response.send_message(embed=embed)
         return
     
-    results_data = daily_results[guild_id][today]
-    
-    # Sort by completion status, then by number of guesses
-    sorted_results = sorted(results_data.items(), key=lambda x: (not x[1]['won'], x[1]['guesses'] if x[1]['won'] else 999))
+    embed = rollup.memo('results', lambda: get_results_embed(rollup, today))
+    await interaction.response.send_message(embed=embed)
+
+def get_results_embed(rollup, date):
+    """Results embed for a guild's rollup of one day"""
+    embed = discord.Embed(title=f"📊 Daily Better Wordle Results - {date}", color=0x5865F2)
     
+    # Winners by number of guesses, then failures, each in finishing order
     completed_users = []
     failed_users = []
     
-    for user_id, result in sorted_results:
-        username = result['username']
-        if result['won']:
-            completed_users.append(f"✅ **{username}** - {result['guesses']}/6")
-        else:
-            failed_users.append(f"❌ **{username}** - X/6")
+    for index, score in enumerate(SCORES):
+        names, more = rollup.score_names(index)
+        lines = failed_users if index == FAIL else completed_users
+        emoji = "❌" if index == FAIL else "✅"
+        lines.extend(f"{emoji} **{name}** - {score}" for name in names)
+        if more:
+            lines.append(f"{emoji} +{more} more - {score}")
     
     if completed_users:
-        embed.add_field(name="✅ Completed", value="\n".join(completed_users), inline=True)
+        embed.add_field(name="✅ Completed", value=fit_lines(completed_users), inline=True)
     
     if failed_users:
-        embed.add_field(name="❌ Failed", value="\n".join(failed_users), inline=True)
+        embed.add_field(name="❌ Failed", value=fit_lines(failed_users), inline=True)
     
-    total_players = len(results_data)
-    completed_count = len(completed_users)
-    success_rate = round((completed_count / total_players) * 100) if total_players > 0 else 0
+    success_rate = round((rollup.wins / rollup.players) * 100) if rollup.players > 0 else 0
     
     embed.add_field(name="📈 Server Stats", 
-                   value=f"**Players:** {total_players}\n**Success Rate:** {success_rate}%", 
+                   value=f"**Players:** {rollup.players}\n**Success Rate:** {success_rate}%", 
                    inline=False)
-    
-    await interaction.response.send_message(embed=embed)
+    return embed
 
 @bot.tree.command(name="mystats", description="View your personal Better Wordle statistics")
+@metrics.instrument("mystats")
 async def my_stats(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     
-    if user_id not in user_stats or user_stats[user_id]['games_played'] == 0:
+    stats = await get_user_overview(user_id)
+    if stats['games_played'] == 0:
         embed = discord.Embed(title="📊 Your Better Wordle Stats", color=0x5865F2)
         embed.add_field(name="No Games Yet!", 
                        value="You haven't played any games yet!\nUse `/betterwordle` to start your first game! 🎯", 
@@ -734,8 +860,6 @@ async def my_stats(interaction: discord.Interaction):
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
     
-    stats = user_stats[user_id]
-    
     # Calculate win percentage
     win_percentage = round((stats['games_won'] / stats['games_played']) * 100) if stats['games_played'] > 0 else 0
     
@@ -796,6 +920,7 @@ async def my_stats(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="leaderboard", description="View the server leaderboard")
+@metrics.instrument("leaderboard")
 async def leaderboard(interaction: discord.Interaction, category: str = "winrate"):
     """
     Show server leaderboard
@@ -803,13 +928,10 @@ async def leaderboard(interaction: discord.Interaction, category: str = "winrate
     """
     guild_id = str(interaction.guild_id)
     
-    # Get all users who have played in this server
-    server_players = set()
-    if guild_id in daily_results:
-        for date_results in daily_results[guild_id].values():
-            server_players.update(date_results.keys())
+    # Players who have played in this server, kept ranked as results come in
+    board = await leaderboard_index.guild(guild_id)
     
-    if not server_players:
+    if not board.members:
         embed = discord.Embed(title="� Server Leaderboard", color=0x5865F2)
         embed.add_field(name="No Players Yet!", 
                        value="No one has played Better Wordle in this server yet!\nUse `/betterwordle` to be the first! 🎯", 
@@ -817,24 +939,7 @@ async def leaderboard(interaction: discord.Interaction, category: str = "winrate
         await interaction.response.send_message(embed=embed)
         return
     
-    # Filter users who have stats and played in this server
-    valid_players = []
-    for user_id in server_players:
-        if user_id in user_stats and user_stats[user_id]['games_played'] > 0:
-            stats = user_stats[user_id]
-            try:
-                user = await bot.fetch_user(int(user_id))
-                username = user.display_name if user else f"User {user_id[:8]}"
-            except:
-                username = f"User {user_id[:8]}"
-            
-            valid_players.append({
-                'user_id': user_id,
-                'username': username,
-                'stats': stats
-            })
-    
-    if not valid_players:
+    if board.count("games") == 0:
         embed = discord.Embed(title="📈 Server Leaderboard", color=0x5865F2)
         embed.add_field(name="No Stats Available", 
                        value="No players have enough data for the leaderboard yet!", 
@@ -842,47 +947,39 @@ async def leaderboard(interaction: discord.Interaction, category: str = "winrate
         await interaction.response.send_message(embed=embed)
         return
     
-    # Sort based on category
-    if category.lower() == "winrate":
-        # Sort by win rate, then by games played
-        valid_players.sort(key=lambda x: (
-            (x['stats']['games_won'] / x['stats']['games_played']) * 100 if x['stats']['games_played'] > 0 else 0,
-            x['stats']['games_played']
-        ), reverse=True)
+    category = category.lower()
+    if category == "winrate":
+        # Ranked by win rate, then by games played
         title = "📈 Leaderboard - Win Rate"
-        
-    elif category.lower() == "streak":
-        # Sort by max streak, then current streak
-        valid_players.sort(key=lambda x: (x['stats']['max_streak'], x['stats']['current_streak']), reverse=True)
+    elif category == "streak":
+        # Ranked by max streak, then current streak
         title = "🔥 Leaderboard - Best Streaks"
-        
-    elif category.lower() == "games":
-        # Sort by games played
-        valid_players.sort(key=lambda x: x['stats']['games_played'], reverse=True)
+    elif category == "games":
+        # Ranked by games played
         title = "🎮 Leaderboard - Most Active"
-        
-    elif category.lower() == "average":
-        # Sort by average guesses (lower is better, but only for players with wins)
-        players_with_wins = [p for p in valid_players if p['stats']['games_won'] > 0]
-        players_with_wins.sort(key=lambda x: x['stats']['average_guesses'])
-        valid_players = players_with_wins
+    elif category == "average":
+        # Ranked by average guesses (lower is better, only players with wins)
         title = "🎯 Leaderboard - Best Average"
-        
     else:
         category = "winrate"  # Default fallback
-        valid_players.sort(key=lambda x: (
-            (x['stats']['games_won'] / x['stats']['games_played']) * 100 if x['stats']['games_played'] > 0 else 0,
-            x['stats']['games_played']
-        ), reverse=True)
         title = "📈 Leaderboard - Win Rate"
     
+    top_players = [{'user_id': user_id, 'stats': await storage.get_guild_stats(guild_id, user_id)}
+                   for user_id in board.top(category, 10)]
+    
     embed = discord.Embed(title=title, color=0x5865F2)
     
+    # Only the top 10 need names: caches and stored results first, the API for anyone left
+    usernames, missing = await username_resolver.lookup(interaction.guild, guild_id, [p['user_id'] for p in top_players])
+    if missing:
+        await interaction.response.defer()
+        usernames.update(await username_resolver.fetch(guild_id, missing))
+    
     # Show top 10 players
     leaderboard_text = ""
-    for i, player in enumerate(valid_players[:10]):
+    for i, player in enumerate(top_players):
         stats = player['stats']
-        username = player['username']
+        username = usernames[player['user_id']]
         
         if i == 0:
             rank_emoji = "👑"
@@ -893,18 +990,18 @@ async def leaderboard(interaction: discord.Interaction, category: str = "winrate
         else:
             rank_emoji = f"**{i+1}.**"
         
-        if category.lower() == "winrate":
-            win_rate = round((stats['games_won'] / stats['games_played']) * 100) if stats['games_played'] > 0 else 0
-            leaderboard_text += f"{rank_emoji} **{username}** - {win_rate}% ({stats['games_won']}/{stats['games_played']})\n"
+        if category == "winrate":
+            win_rate = round((stats.games_won / stats.games_played) * 100) if stats.games_played > 0 else 0
+            leaderboard_text += f"{rank_emoji} **{username}** - {win_rate}% ({stats.games_won}/{stats.games_played})\n"
             
-        elif category.lower() == "streak":
-            leaderboard_text += f"{rank_emoji} **{username}** - Best: {stats['max_streak']}, Current: {stats['current_streak']}\n"
+        elif category == "streak":
+            leaderboard_text += f"{rank_emoji} **{username}** - Best: {stats.max_streak}, Current: {stats.current_streak}\n"
             
-        elif category.lower() == "games":
-            leaderboard_text += f"{rank_emoji} **{username}** - {stats['games_played']} games played\n"
+        elif category == "games":
+            leaderboard_text += f"{rank_emoji} **{username}** - {stats.games_played} games played\n"
             
-        elif category.lower() == "average":
-            leaderboard_text += f"{rank_emoji} **{username}** - {stats['average_guesses']} avg guesses\n"
+        elif category == "average":
+            leaderboard_text += f"{rank_emoji} **{username}** - {stats.average_guesses} avg guesses\n"
     
     embed.add_field(name="🏆 Top Players", value=leaderboard_text or "No data available", inline=False)
     
@@ -917,11 +1014,15 @@ async def leaderboard(interaction: discord.Interaction, category: str = "winrate
                          "• `average` - Best average guesses", 
                    inline=False)
     
-    embed.set_footer(text=f"Showing data from {len(valid_players)} players")
+    embed.set_footer(text=f"Showing data from {board.count(category)} players")
     
-    await interaction.response.send_message(embed=embed)
+    if interaction.response.is_done():
+        await interaction.followup.send(embed=embed)
+    else:
+        await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="debug2847", description="System diagnostic tool")
+@metrics.instrument("debug2847")
 async def debug_word_check(interaction: discord.Interaction):
     # Whitelist of authorized user IDs
     AUTHORIZED_USERS = [
@@ -944,14 +1045,12 @@ async def debug_word_check(interaction: discord.Interaction):
     embed.add_field(name="📅 Date", value=today, inline=True)
     embed.add_field(name="🎯 Today's Word", value=f"**{word.upper()}**", inline=True)
     embed.add_field(name="💡 Debug Info", 
-                   value=f"Word length: {len(word)}\nIs valid answer: {word.lower() in ANSWER_WORDS}\nIs valid guess: {word.lower() in ALL_VALID_WORDS}", 
+                   value=f"Word length: {len(word)}\nIs valid answer: {word.lower() in ANSWER_WORDS}\nIs valid guess: {word.lower() in WORDS}", 
                    inline=False)
     
     # Show how many people have played today
     guild_id = str(interaction.guild_id)
-    today_players = 0
-    if guild_id in daily_results and today in daily_results[guild_id]:
-        today_players = len(daily_results[guild_id][today])
+    today_players = len(await storage.get_results(guild_id, today))
     
     embed.add_field(name="📊 Today's Activity", 
                    value=f"Players who completed today: {today_players}", 
@@ -962,6 +1061,7 @@ async def debug_word_check(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="reset1947", description="System cache reset utility")
+@metrics.instrument("reset1947")
 async def reset_cache(interaction: discord.Interaction):
     # Whitelist of authorized user IDs
     AUTHORIZED_USERS = [
@@ -977,25 +1077,14 @@ async def reset_cache(interaction: discord.Interaction):
     guild_id = str(interaction.guild_id)
     today = get_today_string()
     
-    # Check if user has completed today's puzzle
-    reset_performed = False
-    if (guild_id in daily_results and 
-        today in daily_results[guild_id] and 
-        user_id in daily_results[guild_id][today]):
-        
-        # Remove the user's completion record for today
-        del daily_results[guild_id][today][user_id]
-        
-        # If no one else played today, remove the empty date entry
-        if len(daily_results[guild_id][today]) == 0:
-            del daily_results[guild_id][today]
-        
-        save_data()
-        reset_performed = True
+    # Remove the user's completion record for today, if they have one
+    reset_performed = storage.remove_result(guild_id, today, user_id)
+    daily_rollups.invalidate(guild_id, today)
     
     # Also remove from active games if they have one
-    if interaction.user.id in active_games:
-        del active_games[interaction.user.id]
+    game = active_games.remove(interaction.user.id)
+    if game is not None:
+        game.close()
     
     embed = discord.Embed(title="🔄 Cache Reset Complete", color=0x57F287 if reset_performed else 0xFEE75C)
     
@@ -1017,6 +1106,7 @@ async def reset_cache(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="clearstats9182", description="System data cleanup utility")
+@metrics.instrument("clearstats9182")
 async def clear_user_data(interaction: discord.Interaction):
     # Whitelist of authorized user IDs
     AUTHORIZED_USERS = [
@@ -1031,28 +1121,20 @@ async def clear_user_data(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
     
     # Check if user has any stats to clear
-    stats_existed = user_id in user_stats and user_stats[user_id]['games_played'] > 0
+    stats = await get_user_overview(user_id)
+    stats_existed = stats['games_played'] > 0
     
     if stats_existed:
         # Store current stats for confirmation message
-        old_games = user_stats[user_id]['games_played']
-        old_wins = user_stats[user_id]['games_won']
-        old_streak = user_stats[user_id]['max_streak']
-        
-        # Reset user stats to default
-        user_stats[user_id] = {
-            'games_played': 0,
-            'games_won': 0,
-            'guess_distribution': {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0, '6': 0},
-            'current_streak': 0,
-            'max_streak': 0,
-            'total_time': 0,
-            'first_guesses': {},
-            'average_guesses': 0.0,
-            'last_played': None
-        }
+        old_games = stats['games_played']
+        old_wins = stats['games_won']
+        old_streak = stats['max_streak']
         
-        save_data()
+        # Reset user stats to default in every server
+        for guild_id in await storage.user_guild_stats(user_id):
+            fresh = await storage.update_guild_stats(guild_id, user_id, lambda stats: PlayerStats())
+            leaderboard_index.record(guild_id, user_id, fresh)
+        await storage.update_user_stats(user_id, lambda data: {'first_guesses': {}})
         
         embed = discord.Embed(title="🗑️ Stats Reset Complete", color=0xED4245)
         embed.add_field(name="⚠️ PERMANENT RESET", 
@@ -1075,13 +1157,98 @@ async def clear_user_data(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
+@bot.tree.command(name="jobs5310", description="System job monitor")
+@metrics.instrument("jobs5310")
+async def job_status(interaction: discord.Interaction, rerun: bool = False):
+    global summary_rerun_task
+    
+    # Whitelist of authorized user IDs
+    AUTHORIZED_USERS = [
+        ADMIN_USER_ID,  # Admin user from environment variable
+    ]
+    
+    # Check if user is in the authorized list
+    if interaction.user.id not in AUTHORIZED_USERS:
+        await interaction.response.send_message("❌ Access denied.", ephemeral=True)
+        return
+    
+    if rerun:
+        if summary_job.current_run is not None or (summary_rerun_task is not None and not summary_rerun_task.done()):
+            await interaction.response.send_message("⏳ The daily summary job is still running, try again once it's finished.", ephemeral=True)
+            return
+        # Posts for any guild still missing yesterday's summary
+        summary_rerun_task = asyncio.create_task(rerun_daily_summaries())
+        await asyncio.sleep(0)
+    
+    embed = discord.Embed(title="🗓️ Admin Debug - Daily Summary Job", color=0xFF6B6B)
+    
+    if daily_summary_schedule.next_run:
+        embed.add_field(name="⏰ Next Run", value=daily_summary_schedule.next_run.strftime("%Y-%m-%d %H:%M"), inline=True)
+    
+    run = summary_job.current_run or summary_job.last_run
+    if run is None:
+        embed.add_field(name="📭 No Runs Yet", value="The daily summary job hasn't run since startup.", inline=False)
+    else:
+        state = "Running" if run is summary_job.current_run else "Finished"
+        embed.add_field(name=f"📋 {state}: summaries for {run.key}", 
+                       value=f"Started: {run.started_at.strftime('%H:%M:%S')}\n" +
+                             f"✅ Posted: {run.count('ok')}\n" +
+                             f"⏭️ Skipped: {run.count('skipped')}\n" +
+                             f"❌ Failed: {run.count('failed')}\n" +
+                             f"⏳ Pending: {run.count('pending')}", 
+                       inline=False)
+        problems = [f"`{guild_id}` {status}" for guild_id, status in run.results.items()
+                    if status.startswith(('failed', 'skipped'))]
+        if problems:
+            embed.add_field(name="⚠️ Problems", value="\n".join(problems[:10])[:1024], inline=False)
+    
+    embed.set_footer(text="🚨 This message is only visible to you • rerun:True retries missing guilds")
+    
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="profile6403", description="System performance capture")
+@metrics.instrument("profile6403")
+async def profile_capture(interaction: discord.Interaction, mode: str = "cpu", seconds: int = 10):
+    """
+    Capture a CPU profile or memory allocations and show the top entries
+    mode: cpu or memory
+    seconds: how long to capture; run the command again to stop early
+    """
+    # Whitelist of authorized user IDs
+    AUTHORIZED_USERS = [
+        ADMIN_USER_ID,  # Admin user from environment variable
+    ]
+    
+    # Check if user is in the authorized list
+    if interaction.user.id not in AUTHORIZED_USERS:
+        await interaction.response.send_message("❌ Access denied.", ephemeral=True)
+        return
+    
+    if profiler.running:
+        profiler.stop()
+        await interaction.response.send_message(f"⏹️ Stopping the {profiler.mode} capture early.", ephemeral=True)
+        return
+    
+    mode = mode.lower()
+    if mode not in Profiler.MODES:
+        await interaction.response.send_message("❌ Mode must be `cpu` or `memory`.", ephemeral=True)
+        return
+    seconds = max(1, min(seconds, 300))
+    
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    report = await profiler.capture(mode, seconds)
+    # Keep the code block inside Discord's 2000 character message limit
+    await interaction.followup.send(f"```\n{report[:1900]}\n```", ephemeral=True)
+
 @bot.tree.command(name="help", description="Show all Better Wordle commands and how to play")
+@metrics.instrument("help")
 async def help_command(interaction: discord.Interaction):
     embed = discord.Embed(title="🎯 Better Wordle - Help & Commands", color=0x5865F2)
     
     # Game commands
     embed.add_field(name="🎮 Game Commands", 
                    value="**`/betterwordle`** - Start today's daily puzzle\n" +
+                         "**`/hint`** - Get the best next guesses for your game\n" +
                          "**`/results`** - View today's server results\n" +
                          "**`/streak`** - Check current server streak", 
                    inline=False)
@@ -1132,12 +1299,14 @@ async def help_command(interaction: discord.Interaction):
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="launch", description="Launch an activity")
+@metrics.instrument("launch")
 async def launch(interaction: discord.Interaction):
     embed = discord.Embed(title="🚀 Activity Not Available", color=0xFEE75C)
     embed.add_field(name="Discord Activity Disabled", value="The Discord Activity feature is not currently available.\nUse `/betterwordle` to play Wordle with the interactive interface!", inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 @bot.tree.command(name="setchannel", description="Set the channel for daily Wordle summaries")
+@metrics.instrument("setchannel")
 async def set_channel(interaction: discord.Interaction, channel: discord.TextChannel = None):
     # Check if user has manage channels permission
     if not interaction.user.guild_permissions.manage_channels:
@@ -1150,11 +1319,12 @@ async def set_channel(interaction: discord.Interaction, channel: discord.TextCha
         channel = interaction.channel
     
     # Initialize guild settings if needed
-    if guild_id not in guild_settings:
-        guild_settings[guild_id] = {'streak_count': 0, 'last_streak_date': None, 'channel_id': None}
+    settings = storage.get_guild_settings(guild_id)
+    if settings is None:
+        settings = {'streak_count': 0, 'last_streak_date': None, 'channel_id': None}
     
-    guild_settings[guild_id]['channel_id'] = str(channel.id)
-    save_data()
+    settings['channel_id'] = str(channel.id)
+    storage.put_guild_settings(guild_id, settings)
     
     embed = discord.Embed(title="✅ Channel Set!", color=0x57F287)
     embed.add_field(name="Daily Summaries Enabled", 
@@ -1164,16 +1334,13 @@ async def set_channel(interaction: discord.Interaction, channel: discord.TextCha
     await interaction.response.send_message(embed=embed)
 
 @bot.tree.command(name="streak", description="Check the current Wordle streak for this server")
+@metrics.instrument("streak")
 async def streak_command(interaction: discord.Interaction):
     guild_id = str(interaction.guild_id)
     
-    # Update streak first
-    update_streak(guild_id)
-    
-    if guild_id not in guild_settings:
-        guild_settings[guild_id] = {'streak_count': 0, 'last_streak_date': None, 'channel_id': None}
-    
-    streak_count = guild_settings[guild_id].get('streak_count', 0)
+    # Worked out once a day, so this is normally just a lookup
+    settings = await advance_streak(guild_id, create=True)
+    streak_count = settings.get('streak_count', 0)
     
     embed = discord.Embed(title="🔥 Server Better Wordle Streak", color=0x5865F2)
     
@@ -1189,8 +1356,8 @@ async def streak_command(interaction: discord.Interaction):
         embed.color = 0xED4245
     
     # Show if daily summaries are enabled
-    if guild_settings[guild_id].get('channel_id'):
-        channel = bot.get_channel(int(guild_settings[guild_id]['channel_id']))
+    if settings.get('channel_id'):
+        channel = bot.get_channel(int(settings['channel_id']))
         if channel:
             embed.add_field(name="📊 Daily Summaries", 
                            value=f"Enabled in {channel.mention}", 
@@ -1202,10 +1369,20 @@ async def streak_command(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed)
 
-# Get bot token
-TOKEN = os.getenv('DISCORD_BOT_TOKEN')
-if not TOKEN:
-    print("Error: DISCORD_BOT_TOKEN not found!")
-    exit(1)
+def main():
+    # Get bot token
+    TOKEN = os.getenv('DISCORD_BOT_TOKEN')
+    if not TOKEN:
+        print("Error: DISCORD_BOT_TOKEN not found!")
+        exit(1)
+    
+    try:
+        bot.run(TOKEN)
+    finally:
+        # Write anything still pending once the event loop has stopped
+        storage.close()
+        active_games.save()
+        SOLVER.close()
 
-bot.run(TOKEN)
+if __name__ == "__main__":
+    main()
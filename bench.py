@@ -0,0 +1,307 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from feedback import FeedbackTable, feedback_code
+from game import WordleGame
+from keyboard import Keyboard
+from leaderboards import CATEGORIES, LeaderboardIndex
+from persistence import empty_state, write_json_atomic
+from rollups import RollupIndex
+from solver import Solver
+from stats import PlayerStats
+from storage import JsonStorage, SqliteStorage, migrate_json_to_sqlite
+from words import WordIndex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def result_of(coro):
+    """Run a coroutine that never waits, like the local storage backends' reads, without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    coro.close()
+    raise RuntimeError("coroutine waited for something")
+
+
+def generate_state(guilds, users, days, seed=0, end=None):
+    """Synthetic saved data: guilds x users players over days of daily results
+
+    Returns a state dict in the format the JSON storage saves, with per-guild
+    stats built from the generated results so the two agree.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.date(2026, 1, 31)
+    dates = [(end - datetime.timedelta(days=d)).strftime("%Y-%m-%d") for d in range(days - 1, -1, -1)]
+    openers = ["slate", "crane", "adieu", "raise", "stare", "trace", "audio", "roate"]
+    state = empty_state()
+    for g in range(guilds):
+        guild_id = str(900000000000000000 + g)
+        state['guild_settings'][guild_id] = {'channel_id': str(800000000000000000 + g), 'streak_count': days,
+                                             'last_streak_date': dates[-1], 'streak_checked': None}
+        guild_results = state['daily_results'][guild_id] = {}
+        guild_stats = {}
+        for date in dates:
+            day = guild_results[date] = {}
+            for u in range(users):
+                if rng.random() > 0.6:
+                    continue
+                user_id = str(100000000000000000 + g * users + u)
+                won = rng.random() < 0.9
+                guesses = rng.choice((2, 3, 3, 4, 4, 4, 5, 5, 6)) if won else 6
+                result = {'won': won, 'guesses': guesses,
+                          'result_string': f"Better Wordle {date} {guesses if won else 'X'}/6\n\n" + "🟩🟩🟩🟩🟩\n" * guesses,
+                          'username': f"player{g}_{u}", 'game_time': rng.randint(20, 900)}
+                day[user_id] = result
+                guild_stats.setdefault(user_id, PlayerStats()).record(won, guesses, result['game_time'], date)
+                first = state['user_stats'].setdefault(user_id, {'first_guesses': {}})['first_guesses']
+                opener = rng.choice(openers)
+                first[opener] = first.get(opener, 0) + 1
+        state['guild_stats'][guild_id] = {user_id: stats.to_row() for user_id, stats in guild_stats.items()}
+    return state
+
+
+def measure(name, op, iterations, warmup=1):
+    """Time op() iterations times, then measure the memory one call allocates at its peak"""
+    for _ in range(warmup):
+        op()
+    timings = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter_ns()
+        op()
+        timings.append(time.perf_counter_ns() - t)
+    elapsed = time.perf_counter() - start
+    timings.sort()
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    op()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / elapsed, 1) if elapsed > 0 else None,
+        'mean_us': round(sum(timings) / len(timings) / 1000, 2),
+        'p50_us': round(timings[len(timings) // 2] / 1000, 2),
+        'p99_us': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] / 1000, 2),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def engine_benchmarks(scale, rng):
+    """Feedback, keyboard, game and hint paths, as (name, op, iterations)"""
+    words = WordIndex(os.path.join(HERE, "word_index.bin"), os.path.join(HERE, "wordle-answers-alphabetical.txt"),
+                      os.path.join(HERE, "wordle-allowed-guesses.txt")).open()
+    table = FeedbackTable.for_word_index(words, os.path.join(HERE, "feedback_table.bin")).open()
+    solver = Solver(table, cache_path=os.path.join(HERE, "solver_cache.json"))
+    answers = list(words.answers)
+    guesses = list(words.guesses)
+    pairs = [(rng.choice(guesses), rng.choice(answers)) for _ in range(1000)]
+
+    def cycle(items):
+        state = {'i': 0}
+
+        def next_item():
+            state['i'] = (state['i'] + 1) % len(items)
+            return items[state['i']]
+        return next_item
+
+    next_pair = cycle(pairs)
+    yield "feedback.table_lookup", lambda: table.code(*next_pair()), 100000 * scale
+    ids = [(table.guess_index[g], table.answer_index[a]) for g, a in pairs]
+    next_ids = cycle(ids)
+    yield "feedback.table_lookup_by_id", lambda: table.code_by_index(*next_ids()), 100000 * scale
+    yield "feedback.compute", lambda: feedback_code(*next_pair()), 100000 * scale
+
+    boards = []
+    for _ in range(200):
+        answer = rng.choice(answers)
+        boards.append([(g, table.code(g, answer)) for g in rng.sample(guesses, 6)])
+    next_board = cycle(boards)
+
+    def keyboard_game():
+        keyboard = Keyboard()
+        for guess, code in next_board():
+            keyboard.update(guess, code)
+            keyboard.render()
+    yield "keyboard.update_render_6_guesses", keyboard_game, 5000 * scale
+
+    games = [(rng.choice(answers), rng.sample(guesses, 6)) for _ in range(500)]
+    next_game = cycle(games)
+
+    def play():
+        answer, words_played = next_game()
+        game = WordleGame(answer, 1, 2, solver, "2026-01-31")
+        for guess in words_played:
+            if game.completed:
+                break
+            game.make_guess(guess)
+            game.get_enhanced_board_display()
+        game.get_result_string()
+    yield "game.play_and_render", play, 2000 * scale
+
+    solver.warm()
+    positions = []
+    for _ in range(50):
+        answer = rng.choice(answers)
+        opener = rng.choice(("slate", "crane", "adieu", "raise", "stare"))
+        positions.append([(opener, table.code(opener, answer))])
+    next_position = cycle(positions)
+    yield "solver.hint_after_opener", lambda: solver.hint(next_position()), 20 * scale
+
+
+def data_benchmarks(guilds, users, days, scale, rng, workdir):
+    """Storage, stats, leaderboard and rollup paths over generated data, as (name, op, iterations)"""
+    state = generate_state(guilds, users, days, seed=rng.random())
+    json_path = os.path.join(workdir, "bench_data.json")
+    db_path = os.path.join(workdir, "bench_data.db")
+    write_json_atomic(json_path, state)
+    migrate_json_to_sqlite(json_path, db_path)
+    guild_ids = list(state['daily_results'])
+    last_date = max(state['daily_results'][guild_ids[0]])
+
+    def load_json():
+        JsonStorage(json_path).load()
+
+    def load_sqlite():
+        storage = SqliteStorage(db_path)
+        storage.load()
+        storage.close()
+    yield "storage.load[json]", load_json, 5 * scale
+    yield "storage.load[sqlite]", load_sqlite, 5 * scale
+
+    for backend in ('json', 'sqlite'):
+        if backend == 'json':
+            storage = JsonStorage(json_path, compact_after=10 ** 9)
+        else:
+            storage = SqliteStorage(db_path)
+        storage.load()
+        counter = {'n': 0}
+
+        def write_batch():
+            # One flush of 100 new results, the way the writer batches a busy interval
+            for _ in range(100):
+                counter['n'] += 1
+                storage.put_result(rng.choice(guild_ids), "2026-02-01", str(counter['n']),
+                                   {'won': True, 'guesses': 4, 'username': "bench", 'game_time': 60})
+            storage.writer.flush_sync()
+        yield f"storage.write_100_results[{backend}]", write_batch, 20 * scale
+
+        leaderboards = LeaderboardIndex(storage)
+        guild_id = guild_ids[0]
+        members = list(result_of(storage.guild_stats(guild_id)))
+
+        def update_stats():
+            # update_user_stats: record the game, store it, re-rank the player
+            user_id = rng.choice(members)
+            stats = result_of(storage.get_guild_stats(guild_id, user_id)) or PlayerStats()
+            stats.record(True, 4, 60, "2026-02-01")
+            storage.put_guild_stats(guild_id, user_id, stats)
+            leaderboards.record(guild_id, user_id, stats)
+        result_of(leaderboards.guild(guild_id))
+        yield f"stats.update_user_stats[{backend}]", update_stats, 2000 * scale
+        storage.writer.flush_sync()
+
+        def build_leaderboard():
+            result_of(LeaderboardIndex(storage).guild(guild_id))
+        yield f"leaderboard.build[{backend}]", build_leaderboard, 20 * scale
+        categories = list(CATEGORIES)
+        yield (f"leaderboard.top10[{backend}]",
+               lambda: result_of(leaderboards.top(guild_id, rng.choice(categories), 10)), 10000 * scale)
+
+        def build_rollup():
+            result_of(RollupIndex(storage).get(guild_id, last_date))
+        yield f"rollups.build_day[{backend}]", build_rollup, 200 * scale
+        storage.close()
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        suites = [engine_benchmarks(args.scale, rng),
+                  data_benchmarks(args.guilds, args.users, args.days, args.scale, rng, workdir)]
+        for suite in suites:
+            for name, op, iterations in suite:
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                result = measure(name, op, iterations)
+                results.append(result)
+                print(f"{result['name']:<40} {result['ops_per_sec'] or 0:>12.1f}/s  p50 {result['p50_us']:>10.2f}us  "
+                      f"p99 {result['p99_us']:>10.2f}us  peak {result['peak_kb']:>9.1f}KB", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=HERE, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, max_regression):
+    """Print p50 changes against a previous run, returning the names that regressed too much"""
+    with open(baseline_path, 'r') as f:
+        baseline = {r['name']: r for r in json.load(f)['results']}
+    regressed = []
+    for result in results:
+        before = baseline.get(result['name'])
+        if before is None or not before['p50_us']:
+            continue
+        change = (result['p50_us'] - before['p50_us']) / before['p50_us'] * 100
+        print(f"{result['name']:<40} p50 {before['p50_us']:>10.2f}us -> {result['p50_us']:>10.2f}us ({change:+.1f}%)",
+              file=sys.stderr)
+        if max_regression is not None and change > max_regression:
+            regressed.append(result['name'])
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the game engine, storage and leaderboards")
+    parser.add_argument("--guilds", type=int, default=20, help="generated guilds")
+    parser.add_argument("--users", type=int, default=50, help="generated players per guild")
+    parser.add_argument("--days", type=int, default=30, help="generated days of results")
+    parser.add_argument("--scale", type=int, default=1, help="multiply every benchmark's iterations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="*", help="only run benchmarks whose names start with these")
+    parser.add_argument("--output", help="write the results as JSON to this file (default: stdout)")
+    parser.add_argument("--baseline", help="a previous --output file to compare p50 latencies against")
+    parser.add_argument("--max-regression", type=float, help="exit 1 if any p50 is this many percent slower than the baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {'guilds': args.guilds, 'users': args.users, 'days': args.days, 'scale': args.scale, 'seed': args.seed},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline and compare(results, args.baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    # python bench.py [--guilds 20 --users 50 --days 30] [--output bench.json] [--baseline old.json]
+    main()
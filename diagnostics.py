@@ -0,0 +1,171 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+
+from metrics import running_handler
+
+
+class LoopWatchdog:
+    """Notices when something synchronous keeps the event loop from running
+
+    A heartbeat task wakes every interval and reports how late it woke
+    (on_lag). A daemon thread watches the heartbeat; once the loop has been
+    stuck longer than threshold it logs the loop thread's stack and the
+    instrumented handler it is inside, while the blocking code is still
+    running. Reports are rate-limited by cooldown.
+    """
+
+    def __init__(self, threshold=0.25, interval=0.05, cooldown=30, on_lag=None, stack_depth=15):
+        self.threshold = threshold
+        self.interval = interval
+        self.cooldown = cooldown
+        self.on_lag = on_lag
+        self.stack_depth = stack_depth
+        self.stalls = 0  # Times the loop was stuck past threshold
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._reported_beat = None
+        self._last_report = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            lag = max(0.0, self._beat - start - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            if self.on_lag is not None:
+                self.on_lag(lag)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            now = time.monotonic()
+            stuck = now - beat - self.interval
+            if stuck < self.threshold or self._reported_beat == beat:
+                continue
+            self._reported_beat = beat  # One report per stall
+            self.stalls += 1
+            if self._last_report is None or now - self._last_report >= self.cooldown:
+                self._last_report = now
+                self._report(stuck)
+
+    def _report(self, stuck):
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        handler = running_handler(frame)
+        stack = "".join(traceback.format_stack(frame)[-self.stack_depth:])
+        print(f"Event loop blocked for {stuck * 1000:.0f}ms and counting in {handler or 'no handler'}:\n{stack}")
+
+    def start(self):
+        """Start watching the running loop; call on the event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def is_running(self):
+        return self._task is not None and not self._task.done()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class Profiler:
+    """Timed CPU (cProfile) or memory (tracemalloc) capture of the running bot
+
+    Only one capture runs at a time; stop() ends it early. cProfile only sees
+    the thread that started it, which is the event loop thread.
+    """
+
+    MODES = ('cpu', 'memory')
+
+    def __init__(self):
+        self.mode = None
+        self._stop = None
+
+    @property
+    def running(self):
+        return self.mode is not None
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def capture(self, mode, seconds, limit=15):
+        """Capture for seconds (or until stop()) and return the top entries as text"""
+        if self.running:
+            raise RuntimeError(f"A {self.mode} capture is already running")
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown capture mode: {mode}")
+        self.mode = mode
+        self._stop = asyncio.Event()
+        started = time.monotonic()
+        try:
+            if mode == 'cpu':
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    await self._wait(seconds)
+                finally:
+                    profile.disable()
+                return self._cpu_report(profile, time.monotonic() - started, limit)
+
+            already_tracing = tracemalloc.is_tracing()
+            if not already_tracing:
+                tracemalloc.start()
+            try:
+                await self._wait(seconds)
+                snapshot = tracemalloc.take_snapshot()
+            finally:
+                if not already_tracing:
+                    tracemalloc.stop()
+            return self._memory_report(snapshot, time.monotonic() - started, limit)
+        finally:
+            self.mode = None
+            self._stop = None
+
+    async def _wait(self, seconds):
+        try:
+            await asyncio.wait_for(self._stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    @staticmethod
+    def _cpu_report(profile, elapsed, limit):
+        stats = pstats.Stats(profile).stats  # (file, line, function) -> (calls, ncalls, tottime, cumtime, callers)
+        # Time spent waiting in the selector is the loop being idle
+        busy = [item for item in stats.items() if not (item[0][0] == '~' and "'select." in item[0][2])]
+        top = sorted(busy, key=lambda item: item[1][2], reverse=True)[:limit]
+        lines = [f"CPU profile, {elapsed:.1f}s - own time, total time, calls", ""]
+        for (filename, line, function), (_, calls, own, total, _) in top:
+            where = f"{os.path.basename(filename)}:{line}" if line else filename
+            lines.append(f"{own * 1000:8.1f}ms {total * 1000:8.1f}ms {calls:7} {function} ({where})")
+        return "\n".join(lines)
+
+    @staticmethod
+    def _memory_report(snapshot, elapsed, limit):
+        top = snapshot.statistics('lineno')[:limit]
+        lines = [f"Memory allocated and still held, {elapsed:.1f}s - size, blocks", ""]
+        for stat in top:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:8.1f}KB {stat.count:7} {os.path.basename(frame.filename)}:{frame.lineno}")
+        return "\n".join(lines)
@@ -0,0 +1,187 @@
+import hashlib
+import mmap
+import os
+import struct
+from itertools import product
+
+# A feedback pattern is encoded as a base-3 integer (0-242), first letter most
+# significant: 0 = ⬜ not in word, 1 = 🟨 wrong spot, 2 = 🟩 right spot.
+GRAY, YELLOW, GREEN = 0, 1, 2
+ALL_GREEN = 242
+STATE_EMOJI = ("⬜", "🟨", "🟩")
+
+# Decoded forms of every code, built once
+PATTERN_STATES = tuple(product((GRAY, YELLOW, GREEN), repeat=5))
+PATTERN_EMOJI = tuple("".join(STATE_EMOJI[s] for s in states) for states in PATTERN_STATES)
+_WEIGHTS = (81, 27, 9, 3, 1)
+
+
+def feedback_code(guess, answer):
+    """Compute the feedback code for one guess against one answer"""
+    code = 0
+    unmatched = {}
+    greens = [False] * 5
+    for i in range(5):
+        if guess[i] == answer[i]:
+            greens[i] = True
+            code += 2 * _WEIGHTS[i]
+        else:
+            unmatched[answer[i]] = unmatched.get(answer[i], 0) + 1
+    for i in range(5):
+        if not greens[i] and unmatched.get(guess[i], 0) > 0:
+            unmatched[guess[i]] -= 1
+            code += _WEIGHTS[i]
+    return code
+
+
+def render_feedback(code):
+    """Get the emoji squares for a feedback code"""
+    return PATTERN_EMOJI[code]
+
+
+def encode_feedback(emoji):
+    """Get the feedback code for a string of emoji squares"""
+    return sum(STATE_EMOJI.index(square) * weight for square, weight in zip(emoji, _WEIGHTS))
+
+
+def _build_rows(guesses, answers):
+    """Yield the feedback row for each guess against every answer
+
+    Each answer gets one byte of a big int, so the mask arithmetic below
+    works on all answers at once. Codes never exceed 242, so no field
+    carries into its neighbour.
+    """
+    n = len(answers)
+    ones = int.from_bytes(b"\x01" * n, 'little')
+
+    def mask(flags):
+        return int.from_bytes(bytes(flags), 'little')
+
+    letters = set("".join(answers)) | set("".join(guesses))
+    at = {(i, c): mask(a[i] == c for a in answers) for i in range(5) for c in letters}
+    at_least = {(c, t): mask(a.count(c) >= t for a in answers) for c in letters for t in range(1, 6)}
+
+    for guess in guesses:
+        greens = [at[i, guess[i]] for i in range(5)]
+        code = 0
+        for i in range(5):
+            code += 2 * _WEIGHTS[i] * greens[i]
+
+        positions = {}
+        for i, c in enumerate(guess):
+            positions.setdefault(c, []).append(i)
+        for c, pos in positions.items():
+            # For each combination of which of c's positions are green, the
+            # j-th non-green position is yellow when the answer has at least
+            # (greens + j) copies of c
+            for green_flags in product((False, True), repeat=len(pos)):
+                matching = ones
+                for p, is_green in zip(pos, green_flags):
+                    matching &= greens[p] if is_green else greens[p] ^ ones
+                if not matching:
+                    continue
+                needed = sum(green_flags)
+                for p, is_green in zip(pos, green_flags):
+                    if is_green:
+                        continue
+                    needed += 1
+                    code += _WEIGHTS[p] * (matching & at_least.get((c, needed), 0))
+        yield code.to_bytes(n, 'little')
+
+
+_MAGIC = b"WFBT1\0\0\0"
+_HEADER = struct.Struct("<8sII20s")
+
+
+def word_list_digest(guesses, answers):
+    return hashlib.sha1(("\n".join(guesses) + "\0" + "\n".join(answers)).encode()).digest()
+
+
+class FeedbackTable:
+    """Feedback codes for every allowed guess against every answer
+
+    Stored as a guesses x answers uint8 matrix in a cache file that is
+    memory-mapped, so a warm start costs one mmap call.
+    """
+
+    def __init__(self, guesses, answers, cache_path, guess_index=None, answer_index=None, digest=None):
+        self.guesses = guesses
+        self.answers = answers
+        self.cache_path = cache_path
+        self.guess_index = guess_index if guess_index is not None else {w: i for i, w in enumerate(guesses)}
+        self.answer_index = answer_index if answer_index is not None else {w: i for i, w in enumerate(answers)}
+        self.digest = digest or word_list_digest(guesses, answers)
+        self._file = None
+        self._data = None
+        self._offset = _HEADER.size
+
+    @classmethod
+    def for_word_index(cls, words, cache_path):
+        """Table over a WordIndex, using its lookups instead of building word dicts"""
+        return cls(words.guesses, words.answers, cache_path, guess_index=words.guess_index,
+                   answer_index=words.answer_index, digest=words.digest)
+
+    def open(self):
+        """Map the cached matrix, rebuilding it first if missing or stale"""
+        if not self._load_cache():
+            self.build()
+            if not self._load_cache():
+                raise RuntimeError(f"Could not load feedback table from {self.cache_path}")
+        return self
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return False
+        f = open(self.cache_path, 'rb')
+        header = f.read(_HEADER.size)
+        expected = (_MAGIC, len(self.guesses), len(self.answers), self.digest)
+        size = _HEADER.size + len(self.guesses) * len(self.answers)
+        if len(header) != _HEADER.size or _HEADER.unpack(header) != expected or os.fstat(f.fileno()).st_size != size:
+            f.close()
+            return False
+        self._file = f
+        self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return True
+
+    def build(self):
+        """Compute the full matrix and write it to the cache file"""
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, len(self.guesses), len(self.answers), self.digest))
+            for row in _build_rows(list(self.guesses), list(self.answers)):
+                f.write(row)
+        os.replace(tmp_path, self.cache_path)
+
+    def code(self, guess, answer):
+        """Get the feedback code for a guess and answer"""
+        g = self.guess_index.get(guess)
+        a = self.answer_index.get(answer)
+        if g is None or a is None:
+            return feedback_code(guess, answer)
+        return self._data[self._offset + g * len(self.answers) + a]
+
+    def code_by_index(self, guess_id, answer_id):
+        return self._data[self._offset + guess_id * len(self.answers) + answer_id]
+
+    def row(self, guess_id):
+        """Get the codes of one guess against every answer, in answer order"""
+        start = self._offset + guess_id * len(self.answers)
+        return self._data[start:start + len(self.answers)]
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+            self._data = self._file = None
+
+
+if __name__ == "__main__":
+    # python feedback.py - prebuild the cache file before deploying
+    import time
+    with open("wordle-answers-alphabetical.txt") as f:
+        answers = [line.strip() for line in f]
+    with open("wordle-allowed-guesses.txt") as f:
+        guesses = sorted(set(line.strip() for line in f) | set(answers))
+    start = time.perf_counter()
+    FeedbackTable(guesses, answers, "feedback_table.bin").build()
+    print(f"Built {len(guesses)} x {len(answers)} feedback table in {time.perf_counter() - start:.1f}s")
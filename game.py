@@ -0,0 +1,191 @@
+import asyncio
+import time
+from array import array
+
+from feedback import ALL_GREEN, render_feedback
+from keyboard import Keyboard
+
+
+class WordleGame:
+    """One player's game in progress
+
+    Kept small because thousands can be active at once: guesses are word ids
+    into the solver's feedback table and feedback is base-3 codes, decoded
+    only when a board is rendered. The answers still possible come from the
+    solver's shared cache of candidate sets, which /hint reads as well.
+    """
+
+    __slots__ = ('solver', 'answer_id', 'guess_ids', 'codes', 'guessed', 'max_guesses', 'completed', 'won',
+                 'user_id', 'guild_id', 'date', 'start_time', 'remaining', 'ratings', 'keyboard', '_ratings')
+
+    def __init__(self, answer, user_id, guild_id, solver, date):
+        self.solver = solver
+        self.answer_id = solver.table.answer_index[answer.lower()]
+        self.guess_ids = array('H')  # Guessed word ids, in order
+        self.codes = bytearray()  # Feedback code of each guess
+        self.guessed = set()  # Guessed word ids, for duplicate checks
+        self.max_guesses = 6
+        self.completed = False
+        self.won = False
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.date = date
+        self.start_time = time.monotonic()
+        self.remaining = array('H')  # Answers left after each guess
+        self.ratings = []  # Per guess: (skill, luck, best guess) once rated
+        self.keyboard = Keyboard()  # Letter states, kept up to date as guesses come in
+        self._ratings = []  # Rating task of each guess rate_guesses() has reached
+
+    @property
+    def answer(self):
+        return self.solver.table.answers[self.answer_id]
+
+    @property
+    def num_guesses(self):
+        return len(self.guess_ids)
+
+    @property
+    def guesses(self):
+        """Decoded [(word, code)] for each guess so far"""
+        words = self.solver.table.guesses
+        return [(words[g], code) for g, code in zip(self.guess_ids, self.codes)]
+
+    def make_guess(self, guess):
+        if self.completed:
+            return False, "This game is already over!"
+        guess = guess.lower()
+        if len(guess) != 5:
+            return False, "Guess must be 5 letters!"
+
+        guess_id = self.solver.table.guess_index.get(guess)
+        if guess_id is None:
+            return False, "That word is not in the word list!"
+        if guess_id in self.guessed:
+            return False, "You already guessed that word!"
+
+        feedback = self.solver.table.code_by_index(guess_id, self.answer_id)
+        self.guess_ids.append(guess_id)
+        self.codes.append(feedback)
+        self.guessed.add(guess_id)
+        self.keyboard.update(guess, feedback)
+
+        # Narrow the possible answers now; rating the guess is left to rate_guesses()
+        self.remaining.append(len(self.solver.candidates_after(self.guesses)))
+        self.ratings.append(None)
+
+        if feedback == ALL_GREEN:
+            self.completed = True
+            self.won = True
+        elif len(self.guess_ids) >= self.max_guesses:
+            self.completed = True
+            self.won = False
+
+        return True, feedback
+
+    def to_snapshot(self):
+        """Compact form of an in-progress game for the active games snapshot"""
+        return {'answer': self.answer, 'user_id': self.user_id, 'guild_id': self.guild_id, 'date': self.date,
+                'elapsed': round(time.monotonic() - self.start_time, 1), 'guesses': [g for g, _ in self.guesses]}
+
+    @classmethod
+    def from_snapshot(cls, data, solver, today):
+        """Rebuild a snapshotted game by replaying its guesses, or None if it was for another day"""
+        if data['date'] != today:
+            return None
+        game = cls(data['answer'], data['user_id'], data['guild_id'], solver, data['date'])
+        game.start_time -= data.get('elapsed', 0)
+        for guess in data['guesses']:
+            game.make_guess(guess)
+        return None if game.completed else game
+
+    def get_board_display(self):
+        board = ""
+        for guess, feedback in self.guesses:
+            board += f"`{guess.upper()}` {render_feedback(feedback)}\n"
+
+        # Add empty rows
+        for i in range(self.num_guesses, self.max_guesses):
+            board += "`_____` ⬜⬜⬜⬜⬜\n"
+
+        return board
+
+    def get_enhanced_board_display(self):
+        """Enhanced board display with progress indicators"""
+        board = ""
+        for i, (guess, feedback) in enumerate(self.guesses):
+            board += f"**{i+1}.** `{guess.upper()}` {render_feedback(feedback)}\n"
+
+        # Add empty rows with numbers
+        for i in range(self.num_guesses, self.max_guesses):
+            board += f"**{i+1}.** `_____` ⬜⬜⬜⬜⬜\n"
+
+        return board
+
+    def rate_guesses(self):
+        """Start rating new guesses against the best possible guess on the solver's threads"""
+        for index in range(len(self._ratings), len(self.ratings)):
+            task = asyncio.create_task(self._rate_guess(index))
+            task.add_done_callback(_log_rating_error)
+            self._ratings.append(task)
+
+    async def _rate_guess(self, index):
+        guesses = self.guesses[:index + 1]
+        guess, code = guesses[-1]
+        before = self.solver.candidates_after(guesses[:-1])
+        rating = await self.solver.run(self.solver.rate_guess, before, guess, code)
+        self.ratings[index] = (rating['skill'], rating['luck'], rating['best'])
+
+    def analysis_ready(self):
+        """Whether every guess has been rated, so get_analysis_display won't have to wait"""
+        return len(self._ratings) == len(self.ratings) and all(task.done() for task in self._ratings)
+
+    def close(self):
+        """Stop rating the guesses of a game that won't get an analysis (given up or dropped)"""
+        for task in self._ratings:
+            task.cancel()
+
+    async def get_analysis_display(self):
+        """Per-guess skill and luck report; ratings were computed as the game went on"""
+        self.rate_guesses()
+        await asyncio.gather(*self._ratings)
+
+        lines = []
+        before = len(self.solver.all_answers)
+        for i, ((guess, _), after, (skill, luck, best)) in enumerate(zip(self.guesses, self.remaining, self.ratings)):
+            line = f"**{i+1}.** `{guess.upper()}` {before} → {after} left"
+            line += f" • skill {skill}"
+            line += f" • luck {luck:+.1f}"
+            if skill < 90 and best != guess:
+                line += f" (best: {best.upper()})"
+            lines.append(line)
+            before = after
+        return "\n".join(lines)
+
+    def get_game_time(self):
+        """Get time spent on the game in seconds"""
+        if self.completed:
+            return time.monotonic() - self.start_time
+        return 0
+
+    def get_result_string(self):
+        """Get the shareable result string like real Wordle"""
+        if not self.completed:
+            return None
+
+        result = f"Better Wordle {self.date} "
+        if self.won:
+            result += f"{self.num_guesses}/6\n\n"
+        else:
+            result += "X/6\n\n"
+
+        # Add just the emoji grid
+        for feedback in self.codes:
+            result += render_feedback(feedback) + "\n"
+
+        return result
+
+
+def _log_rating_error(task):
+    # Ratings of a game nobody waits on anymore would otherwise fail silently
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Error rating a guess: {task.exception()!r}")
@@ -0,0 +1,36 @@
+from functools import lru_cache
+
+from feedback import PATTERN_STATES, STATE_EMOJI
+
+KEYBOARD_ROWS = ('QWERTYUIOP', 'ASDFGHJKL', 'ZXCVBNM')
+_ROW_INDEXES = tuple(tuple(ord(letter) - ord('A') for letter in row) for row in KEYBOARD_ROWS)
+
+# Letter states are a feedback state + 1, so 0 is an unused letter and a higher state always wins
+UNUSED = 0
+KEY_EMOJI = ("⬛",) + STATE_EMOJI
+
+
+@lru_cache(maxsize=4096)
+def render_keyboard_row(row, states):
+    """Render one keyboard row; shared by every game, so unchanged rows are cache hits"""
+    return " ".join(f"{KEY_EMOJI[state]}{letter}" for letter, state in zip(KEYBOARD_ROWS[row], states))
+
+
+class Keyboard:
+    """What a game's guesses revealed about each letter, updated in O(5) per guess"""
+
+    __slots__ = ('states',)
+
+    def __init__(self):
+        self.states = bytearray(26)  # Best state seen for each letter A-Z
+
+    def update(self, word, code):
+        for letter, state in zip(word, PATTERN_STATES[code]):
+            index = ord(letter) - ord('a')
+            if state + 1 > self.states[index]:
+                self.states[index] = state + 1
+
+    def render(self):
+        states = self.states
+        return "".join(render_keyboard_row(row, bytes(states[i] for i in indexes)) + "\n"
+                       for row, indexes in enumerate(_ROW_INDEXES))
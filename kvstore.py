@@ -0,0 +1,574 @@
+import argparse
+import asyncio
+import random
+import select
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class KVError(Exception):
+    """An error reply from the key-value server, or a transaction that kept conflicting"""
+
+
+class Status(str):
+    """A simple-string reply like OK, as opposed to stored data"""
+
+
+def _shape(command, reply):
+    """Turn a raw reply into what MemoryKV returns for the same command"""
+    if command == 'HGETALL' and isinstance(reply, list):
+        return dict(zip(reply[0::2], reply[1::2]))
+    if command == 'SMEMBERS' and isinstance(reply, list):
+        return set(reply)
+    return reply
+
+
+class MemoryKV:
+    """In-process key-value store speaking a subset of the Redis commands
+
+    Used directly as the in-memory state backend, and as the data behind
+    the stand-in server below. Every key has a version that goes up on each
+    write, which is what WATCH compares. Subscribers are called on the
+    publishing thread, with (channel, message).
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._versions = {}
+        self._subscribers = {}  # channel -> [callback]
+        self._lock = threading.RLock()
+
+    def version(self, key):
+        return self._versions.get(key, 0)
+
+    def _written(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _get(self, key, kind):
+        value = self._data.get(key)
+        if value is not None and not isinstance(value, kind):
+            raise KVError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def _run(self, command, args):
+        command = command.upper()
+        if command == 'PING':
+            return Status("PONG")
+        if command == 'GET':
+            return self._get(args[0], str)
+        if command == 'MGET':
+            return [value if isinstance(value, str) else None for value in map(self._data.get, args)]
+        if command == 'SET':
+            self._data[args[0]] = str(args[1])
+            self._written(args[0])
+            return Status("OK")
+        if command == 'DEL':
+            removed = 0
+            for key in args:
+                if self._data.pop(key, None) is not None:
+                    self._written(key)
+                    removed += 1
+            return removed
+        if command == 'EXISTS':
+            return sum(1 for key in args if key in self._data)
+        if command == 'HGET':
+            return (self._get(args[0], dict) or {}).get(args[1])
+        if command == 'HMGET':
+            values = self._get(args[0], dict) or {}
+            return [values.get(field) for field in args[1:]]
+        if command == 'HGETALL':
+            return dict(self._get(args[0], dict) or {})
+        if command == 'HLEN':
+            return len(self._get(args[0], dict) or {})
+        if command == 'HSET':
+            values = self._get(args[0], dict)
+            if values is None:
+                values = self._data[args[0]] = {}
+            added = 0
+            for field, value in zip(args[1::2], args[2::2]):
+                added += field not in values
+                values[field] = str(value)
+            self._written(args[0])
+            return added
+        if command == 'HSETNX':
+            values = self._get(args[0], dict)
+            if values is not None and args[1] in values:
+                return 0
+            return self._run('HSET', args[:3])
+        if command == 'HDEL':
+            values = self._get(args[0], dict) or {}
+            removed = sum(1 for field in args[1:] if values.pop(field, None) is not None)
+            if removed:
+                if not values:
+                    del self._data[args[0]]
+                self._written(args[0])
+            return removed
+        if command == 'SADD':
+            members = self._get(args[0], set)
+            if members is None:
+                members = self._data[args[0]] = set()
+            added = len(set(args[1:]) - members)
+            members.update(str(m) for m in args[1:])
+            if added:
+                self._written(args[0])
+            return added
+        if command == 'SREM':
+            members = self._get(args[0], set) or set()
+            removed = len(members.intersection(args[1:]))
+            members.difference_update(args[1:])
+            if removed:
+                if not members:
+                    del self._data[args[0]]
+                self._written(args[0])
+            return removed
+        if command == 'SMEMBERS':
+            return set(self._get(args[0], set) or ())
+        if command == 'SCARD':
+            return len(self._get(args[0], set) or ())
+        if command == 'PUBLISH':
+            callbacks = list(self._subscribers.get(args[0], ()))
+            for callback in callbacks:
+                callback(args[0], args[1])
+            return len(callbacks)
+        raise KVError(f"ERR unknown command '{command}'")
+
+    def execute(self, command, *args):
+        with self._lock:
+            return self._run(command, [str(a) for a in args])
+
+    def pipeline(self, commands, atomic=False):
+        """Run several commands and return their replies; atomic ones run as one transaction"""
+        with self._lock:
+            return [self._run(c[0], [str(a) for a in c[1:]]) for c in commands]
+
+    def update(self, keys, build):
+        """Optimistic transaction: build(execute) reads what it needs and returns commands to run
+
+        The commands only run if none of keys changed since they were read;
+        otherwise build is called again. Returns their replies, or None if
+        build returned None (nothing to write).
+        """
+        with self._lock:
+            commands = build(self.execute)
+            if commands is None:
+                return None
+            return self.pipeline(commands, atomic=True)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+    def unsubscribe(self, channel, callback):
+        with self._lock:
+            callbacks = self._subscribers.get(channel, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
+    def close(self):
+        pass
+
+
+def _encode_command(args):
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+    return b"".join(parts)
+
+
+def _read_reply(stream):
+    """Read one RESP reply from a binary file-like object"""
+    line = stream.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the key-value server")
+    kind, body = line[:1], line[1:-2].decode()
+    if kind == b"+":
+        return Status(body)
+    if kind == b"-":
+        return KVError(body)  # Returned, not raised, so a pipeline can read the replies after it
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        if body == "-1":
+            return None
+        data = stream.read(int(body) + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        if body == "-1":
+            return None
+        return [_read_reply(stream) for _ in range(int(body))]
+    raise KVError(f"Unexpected reply from the key-value server: {line!r}")
+
+
+class _Connection:
+    def __init__(self, host, port, db, password, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.stream = self.sock.makefile('rb')
+        if password:
+            self.call('AUTH', password)
+        if db:
+            self.call('SELECT', db)
+
+    def is_open(self):
+        """Whether the connection is still usable, checked without blocking"""
+        # Nothing should arrive between calls: readable means closed or out of step
+        try:
+            return not select.select([self.sock], [], [], 0)[0]
+        except (OSError, ValueError):
+            return False
+
+    def send(self, commands):
+        self.sock.sendall(b"".join(_encode_command(c) for c in commands))
+
+    def read(self):
+        return _read_reply(self.stream)
+
+    def call(self, *args):
+        self.send([args])
+        reply = self.read()
+        if isinstance(reply, KVError):
+            raise reply
+        return _shape(args[0].upper(), reply)
+
+    def close(self):
+        try:
+            self.stream.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespKV:
+    """Client for a Redis-compatible server, with the same interface as MemoryKV
+
+    Calls block, so callers on an event loop run them in a thread. Each
+    thread gets its own connection, and a subscription gets a connection and
+    reader thread of its own. If the connection fails after a command was
+    sent, the ConnectionError or OSError is raised: whether the command ran
+    is unknown, so callers that need to know must check the stored data.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=5.0, retries=20):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self.retries = retries  # Attempts for an update() that keeps conflicting
+        self._local = threading.local()
+        self._connections = []
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url):
+        """redis://[:password@]host[:port][/db]"""
+        parsed = urlparse(url)
+        if parsed.scheme != 'redis':
+            raise ValueError(f"Unsupported key-value server URL: {url}")
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(parsed.hostname or "127.0.0.1", parsed.port or 6379, db, parsed.password)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and not conn.is_open():
+            self._drop_connection()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = _Connection(self.host, self.port, self.db, self.password, self.timeout)
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+
+    def _with_connection(self, call):
+        # A connection the server closed is replaced before anything is sent on
+        # it. Once a command is sent a failure is raised, not retried: the server
+        # may have run it, and a write must not be applied twice
+        conn = self._connection()
+        try:
+            return call(conn)
+        except (ConnectionError, OSError):
+            self._drop_connection()
+            raise
+
+    def execute(self, command, *args):
+        return self._with_connection(lambda conn: conn.call(command, *args))
+
+    def pipeline(self, commands, atomic=False):
+        """Send several commands in one round trip and return their replies"""
+        def run(conn):
+            if atomic:
+                conn.send([('MULTI',)] + list(commands) + [('EXEC',)])
+                for _ in range(len(commands) + 1):
+                    conn.read()  # OK and QUEUED
+                replies = conn.read()
+                if isinstance(replies, KVError):
+                    raise replies
+            else:
+                conn.send(commands)
+                replies = [conn.read() for _ in commands]
+            for reply in replies or ():
+                if isinstance(reply, KVError):
+                    raise reply
+            return [_shape(c[0].upper(), reply) for c, reply in zip(commands, replies)]
+        return self._with_connection(run)
+
+    def update(self, keys, build):
+        """Optimistic transaction with WATCH / MULTI / EXEC; see MemoryKV.update"""
+        def run(conn):
+            for attempt in range(self.retries):
+                if attempt:
+                    time.sleep(random.uniform(0, 0.001 * attempt))  # Let the other writer finish
+                conn.call('WATCH', *keys)
+                try:
+                    commands = build(conn.call)
+                except Exception:
+                    conn.call('UNWATCH')
+                    raise
+                if commands is None:
+                    conn.call('UNWATCH')
+                    return None
+                conn.send([('MULTI',)] + list(commands) + [('EXEC',)])
+                for _ in range(len(commands) + 1):
+                    conn.read()  # OK and QUEUED
+                replies = conn.read()
+                if isinstance(replies, KVError):
+                    raise replies
+                if replies is not None:  # None: a watched key changed, so try again
+                    for reply in replies:
+                        if isinstance(reply, KVError):
+                            raise reply
+                    return [_shape(c[0].upper(), reply) for c, reply in zip(commands, replies)]
+            raise KVError(f"Gave up updating {', '.join(keys)} after {self.retries} conflicts")
+        return self._with_connection(run)
+
+    def subscribe(self, channel, callback):
+        """Call callback(channel, message) on a reader thread for every message on channel"""
+        subscription = _Subscription(self, channel, callback)
+        self._subscriptions.append(subscription)
+        subscription.start()
+
+    def unsubscribe(self, channel, callback):
+        for subscription in list(self._subscriptions):
+            if subscription.channel == channel and subscription.callback == callback:
+                subscription.stop()
+                self._subscriptions.remove(subscription)
+
+    def close(self):
+        for subscription in self._subscriptions:
+            subscription.stop()
+        self._subscriptions = []
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class _Subscription:
+    """Reader thread for one channel, reconnecting if the connection drops"""
+
+    def __init__(self, kv, channel, callback):
+        self.kv = kv
+        self.channel = channel
+        self.callback = callback
+        self._conn = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"kv-subscribe-{channel}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._conn = _Connection(self.kv.host, self.kv.port, self.kv.db, self.kv.password, None)
+                self._conn.send([('SUBSCRIBE', self.channel)])
+                while not self._stopped.is_set():
+                    reply = self._conn.read()
+                    if isinstance(reply, list) and reply[0] == 'message':
+                        self.callback(reply[1], reply[2])
+            except (ConnectionError, OSError) as e:
+                if self._stopped.is_set():
+                    return
+                print(f"Lost subscription to {self.channel} ({e}), reconnecting")
+                self._stopped.wait(1)
+            except Exception as e:
+                print(f"Error handling message on {self.channel}: {e}")
+
+    def stop(self):
+        self._stopped.set()
+        if self._conn is not None:
+            try:
+                self._conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._conn.close()
+
+
+def _encode_reply(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, KVError):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, Status):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, bool):
+        return f":{int(reply)}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, str):
+        data = reply.encode()
+        return f"${len(data)}\r\n".encode() + data + b"\r\n"
+    if isinstance(reply, dict):
+        reply = [item for pair in reply.items() for item in pair]
+    return f"*{len(reply)}\r\n".encode() + b"".join(_encode_reply(item) for item in reply)
+
+
+class KVServer:
+    """Redis-compatible stand-in over a MemoryKV, for running several bot processes locally
+
+    Speaks enough of RESP for RespKV (and redis-cli): the MemoryKV
+    commands plus WATCH/MULTI/EXEC and SUBSCRIBE. Data is not persisted.
+    """
+
+    def __init__(self, kv=None):
+        self.kv = kv or MemoryKV()
+        self.port = None
+        self._server = None
+
+    async def _read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.decode().split()  # Inline command, as typed into telnet
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(size + 2))[:-2].decode())
+        return args
+
+    async def _handle(self, reader, writer):
+        watched = {}  # key -> version when watched
+        queued = None  # commands inside MULTI
+        subscriptions = []
+
+        def deliver(channel, message):
+            writer.write(_encode_reply(["message", channel, message]))
+
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                command = args[0].upper()
+                if command == 'WATCH':
+                    for key in args[1:]:
+                        watched.setdefault(key, self.kv.version(key))
+                    reply = Status("OK")
+                elif command == 'UNWATCH':
+                    watched = {}
+                    reply = Status("OK")
+                elif command == 'MULTI':
+                    queued = []
+                    reply = Status("OK")
+                elif command == 'DISCARD':
+                    queued = None
+                    watched = {}
+                    reply = Status("OK")
+                elif command == 'EXEC':
+                    if queued is None:
+                        reply = KVError("ERR EXEC without MULTI")
+                    else:
+                        with self.kv._lock:
+                            if any(self.kv.version(key) != version for key, version in watched.items()):
+                                reply = None
+                            else:
+                                reply = []
+                                for queued_args in queued:
+                                    try:
+                                        reply.append(self.kv.execute(*queued_args))
+                                    except KVError as e:
+                                        reply.append(e)
+                        if reply is None:
+                            writer.write(b"*-1\r\n")
+                            queued = None
+                            watched = {}
+                            continue
+                        queued = None
+                        watched = {}
+                elif queued is not None:
+                    queued.append(args)
+                    reply = Status("QUEUED")
+                elif command == 'SUBSCRIBE':
+                    for channel in args[1:]:
+                        self.kv.subscribe(channel, deliver)
+                        subscriptions.append(channel)
+                        writer.write(_encode_reply(["subscribe", channel, len(subscriptions)]))
+                    await writer.drain()
+                    continue
+                elif command in ('SELECT', 'AUTH'):
+                    reply = Status("OK")  # One database, no passwords
+                elif command == 'QUIT':
+                    writer.write(_encode_reply(Status("OK")))
+                    break
+                else:
+                    try:
+                        reply = self.kv.execute(*args)
+                    except KVError as e:
+                        reply = e
+                writer.write(_encode_reply(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscriptions:
+                self.kv.unsubscribe(channel, deliver)
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Redis-compatible stand-in for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    async def serve():
+        server = KVServer()
+        await server.start(args.host, args.port)
+        print(f"Key-value stand-in on {args.host}:{server.port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    # python kvstore.py --port 6379, then run the bot with STORAGE_BACKEND=redis
+    main()
@@ -0,0 +1,111 @@
+from sortedcontainers import SortedList
+
+CATEGORIES = ('winrate', 'streak', 'games', 'average')
+
+
+def ranking_key(category, stats):
+    """Sort key for a player's PlayerStats in a category (lowest ranks first), or None if they aren't ranked"""
+    if stats is None or stats.games_played == 0:
+        return None
+    if category == 'winrate':
+        return (-(stats.games_won / stats.games_played), -stats.games_played)
+    if category == 'streak':
+        return (-stats.max_streak, -stats.current_streak)
+    if category == 'games':
+        return (-stats.games_played,)
+    if category == 'average':
+        # Lower is better, and only players with wins have an average
+        return (stats.average_guesses,) if stats.games_won > 0 else None
+    raise ValueError(f"Unknown leaderboard category: {category}")
+
+
+class GuildLeaderboard:
+    """Players of one guild kept sorted in every category"""
+
+    def __init__(self):
+        self.members = set()
+        self.rankings = {category: SortedList() for category in CATEGORIES}
+        self._keys = {}  # user_id -> {category: (key, user_id)} currently in the rankings
+
+    def update(self, user_id, stats):
+        """Add a member or re-rank them after their stats changed, in O(log n) per category"""
+        self.members.add(user_id)
+        old = self._keys.pop(user_id, {})
+        new = {}
+        for category in CATEGORIES:
+            key = ranking_key(category, stats)
+            entry = (key, user_id) if key is not None else None
+            if old.get(category) == entry:
+                if entry is not None:
+                    new[category] = entry
+                continue
+            if category in old:
+                self.rankings[category].remove(old[category])
+            if entry is not None:
+                self.rankings[category].add(entry)
+                new[category] = entry
+        if new:
+            self._keys[user_id] = new
+
+    def remove(self, user_id):
+        self.members.discard(user_id)
+        for category, entry in self._keys.pop(user_id, {}).items():
+            self.rankings[category].remove(entry)
+
+    def top(self, category, limit=10):
+        """Get the user ids of the best players in a category"""
+        return [user_id for _, user_id in self.rankings[category].islice(0, limit)]
+
+    def count(self, category):
+        return len(self.rankings[category])
+
+
+class LeaderboardIndex:
+    """Per-guild leaderboards kept up to date as per-guild stats change
+
+    A guild's leaderboard is built from its stored stats the first time it
+    is asked for (and again after clear()), then updated incrementally.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.guilds = {}  # guild_id -> GuildLeaderboard
+
+    def clear(self):
+        self.guilds = {}
+
+    async def guild(self, guild_id):
+        board = self.guilds.get(guild_id)
+        if board is None:
+            players = await self.storage.guild_stats(guild_id)
+            board = self.guilds.get(guild_id)  # Unless it was built while the stats were read
+            if board is None:
+                board = GuildLeaderboard()
+                for user_id, stats in players.items():
+                    board.update(user_id, stats)
+                self.guilds[guild_id] = board
+        return board
+
+    def record(self, guild_id, user_id, stats):
+        """A user's stats in a guild changed"""
+        if guild_id in self.guilds:
+            self.guilds[guild_id].update(user_id, stats)
+
+    async def refresh(self, guild_id, user_id):
+        """Re-rank a user from their stored stats, after another process changed them"""
+        if guild_id not in self.guilds:
+            return
+        stats = await self.storage.get_guild_stats(guild_id, user_id)
+        board = self.guilds.get(guild_id)
+        if board is None:
+            return
+        if stats is None:
+            board.remove(user_id)
+        else:
+            board.update(user_id, stats)
+
+    async def top(self, guild_id, category, limit=10):
+        return (await self.guild(guild_id)).top(category, limit)
+
+    async def count(self, guild_id, category):
+        return (await self.guild(guild_id)).count(category)
@@ -0,0 +1,308 @@
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+import discord
+
+from bench import generate_state
+from persistence import write_json_atomic
+from storage import migrate_json_to_sqlite
+
+DEADLINE = 3.0  # Seconds Discord gives an interaction to get its first response
+
+
+class FakeResponse:
+    """Stand-in for interaction.response that records when the interaction was first answered"""
+
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self.responded_at = None
+        self.modal = None
+
+    def is_done(self):
+        return self.responded_at is not None
+
+    async def _respond(self):
+        if self.responded_at is not None:
+            raise discord.errors.InteractionResponded(self._interaction)
+        self.responded_at = time.perf_counter()
+        await self._interaction.api_call()
+
+    async def send_message(self, *args, **kwargs):
+        await self._respond()
+
+    async def edit_message(self, *args, **kwargs):
+        await self._respond()
+
+    async def defer(self, *args, **kwargs):
+        await self._respond()
+
+    async def send_modal(self, modal):
+        await self._respond()
+        self.modal = modal
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self._interaction = interaction
+
+    async def send(self, *args, **kwargs):
+        await self._interaction.api_call()
+
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.display_name = name
+        self.guild_permissions = discord.Permissions.none()
+
+
+class FakeGuild:
+    """A guild with nothing cached, so names come from stored results like after a restart"""
+
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+    def get_member(self, user_id):
+        return None
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the bot's handlers, with simulated API latency"""
+
+    ids = itertools.count(1)
+
+    def __init__(self, user, guild, api_latency):
+        self.id = next(self.ids)
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = None
+        self.created = time.perf_counter()
+        self.api_latency = api_latency
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+
+    async def api_call(self):
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.api_latency)
+
+    async def edit_original_response(self, *args, **kwargs):
+        await self.api_call()
+
+
+class Recorder:
+    """Per-handler time to first response, total time, deadline misses and errors"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def _handler(self, name):
+        return self.handlers.setdefault(name, {'first_response': [], 'total': [], 'missed_deadline': 0, 'errors': 0})
+
+    async def dispatch(self, name, handler, interaction, *args):
+        stats = self._handler(name)
+        try:
+            await handler(interaction, *args)
+        except Exception as e:
+            stats['errors'] += 1
+            print(f"{name} failed: {e!r}", file=sys.stderr)
+        now = time.perf_counter()
+        responded_at = interaction.response.responded_at
+        first_response = (responded_at if responded_at is not None else now) - interaction.created
+        stats['first_response'].append(first_response)
+        stats['total'].append(now - interaction.created)
+        if responded_at is None or first_response > DEADLINE:
+            stats['missed_deadline'] += 1
+
+
+def percentiles(samples):
+    """p50/p95/p99/max of samples in seconds, as milliseconds"""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+
+    def at(p):
+        return round(samples[min(len(samples) - 1, int(len(samples) * p))] * 1000, 2)
+    return {'p50_ms': at(0.50), 'p95_ms': at(0.95), 'p99_ms': at(0.99), 'max_ms': round(samples[-1] * 1000, 2)}
+
+
+async def monitor_loop_lag(samples, interval=0.01):
+    """Record how late each short sleep wakes up: time the loop spent blocked by something"""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+def seed_data(workdir, backend, guilds, users, days, seed):
+    """Write players' history up to yesterday where the bot will load it from; returns the path"""
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    state = generate_state(guilds, users, days, seed=seed, end=yesterday) if days > 0 else generate_state(guilds, 0, 1)
+    json_path = os.path.join(workdir, "wordle_data.json")
+    write_json_atomic(json_path, state)
+    if backend == 'sqlite':
+        db_path = os.path.join(workdir, "wordle_data.db")
+        migrate_json_to_sqlite(json_path, db_path)
+        return db_path
+    return json_path
+
+
+def load_app(workdir, storage_path, backend):
+    """Import the bot with its data files pointed at workdir"""
+    os.environ['STORAGE_BACKEND'] = backend
+    os.environ['STORAGE_PATH'] = storage_path
+    import app
+    app.active_games.snapshot_path = os.path.join(workdir, "active_games.json")
+    return app
+
+
+async def play(app, recorder, user, guild, words, rng, args):
+    """One player's session: start the daily game, guess until it ends, maybe look at the boards"""
+
+    def interaction():
+        return FakeInteraction(user, guild, args.api_latency_ms / 1000)
+
+    async def think():
+        await asyncio.sleep(rng.uniform(0, 2) * args.think_ms / 1000)
+
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    await recorder.dispatch("betterwordle", app.betterwordle.callback, interaction())
+
+    for _ in range(12):
+        game = app.active_games.get(user.id)
+        if game is None or game.completed:
+            break
+        await think()
+        view = app.WordleView()
+        if rng.random() < args.give_up_rate:
+            await recorder.dispatch("WordleView.give_up", view.give_up.callback, interaction())
+            break
+        if rng.random() < args.hint_rate:
+            await recorder.dispatch("hint", app.hint.callback, interaction())
+        click = interaction()
+        await recorder.dispatch("WordleView.make_guess", view.make_guess.callback, click)
+        modal = click.response.modal
+        if modal is None:
+            break
+        await think()
+        # Mostly real words, some typos that fail validation
+        modal.guess._value = rng.choice(words) if rng.random() > 0.05 else "qzxvj"
+        await recorder.dispatch("GuessModal.on_submit", modal.on_submit, interaction())
+
+    if rng.random() < args.browse_rate:
+        await think()
+        await recorder.dispatch("results", app.results.callback, interaction())
+        await think()
+        await recorder.dispatch("leaderboard", app.leaderboard.callback, interaction(),
+                                rng.choice(("winrate", "streak", "games", "average")))
+
+
+async def run(app, args):
+    rng = random.Random(args.seed)
+    app.storage.load()
+    app.storage.start()
+    app.active_games.start()
+    await app.SOLVER.run(app.SOLVER.warm)
+    words = list(app.WORDS.guesses)
+
+    lag = []
+    monitor = asyncio.create_task(monitor_loop_lag(lag))
+    recorder = Recorder()
+    players = []
+    for g in range(args.guilds):
+        guild = FakeGuild(900000000000000000 + g)
+        for u in range(args.users):
+            # Same ids as the seeded history, so these are returning players
+            user = FakeUser(100000000000000000 + g * args.users + u, f"player{g}_{u}")
+            players.append(play(app, recorder, user, guild, words, random.Random(rng.random()), args))
+
+    start = time.perf_counter()
+    await asyncio.gather(*players)
+    elapsed = time.perf_counter() - start
+    monitor.cancel()
+    await app.storage.flush()
+
+    handlers = {}
+    for name, stats in sorted(recorder.handlers.items()):
+        handlers[name] = {
+            'count': len(stats['total']),
+            'per_sec': round(len(stats['total']) / elapsed, 1),
+            'first_response': percentiles(stats['first_response']),
+            'total': percentiles(stats['total']),
+            'missed_deadline': stats['missed_deadline'],
+            'errors': stats['errors'],
+        }
+    return {
+        'players': args.guilds * args.users,
+        'elapsed_s': round(elapsed, 2),
+        'handlers': handlers,
+        'loop_lag': dict(percentiles(lag), blocked_s=round(sum(lag), 3),
+                         blocked_pct=round(sum(lag) / elapsed * 100, 1) if elapsed > 0 else 0),
+    }
+
+
+def print_report(report):
+    print(f"{report['players']} players in {report['elapsed_s']}s", file=sys.stderr)
+    print(f"{'handler':<24} {'count':>7} {'first p50':>10} {'first p99':>10} {'total p99':>10} {'max':>10} "
+          f"{'>3s':>5} {'err':>5}", file=sys.stderr)
+    for name, h in report['handlers'].items():
+        print(f"{name:<24} {h['count']:>7} {h['first_response']['p50_ms']:>8.1f}ms {h['first_response']['p99_ms']:>8.1f}ms "
+              f"{h['total']['p99_ms']:>8.1f}ms {h['total']['max_ms']:>8.1f}ms {h['missed_deadline']:>5} {h['errors']:>5}",
+              file=sys.stderr)
+    lag = report['loop_lag']
+    if lag.get('max_ms') is not None:
+        print(f"Event loop blocked {lag['blocked_s']}s ({lag['blocked_pct']}%), lag p99 {lag['p99_ms']}ms, "
+              f"max {lag['max_ms']}ms", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the bot's interaction handlers with simulated players")
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--users", type=int, default=100, help="players per guild, all playing concurrently")
+    parser.add_argument("--days", type=int, default=30, help="days of seeded history before today")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which players arrive")
+    parser.add_argument("--think-ms", type=float, default=200, help="average pause between a player's actions")
+    parser.add_argument("--api-latency-ms", type=float, default=50, help="average simulated Discord API call time")
+    parser.add_argument("--give-up-rate", type=float, default=0.02)
+    parser.add_argument("--hint-rate", type=float, default=0.05)
+    parser.add_argument("--browse-rate", type=float, default=0.3, help="share of players who check /results and /leaderboard")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slow-callback-ms", type=float,
+                        help="run the loop in asyncio debug mode and log every callback that blocks this long")
+    parser.add_argument("--output", help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        storage_path = seed_data(workdir, args.backend, args.guilds, args.users, args.days, args.seed)
+        app = load_app(workdir, storage_path, args.backend)
+
+        async def start():
+            if args.slow_callback_ms is not None:
+                asyncio.get_running_loop().slow_callback_duration = args.slow_callback_ms / 1000
+            return await run(app, args)
+
+        if args.slow_callback_ms is not None:
+            logging.basicConfig(level=logging.WARNING)
+        report = asyncio.run(start(), debug=args.slow_callback_ms is not None)
+        app.storage.close()
+        app.SOLVER.close()
+
+    report['params'] = vars(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    # python loadtest.py [--guilds 10 --users 100] [--backend sqlite] [--output load.json]
+    main()
@@ -0,0 +1,212 @@
+import functools
+import sys
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import aiohttp
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_handler_code = set()  # Code of the instrument() wrappers, to spot them in a stack
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value):
+    if value != value:
+        return "NaN"
+    if value in (float('inf'), float('-inf')):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def running_handler(frame):
+    """Name of the innermost instrumented handler a stack frame is running in, if any"""
+    while frame is not None:
+        if frame.f_code in _handler_code:
+            return frame.f_locals.get('handler')
+        frame = frame.f_back
+    return None
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum"""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last is above the highest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Counters, histograms and gauges, rendered in the Prometheus text format
+
+    Everything is updated from the event loop, so there is no locking.
+    """
+
+    def __init__(self, prefix="wordle_"):
+        self.prefix = prefix
+        self._families = {}  # name -> (type, help)
+        self._counters = {}  # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: Histogram}
+        self._gauges = {}  # name -> read() returning a number
+        self._runner = None
+
+    def _family(self, name, kind, help_text):
+        name = self.prefix + name
+        if name not in self._families:
+            self._families[name] = (kind, help_text or name)
+        return name
+
+    def inc(self, name, labels=None, value=1, help_text=None):
+        name = self._family(name, 'counter', help_text)
+        series = self._counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, labels=None, buckets=LATENCY_BUCKETS, help_text=None):
+        name = self._family(name, 'histogram', help_text)
+        series = self._histograms.setdefault(name, {})
+        key = _labels(labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def gauge(self, name, read, help_text=None, label=None):
+        """Register a gauge whose value is read when metrics are scraped
+
+        With label, read() returns {label value: value}, one series each.
+        """
+        self._gauges[self._family(name, 'gauge', help_text)] = (read, label)
+
+    @contextmanager
+    def timer(self, name, labels=None, help_text=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels, help_text=help_text)
+
+    def instrument(self, handler):
+        """Decorate an async handler to count its calls and errors and time it
+
+        The wrapper keeps the handler's signature, so it can sit under
+        @bot.tree.command or @discord.ui.button.
+        """
+        def decorate(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                outcome = 'ok'
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    outcome = 'error'
+                    raise
+                finally:
+                    self.observe("handler_seconds", time.perf_counter() - start, {'handler': handler},
+                                 help_text="Time spent in interaction handlers and tasks")
+                    self.inc("handler_calls_total", {'handler': handler, 'outcome': outcome},
+                             help_text="Handler calls by outcome")
+            _handler_code.add(wrapper.__code__)
+            return wrapper
+        return decorate
+
+    def http_trace(self):
+        """An aiohttp TraceConfig recording the size of each HTTP request an instrumented handler makes
+
+        Passed to the bot as http_trace, it sees every Discord API call, so a
+        handler's interaction responses, follow-ups and messages are measured
+        as sent. Requests made outside a handler are not recorded.
+        """
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            # Still on the handler's own stack here, unlike when the body is written
+            context.handler = running_handler(sys._getframe())
+            context.size = 0
+
+        async def on_request_chunk_sent(session, context, params):
+            context.size += len(params.chunk)
+
+        async def on_request_end(session, context, params):
+            if context.handler is not None:
+                self.observe("handler_response_bytes", context.size, {'handler': context.handler},
+                             buckets=SIZE_BUCKETS, help_text="Size of the Discord API requests handlers make")
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    def render(self):
+        lines = []
+        for name, (kind, help_text) in self._families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for labels, value in self._counters.get(name, {}).items():
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+            elif kind == 'histogram':
+                for labels, histogram in self._histograms.get(name, {}).items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', _format_value(bound))])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            else:
+                read, label = self._gauges[name]
+                try:
+                    value = read()
+                except Exception as e:
+                    print(f"Error reading gauge {name}: {e}")
+                    continue
+                if label is None:
+                    lines.append(f"{name} {_format_value(value)}")
+                else:
+                    for key, series_value in value.items():
+                        lines.append(f"{name}{_format_labels([(label, key)])} {_format_value(series_value)}")
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, request):
+        return web.Response(body=self.render().encode(), headers={'Content-Type': CONTENT_TYPE})
+
+    async def start_server(self, host, port):
+        """Serve /metrics over HTTP; call on the event loop"""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop_server(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+
+from aiohttp import WSMsgType, web
+
+from sharding import shard_for_guild
+
+APPLICATION_ID = "1000000000000000001"
+BOT_USER = {'id': APPLICATION_ID, 'username': "Better Wordle", 'discriminator': "0000", 'global_name': None,
+            'avatar': None, 'bot': True}
+
+# Gateway opcodes
+DISPATCH, HEARTBEAT, IDENTIFY, RESUME, INVALID_SESSION, HELLO, HEARTBEAT_ACK = 0, 1, 2, 6, 9, 10, 11
+
+
+def _json(data, status=200):
+    # discord.py only parses bodies whose content type is exactly application/json
+    return web.Response(body=json.dumps(data).encode(), status=status, headers={'Content-Type': "application/json"})
+
+
+def point_discord_at(api_url, gateway_url=None):
+    """Send discord.py's HTTP requests and gateway connections somewhere else, e.g. this mock"""
+    import discord
+    import yarl
+    discord.http.Route.BASE = api_url.rstrip("/")
+    if gateway_url:
+        discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(gateway_url)
+
+
+def mock_guild_id(i):
+    """Snowflake-shaped guild ids, spread across shards like real ones"""
+    return str(((1_600_000_000_000 + i * 7919) << 22) | i)
+
+
+class MockDiscord:
+    """Just enough of Discord's REST API and gateway to run the bot locally
+
+    Every shard that identifies gets READY plus GUILD_CREATE for the mock
+    guilds on that shard, heartbeats are acknowledged, slash command syncs are
+    accepted, and posted messages are counted per channel so tests can check
+    which shard sent what.
+    """
+
+    def __init__(self, guilds, shard_count, heartbeat_ms=41250):
+        self.shard_count = shard_count
+        self.heartbeat_ms = heartbeat_ms
+        self.guild_ids = [mock_guild_id(i) for i in range(guilds)]
+        self.identified = {}  # shard id -> times identified
+        self.messages = {}  # channel id -> messages posted
+        self.command_syncs = 0
+        self._ids = itertools.count(2_000_000_000_000_000_000)
+        self.port = None
+
+    def snowflake(self):
+        return str(next(self._ids))
+
+    def guild(self, guild_id):
+        channel_id = str(int(guild_id) + 1)
+        return {
+            'id': guild_id, 'name': f"Mock Guild {guild_id[-4:]}", 'icon': None, 'owner_id': "1", 'member_count': 50,
+            'large': False, 'unavailable': False, 'joined_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'features': [], 'emojis': [], 'stickers': [], 'members': [], 'voice_states': [], 'presences': [],
+            'threads': [], 'stage_instances': [], 'guild_scheduled_events': [], 'verification_level': 0,
+            'default_message_notifications': 0, 'explicit_content_filter': 0, 'mfa_level': 0, 'nsfw_level': 0,
+            'premium_tier': 0, 'preferred_locale': "en-US", 'system_channel_flags': 0, 'afk_timeout': 300,
+            'roles': [{'id': guild_id, 'name': "@everyone", 'permissions': "2248473465835073", 'position': 0,
+                       'color': 0, 'hoist': False, 'managed': False, 'mentionable': False, 'flags': 0}],
+            'channels': [{'id': channel_id, 'type': 0, 'name': "wordle", 'position': 0, 'guild_id': guild_id,
+                          'permission_overwrites': [], 'nsfw': False, 'topic': None, 'parent_id': None}],
+        }
+
+    # REST API
+
+    async def gateway_bot(self, request):
+        return _json({'url': f"ws://127.0.0.1:{self.port}/gateway", 'shards': self.shard_count,
+                                  'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0,
+                                                          'max_concurrency': 1}})
+
+    async def me(self, request):
+        return _json(BOT_USER)
+
+    async def application(self, request):
+        return _json({'id': APPLICATION_ID, 'name': BOT_USER['username'], 'description': "", 'icon': None,
+                      'bot_public': False, 'bot_require_code_grant': False, 'verify_key': "0" * 64, 'flags': 0,
+                      'owner': {'id': "1", 'username': "owner", 'discriminator': "0000", 'avatar': None}})
+
+    async def sync_commands(self, request):
+        self.command_syncs += 1
+        commands = await request.json()
+        for command in commands:
+            command.update(id=self.snowflake(), application_id=APPLICATION_ID, version=self.snowflake())
+        return _json(commands)
+
+    async def post_message(self, request):
+        channel_id = request.match_info['channel_id']
+        payload = await request.json()
+        self.messages[channel_id] = self.messages.get(channel_id, 0) + 1
+        return _json({
+            'id': self.snowflake(), 'channel_id': channel_id, 'author': BOT_USER, 'content': payload.get('content') or "",
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(), 'edited_timestamp': None,
+            'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [], 'attachments': [],
+            'embeds': payload.get('embeds') or [], 'pinned': False, 'type': 0, 'flags': 0,
+        })
+
+    async def stats(self, request):
+        """Not a Discord endpoint: what the mock has seen, for tests"""
+        return _json({'identified': self.identified, 'messages': self.messages,
+                                  'command_syncs': self.command_syncs})
+
+    async def unknown(self, request):
+        return _json({'message': "Unknown route (mock)", 'code': 0}, status=404)
+
+    # Gateway
+
+    async def gateway(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        sequence = itertools.count(1)
+        await ws.send_str(json.dumps({'op': HELLO, 'd': {'heartbeat_interval': self.heartbeat_ms}}))
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            op = payload.get('op')
+            if op == HEARTBEAT:
+                await ws.send_str(json.dumps({'op': HEARTBEAT_ACK, 'd': None}))
+            elif op == IDENTIFY:
+                shard_id, shard_count = payload['d'].get('shard') or (0, 1)
+                self.identified[shard_id] = self.identified.get(shard_id, 0) + 1
+                guild_ids = [g for g in self.guild_ids if shard_for_guild(g, shard_count) == shard_id]
+                ready = {'v': 10, 'user': BOT_USER, 'session_id': self.snowflake(), 'shard': [shard_id, shard_count],
+                         'resume_gateway_url': f"ws://127.0.0.1:{self.port}/gateway",
+                         'application': {'id': APPLICATION_ID, 'flags': 0},
+                         'guilds': [{'id': g, 'unavailable': True} for g in guild_ids]}
+                await ws.send_str(json.dumps({'op': DISPATCH, 't': "READY", 's': next(sequence), 'd': ready}))
+                for guild_id in guild_ids:
+                    await ws.send_str(json.dumps({'op': DISPATCH, 't': "GUILD_CREATE", 's': next(sequence),
+                                                  'd': self.guild(guild_id)}))
+            elif op == RESUME:
+                # Sessions aren't kept, so make the shard identify again
+                await ws.send_str(json.dumps({'op': INVALID_SESSION, 'd': False}))
+        return ws
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/gateway", self.gateway)
+        app.router.add_get("/api/v10/gateway/bot", self.gateway_bot)
+        app.router.add_get("/api/v10/users/@me", self.me)
+        app.router.add_get("/api/v10/oauth2/applications/@me", self.application)
+        app.router.add_put("/api/v10/applications/{application_id}/commands", self.sync_commands)
+        app.router.add_post("/api/v10/channels/{channel_id}/messages", self.post_message)
+        app.router.add_get("/mock/stats", self.stats)
+        app.router.add_route("*", "/{tail:.*}", self.unknown)
+        return app
+
+    async def start(self, port=0):
+        runner = web.AppRunner(self.app(), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", port)
+        await site.start()
+        self.port = runner.addresses[0][1]
+        return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for Discord's API and gateway")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--guilds", type=int, default=100)
+    parser.add_argument("--shard-count", type=int, default=1)
+    parser.add_argument("--heartbeat-ms", type=int, default=41250)
+    args = parser.parse_args()
+
+    async def serve():
+        mock = MockDiscord(args.guilds, args.shard_count, args.heartbeat_ms)
+        await mock.start(args.port)
+        print(f"Mock Discord on port {mock.port} with {args.guilds} guilds over {args.shard_count} shards")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    # python mockgateway.py --guilds 100 --shard-count 4, then run the bot with
+    # DISCORD_API_URL=http://127.0.0.1:8765/api/v10 DISCORD_GATEWAY_URL=ws://127.0.0.1:8765/gateway
+    main()
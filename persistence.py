@@ -0,0 +1,297 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Every mutation the bot makes is written as one JSON line to the log:
+#   {"op": "result", "guild_id", "date", "user_id", "result"}
+#   {"op": "result_removed", "guild_id", "date", "user_id"}
+#   {"op": "user_stats", "user_id", "stats"}
+#   {"op": "guild_settings", "guild_id", "settings"}
+#   {"op": "guild_stats", "guild_id", "user_id", "stats"}  (stats is a PlayerStats row)
+# Records replace whole rows, so replaying one twice is harmless.
+
+
+def empty_state():
+    """Get a fresh, empty game data state"""
+    return {'daily_results': {}, 'guild_settings': {}, 'user_stats': {}, 'guild_stats': {}}
+
+
+def apply_record(state, record):
+    """Apply one logged mutation to a state dict"""
+    op = record.get('op')
+    if op == 'result':
+        guild = state['daily_results'].setdefault(record['guild_id'], {})
+        guild.setdefault(record['date'], {})[record['user_id']] = record['result']
+    elif op == 'result_removed':
+        guild = state['daily_results'].get(record['guild_id'], {})
+        day = guild.get(record['date'])
+        if day is not None:
+            day.pop(record['user_id'], None)
+            if len(day) == 0:
+                del guild[record['date']]
+    elif op == 'user_stats':
+        state['user_stats'][record['user_id']] = record['stats']
+    elif op == 'guild_settings':
+        state['guild_settings'][record['guild_id']] = record['settings']
+    elif op == 'guild_stats':
+        state['guild_stats'].setdefault(record['guild_id'], {})[record['user_id']] = record['stats']
+    else:
+        print(f"Skipping unknown data log record: {op}")
+
+
+def encode_records(records):
+    """Encode records as log lines"""
+    return "".join(json.dumps(r, separators=(',', ':')) + "\n" for r in records)
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file, fsync it and rename it over path"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class WriteAheadLog:
+    """Snapshot file plus an append-only log of mutations since the snapshot"""
+
+    def __init__(self, snapshot_path, compact_after=1000):
+        self.snapshot_path = snapshot_path
+        base, _ = os.path.splitext(snapshot_path)
+        self.log_path = base + ".log"
+        self.compacting_path = base + ".log.compacting"
+        self.compact_after = compact_after
+        self.records_since_compact = 0
+        self._log_file = None
+        self._lock = threading.Lock()  # guards the open log file
+        self._compact_lock = threading.Lock()  # one compaction at a time
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return empty_state()
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read {self.snapshot_path}: {e}")
+            return empty_state()
+        state = empty_state()
+        for key in state:
+            state[key] = data.get(key, {})
+        return state
+
+    def _replay(self, path, state):
+        """Replay a log file into state, returning the number of records applied"""
+        if not os.path.exists(path):
+            return 0
+        applied = 0
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write
+                    print(f"Skipping corrupt record in {path}")
+                    continue
+                apply_record(state, record)
+                applied += 1
+        return applied
+
+    def load(self):
+        """Rebuild state from the snapshot plus any logged mutations"""
+        with self._compact_lock:
+            state = self._read_snapshot()
+            # A leftover compacting file means a compaction was interrupted
+            replayed = self._replay(self.compacting_path, state)
+            replayed += self._replay(self.log_path, state)
+        self.records_since_compact = replayed
+        return state
+
+    def append(self, record):
+        """Append one mutation record to the log"""
+        self.append_many([record])
+
+    def append_many(self, records):
+        """Append several mutation records with a single write"""
+        if records:
+            self.write(encode_records(records), len(records))
+
+    def write(self, payload, count, fsync=False):
+        """Append pre-encoded record lines to the log"""
+        with self._lock:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, 'a')
+            self._log_file.write(payload)
+            self._log_file.flush()
+            if fsync:
+                os.fsync(self._log_file.fileno())
+            self.records_since_compact += count
+
+    def needs_compaction(self):
+        return self.records_since_compact >= self.compact_after
+
+    # DataWriter sink interface: encode() runs on the event loop, the rest on the writer thread
+
+    def encode(self, records):
+        return encode_records(records), len(records)
+
+    def write_batch(self, batch):
+        payload, count = batch
+        self.write(payload, count, fsync=True)
+
+    def batch_size(self, batch):
+        return len(batch[0].encode())
+
+    def maintain(self):
+        if self.needs_compaction():
+            self.compact()
+
+    def compact(self):
+        """Fold the log into a new snapshot; safe to run on a worker thread"""
+        with self._compact_lock:
+            with self._lock:
+                # Move the current log aside so appends can continue meanwhile
+                if self._log_file is not None:
+                    self._log_file.close()
+                    self._log_file = None
+                if not os.path.exists(self.log_path):
+                    self.records_since_compact = 0
+                elif not os.path.exists(self.compacting_path):
+                    os.replace(self.log_path, self.compacting_path)
+                    self.records_since_compact = 0
+                # Otherwise a compaction that didn't finish is folded in first, and the log
+                # keeps its count so the next maintain() compacts it
+
+            if not os.path.exists(self.compacting_path):
+                return
+            state = self._read_snapshot()
+            self._replay(self.compacting_path, state)
+            write_json_atomic(self.snapshot_path, state)
+            os.remove(self.compacting_path)
+
+    def close(self):
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+
+class DataWriter:
+    """Coalesces dirty rows and flushes them to a sink off the event loop
+
+    A sink provides encode(records) (called on the event loop, so it may read
+    live state), write_batch(batch), batch_size(batch) and maintain() (called
+    on the writer thread), and close(). on_flush, if set, is called on the
+    event loop after each write with (records, encode seconds, write seconds,
+    bytes written). A write that fails leaves its rows pending, and the
+    background flush retries with backoff.
+    """
+
+    def __init__(self, sink, interval_ms=500, max_retry_delay=60):
+        self.sink = sink
+        self.interval = interval_ms / 1000
+        self.max_retry_delay = max_retry_delay  # Seconds between retries while writes keep failing
+        self.on_flush = None
+        self._pending = {}  # row key -> callable building that row's latest record
+        self._inflight = set()  # row keys drained but not yet on disk
+        self._dirty = None  # created in start(), on the bot's event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="data-writer")
+        self._task = None
+
+    def mark_dirty(self, key, build_record):
+        """Queue a row for the next flush; only its latest state gets written"""
+        self._pending.pop(key, None)
+        self._pending[key] = build_record
+        if self._dirty is not None:
+            self._dirty.set()
+
+    def is_pending(self, key):
+        """Whether a row has changes that may not be on disk yet"""
+        return key in self._pending or key in self._inflight
+
+    def _drain(self):
+        """Encode pending rows on the calling thread, so the writer never reads live state"""
+        if not self._pending:
+            return None, {}
+        pending, self._pending = self._pending, {}
+        records = [build() for build in pending.values()]
+        return self.sink.encode(records), pending
+
+    def _requeue(self, drained):
+        """Put rows from a failed write back, unless they were changed again since (the newer state wins)"""
+        requeued = {key: build for key, build in drained.items() if key not in self._pending}
+        requeued.update(self._pending)
+        self._pending = requeued
+
+    def _write(self, batch):
+        size = 0
+        if batch is not None:
+            self.sink.write_batch(batch)
+            size = self.sink.batch_size(batch)
+        self.sink.maintain()
+        return size
+
+    async def flush(self):
+        """Write everything pending on the writer thread"""
+        start = time.perf_counter()
+        batch, drained = self._drain()
+        encoded = time.perf_counter()
+        self._inflight.update(drained)
+        try:
+            loop = asyncio.get_running_loop()
+            size = await loop.run_in_executor(self._executor, self._write, batch)
+        except BaseException:
+            # Nothing from this batch is known to be written, so it stays pending
+            self._requeue(drained)
+            raise
+        finally:
+            self._inflight.difference_update(drained)
+        if self.on_flush is not None and batch is not None:
+            self.on_flush(len(drained), encoded - start, time.perf_counter() - encoded, size)
+
+    async def _run(self):
+        failures = 0
+        while True:
+            await self._dirty.wait()
+            # Let a burst of mutations collect into one write
+            await asyncio.sleep(self.interval)
+            self._dirty.clear()
+            try:
+                await self.flush()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                delay = min(self.max_retry_delay, self.interval * 2 ** failures)
+                print(f"Error flushing game data, retrying in {delay:.1f}s: {e}")
+                self._dirty.set()
+                await asyncio.sleep(delay)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._dirty = asyncio.Event()
+            if self._pending:
+                self._dirty.set()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def is_running(self):
+        return self._task is not None and not self._task.done()
+
+    def flush_sync(self):
+        """Final blocking flush for shutdown, after the event loop has stopped"""
+        self._executor.shutdown(wait=True)
+        batch, drained = self._drain()
+        if batch is not None:
+            try:
+                self.sink.write_batch(batch)
+            except Exception:
+                self._requeue(drained)
+                raise
+        self.sink.close()
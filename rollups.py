@@ -0,0 +1,99 @@
+from collections import OrderedDict
+
+SCORES = ("1/6", "2/6", "3/6", "4/6", "5/6", "6/6", "X/6")
+FAIL = 6  # Index of X/6 in SCORES and the histogram
+
+
+class DailyRollup:
+    """Running totals of one guild's results for one day
+
+    Only the first few names of each score are kept, so a rollup is the same
+    size (and renders in the same time) for 5 players or 5,000. version goes
+    up with every result, and memo() caches anything rendered from it until
+    the next one.
+    """
+
+    __slots__ = ('names_per_score', 'version', 'players', 'wins', 'histogram', 'guess_sum',
+                 'fastest_time', 'fastest_player', 'names', '_memo')
+
+    def __init__(self, names_per_score=10):
+        self.names_per_score = names_per_score
+        self.version = 0
+        self.players = 0
+        self.wins = 0
+        self.histogram = [0] * len(SCORES)  # Players per score, X/6 last
+        self.guess_sum = 0  # Guesses over won games
+        self.fastest_time = None  # Fastest win under 5 minutes
+        self.fastest_player = None
+        self.names = [[] for _ in SCORES]  # First names_per_score players of each score, in finishing order
+        self._memo = {}
+
+    def add(self, result):
+        score = result['guesses'] - 1 if result['won'] else FAIL
+        self.players += 1
+        self.histogram[score] += 1
+        if len(self.names[score]) < self.names_per_score:
+            self.names[score].append(result['username'])
+        if result['won']:
+            self.wins += 1
+            self.guess_sum += result['guesses']
+            game_time = result.get('game_time')
+            if game_time is not None and game_time < 300 and (self.fastest_time is None or game_time < self.fastest_time):
+                self.fastest_time = game_time
+                self.fastest_player = result['username']
+        self.version += 1
+
+    @property
+    def average_guesses(self):
+        return round(self.guess_sum / self.wins, 1) if self.wins > 0 else 0
+
+    def score_names(self, score):
+        """Get (names shown, how many more) for a score index"""
+        names = self.names[score]
+        return names, self.histogram[score] - len(names)
+
+    def memo(self, key, build):
+        """Get build() as of this version, building it only after the rollup changed"""
+        cached = self._memo.get(key)
+        if cached is None or cached[0] != self.version:
+            cached = (self.version, build())
+            self._memo[key] = cached
+        return cached[1]
+
+
+class RollupIndex:
+    """Daily rollups per (guild, date), kept current as results come in
+
+    A rollup is built from stored results the first time it is asked for,
+    then updated with record(). Removing a result invalidates it, since
+    the fastest player can't be taken back out incrementally.
+    """
+
+    def __init__(self, storage, max_size=20000):
+        self.storage = storage
+        self.max_size = max_size
+        self._rollups = OrderedDict()  # (guild_id, date) -> DailyRollup
+
+    async def get(self, guild_id, date):
+        key = (guild_id, date)
+        if key not in self._rollups:
+            results = await self.storage.get_results(guild_id, date)
+            if key not in self._rollups:  # Unless it was built while the results were read
+                rollup = DailyRollup()
+                for result in results.values():
+                    rollup.add(result)
+                self._rollups[key] = rollup
+                while len(self._rollups) > self.max_size:
+                    self._rollups.popitem(last=False)
+                return rollup
+        self._rollups.move_to_end(key)
+        return self._rollups[key]
+
+    def record(self, guild_id, date, result):
+        """A new result was stored"""
+        rollup = self._rollups.get((guild_id, date))
+        if rollup is not None:
+            rollup.add(result)
+
+    def invalidate(self, guild_id, date):
+        self._rollups.pop((guild_id, date), None)
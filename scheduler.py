@@ -0,0 +1,151 @@
+import asyncio
+import datetime
+import random
+import time
+
+
+class RateLimiter:
+    """Token bucket shared by every request a job makes
+
+    discord.py already waits out 429s per route; this keeps a big fan-out
+    comfortably under the global request limit so it rarely hits them.
+    """
+
+    def __init__(self, rate_per_second, burst=None):
+        self.rate = rate_per_second
+        self.capacity = burst or rate_per_second
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class JobRun:
+    """Progress and per-item outcome of one run of a job"""
+
+    def __init__(self, name, key, items):
+        self.name = name
+        self.key = key
+        self.started_at = datetime.datetime.now()
+        self.finished_at = None
+        self.results = {item: 'pending' for item in items}  # item -> pending/ok/skipped: why/failed: why
+        self.attempts = {}
+
+    def count(self, prefix):
+        return sum(1 for status in self.results.values() if status.startswith(prefix))
+
+    def summary(self):
+        state = "finished" if self.finished_at else "running"
+        return (f"{self.name} {self.key} ({state}): {self.count('ok')} ok, {self.count('skipped')} skipped, "
+                f"{self.count('failed')} failed, {self.count('pending')} pending")
+
+
+class Job:
+    """Fans a worker out over many items with bounded concurrency, rate limiting and retries
+
+    The worker is awaited as worker(item, job) and returns None on success or
+    a reason string when it skipped the item. It should send requests
+    through job.call() so they are rate limited and retried. Requests are
+    only retried when retryable(error) says so, which must only be true for
+    errors that mean the request did not go through: a resent message that
+    had been posted after all would be posted twice.
+    """
+
+    def __init__(self, name, worker, concurrency=10, rate_per_second=25, max_attempts=4,
+                 base_delay=2.0, retryable=None):
+        self.name = name
+        self.worker = worker
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate_per_second)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.retryable = retryable or (lambda e: isinstance(e, (asyncio.TimeoutError, OSError)))
+        self.current_run = None
+        self.last_run = None
+        self._run_lock = asyncio.Lock()
+
+    async def call(self, request):
+        """Await request() under the rate limiter, retrying transient errors with backoff"""
+        attempt = 1
+        while True:
+            await self.limiter.acquire()
+            try:
+                return await request()
+            except Exception as e:
+                if attempt >= self.max_attempts or not self.retryable(e):
+                    raise
+                delay = self.base_delay * 2 ** (attempt - 1)
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+                attempt += 1
+
+    async def _run_item(self, run, semaphore, item):
+        async with semaphore:
+            try:
+                reason = await self.worker(item, self)
+                run.results[item] = 'ok' if reason is None else f"skipped: {reason}"
+            except Exception as e:
+                run.results[item] = f"failed: {e}"
+                print(f"{self.name} failed for {item}: {e}")
+
+    async def run(self, key, items):
+        """Run the worker over items, one run at a time, and return the JobRun"""
+        async with self._run_lock:
+            run = JobRun(self.name, key, items)
+            self.current_run = run
+            semaphore = asyncio.Semaphore(self.concurrency)
+            try:
+                await asyncio.gather(*(self._run_item(run, semaphore, item) for item in items))
+            finally:
+                run.finished_at = datetime.datetime.now()
+                self.current_run = None
+                self.last_run = run
+            print(run.summary())
+            return run
+
+
+class DailySchedule:
+    """Calls a coroutine once at startup (to catch up) and then every day at a local time"""
+
+    def __init__(self, hour, minute, callback):
+        self.hour = hour
+        self.minute = minute
+        self.callback = callback
+        self.next_run = None
+        self._task = None
+
+    def seconds_until_next_run(self):
+        now = datetime.datetime.now()
+        next_run = now.replace(hour=self.hour, minute=self.minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += datetime.timedelta(days=1)
+        self.next_run = next_run
+        return (next_run - now).total_seconds()
+
+    async def _loop(self):
+        try:
+            await self.callback(catch_up=True)
+        except Exception as e:
+            print(f"Error catching up scheduled job: {e}")
+        while True:
+            await asyncio.sleep(self.seconds_until_next_run())
+            try:
+                await self.callback(catch_up=False)
+            except Exception as e:
+                print(f"Error running scheduled job: {e}")
+
+    def start(self):
+        if not self.is_running():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def is_running(self):
+        return self._task is not None and not self._task.done()
@@ -0,0 +1,229 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from persistence import write_json_atomic
+
+
+class TimerWheel:
+    """Hashed timer wheel: scheduling is O(1) and each tick only looks at one slot
+
+    A key has at most one deadline; scheduling it again moves it. Deadlines
+    further out than one turn of the wheel simply wait for a later turn.
+    """
+
+    def __init__(self, tick=1.0, slots=1024):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]  # key -> tick number it is due at
+        self.current = int(time.monotonic() / tick)
+        self._due = {}  # key -> tick number
+
+    def schedule(self, key, deadline):
+        self.cancel(key)
+        due = max(int(-(-deadline // self.tick)), self.current + 1)
+        self.slots[due % len(self.slots)][key] = due
+        self._due[key] = due
+
+    def cancel(self, key):
+        due = self._due.pop(key, None)
+        if due is not None:
+            del self.slots[due % len(self.slots)][key]
+
+    def advance(self, now):
+        """Move the wheel up to now and return the keys that became due"""
+        target = int(now / self.tick)
+        expired = []
+        steps = min(target - self.current, len(self.slots))
+        for number in range(self.current + 1, self.current + 1 + steps):
+            slot = self.slots[number % len(self.slots)]
+            for key in [key for key, due in slot.items() if due <= target]:
+                del slot[key]
+                del self._due[key]
+                expired.append(key)
+        self.current = max(self.current, target)
+        return expired
+
+    def __len__(self):
+        return len(self._due)
+
+
+class SessionManager:
+    """In-progress games per user, expired when idle and snapshotted to disk
+
+    Games idle for longer than ttl seconds are dropped by a timer wheel, and
+    when there are more than max_sessions the least recently used go first.
+    Every snapshot_interval seconds the games that changed are written to
+    snapshot_path (games must have to_snapshot()), so restore() can bring
+    them back after a restart. Games dropped for being idle or over the limit
+    are closed (games must have close()).
+    """
+
+    def __init__(self, ttl=1800, max_sessions=10000, snapshot_path=None, snapshot_interval=30, tick=1.0):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.tick = tick
+        self.games = OrderedDict()  # user_id -> game, least recently used first
+        self.wheel = TimerWheel(tick, slots=int(ttl / tick) + 1)
+        self.expired_count = 0
+        self._dirty = False
+        self._task = None
+
+    def __contains__(self, user_id):
+        return user_id in self.games
+
+    def __len__(self):
+        return len(self.games)
+
+    def get(self, user_id):
+        return self.games.get(user_id)
+
+    def add(self, user_id, game):
+        self.games[user_id] = game
+        self.touch(user_id)
+        while len(self.games) > self.max_sessions:
+            oldest = next(iter(self.games))
+            self.remove(oldest).close()
+            self.expired_count += 1
+            print(f"Too many active games, dropped the game of user {oldest}")
+
+    def touch(self, user_id):
+        """A game was played: push its expiry back and include it in the next snapshot"""
+        if user_id in self.games:
+            self.games.move_to_end(user_id)
+            self.wheel.schedule(user_id, time.monotonic() + self.ttl)
+            self._dirty = True
+
+    def remove(self, user_id):
+        game = self.games.pop(user_id, None)
+        if game is not None:
+            self.wheel.cancel(user_id)
+            self._dirty = True
+        return game
+
+    def expire(self, now=None):
+        """Drop the games that have been idle for too long"""
+        expired = self.wheel.advance(time.monotonic() if now is None else now)
+        for user_id in expired:
+            game = self.games.pop(user_id, None)
+            if game is not None:
+                game.close()
+        if expired:
+            self.expired_count += len(expired)
+            self._dirty = True
+        return expired
+
+    def snapshot(self):
+        return {'games': {str(user_id): game.to_snapshot() for user_id, game in self.games.items()}}
+
+    def save(self):
+        """Write the snapshot now (used at shutdown)"""
+        if self.snapshot_path:
+            write_json_atomic(self.snapshot_path, self.snapshot())
+            self._dirty = False
+
+    def restore(self, load_game):
+        """Bring back snapshotted games; load_game(data) returns a game or None to drop it"""
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return 0
+        try:
+            with open(self.snapshot_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read active games snapshot: {e}")
+            return 0
+        restored = 0
+        for user_id, game_data in data.get('games', {}).items():
+            try:
+                game = load_game(game_data)
+            except Exception as e:
+                print(f"Could not restore the game of user {user_id}: {e}")
+                game = None
+            if game is not None:
+                self.add(int(user_id), game)
+                restored += 1
+        self._dirty = False
+        return restored
+
+    async def _run(self):
+        last_snapshot = time.monotonic()
+        while True:
+            await asyncio.sleep(self.tick)
+            self.expire()
+            if self._dirty and self.snapshot_path and time.monotonic() - last_snapshot >= self.snapshot_interval:
+                # Encode on the loop thread, write on a worker thread
+                data = self.snapshot()
+                self._dirty = False
+                last_snapshot = time.monotonic()
+                try:
+                    await asyncio.to_thread(write_json_atomic, self.snapshot_path, data)
+                except OSError as e:
+                    self._dirty = True
+                    print(f"Could not save active games: {e}")
+
+    def start(self):
+        if not self.is_running():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def is_running(self):
+        return self._task is not None and not self._task.done()
+
+
+class KeyedLocks:
+    """One asyncio.Lock per key, so work on a key (a user's game) happens one at a time
+
+    Different keys never wait for each other. A key's lock only exists while
+    someone holds or waits for it; at most max_keys exist at once, and past
+    that a new key waits for one to be released.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._locks = {}  # key -> [lock, holders and waiters]
+        self._slots = None  # Semaphore of max_keys, created on the event loop
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key):
+        entry = self._locks.get(key)
+        if entry is None:
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_keys)
+            await self._slots.acquire()
+            entry = self._locks.get(key)  # Someone else may have created it meanwhile
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            else:
+                self._slots.release()
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+                self._slots.release()
+
+
+class RecentKeys:
+    """The last max_size keys seen, to notice repeats such as a redelivered interaction"""
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._seen = OrderedDict()
+
+    def first_time(self, key):
+        """Remember key, returning False if it was already seen"""
+        if key in self._seen:
+            return False
+        self._seen[key] = True
+        if len(self._seen) > self.max_size:
+            self._seen.popitem(last=False)
+        return True
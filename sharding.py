@@ -0,0 +1,183 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+
+
+def shard_for_guild(guild_id, shard_count):
+    """The shard Discord delivers a guild's events on"""
+    return (int(guild_id) >> 22) % shard_count
+
+
+def parse_shard_ids(text):
+    """Parse SHARD_IDS like "0-3" or "0,2,5" into a list, or None if unset"""
+    if not text:
+        return None
+    shard_ids = []
+    for part in text.split(","):
+        first, _, last = part.strip().partition("-")
+        shard_ids.extend(range(int(first), int(last or first) + 1))
+    return shard_ids
+
+
+def format_shard_ids(shard_ids):
+    return f"{shard_ids[0]}-{shard_ids[-1]}" if len(shard_ids) > 1 else str(shard_ids[0])
+
+
+def owns_guild(bot, guild_id):
+    """Whether this process runs the shard a guild is on
+
+    A plain Bot, or an AutoShardedBot running every shard, owns all guilds.
+    """
+    shard_ids = getattr(bot, 'shard_ids', None)
+    if not shard_ids or not bot.shard_count:
+        return True
+    return shard_for_guild(guild_id, bot.shard_count) in shard_ids
+
+
+def split_shards(shard_count, processes):
+    """Split shard ids into contiguous ranges, one per process"""
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+class Worker:
+    """One bot process running a range of shards"""
+
+    def __init__(self, index, shard_ids):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.process = None
+        self.started_at = None
+        self.restarts = 0
+
+    @property
+    def name(self):
+        return f"worker {self.index} (shards {format_shard_ids(self.shard_ids)})"
+
+
+class ShardLauncher:
+    """Runs app.py once per shard range and restarts workers that exit
+
+    Workers share a Redis storage backend (the JSON and SQLite backends cache
+    rows per process, so workers would overwrite each other's changes) and
+    each only runs the daily jobs
+    for the guilds on its own shards. Starts are staggered because Discord limits
+    how fast shards can identify.
+    """
+
+    def __init__(self, shard_count, processes, command=None, env=None, stagger=5.0, metrics_port=None):
+        self.shard_count = shard_count
+        self.workers = [Worker(i, shard_ids) for i, shard_ids in enumerate(split_shards(shard_count, processes))]
+        self.command = command or [sys.executable, "app.py"]
+        self.env = env if env is not None else dict(os.environ)
+        self.stagger = stagger
+        self.metrics_port = metrics_port
+        self._stopping = False
+
+    def _start(self, worker):
+        env = dict(self.env)
+        env['SHARD_COUNT'] = str(self.shard_count)
+        env['SHARD_IDS'] = format_shard_ids(worker.shard_ids)
+        if self.metrics_port:
+            env['METRICS_PORT'] = str(self.metrics_port + worker.index)
+        worker.process = subprocess.Popen(self.command, env=env)
+        worker.started_at = time.monotonic()
+        print(f"Started {worker.name}, pid {worker.process.pid}")
+
+    def _restart_delay(self, worker):
+        # Back off when a worker keeps crashing soon after starting
+        if time.monotonic() - worker.started_at > 60:
+            worker.restarts = 0
+        worker.restarts += 1
+        return min(60, 2 ** worker.restarts)
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for i, worker in enumerate(self.workers):
+            if i and not self._stopping:
+                time.sleep(self.stagger)
+            if not self._stopping:
+                self._start(worker)
+
+        restart_at = {}
+        while not self._stopping:
+            time.sleep(1)
+            for worker in self.workers:
+                if worker.index in restart_at:
+                    if time.monotonic() >= restart_at[worker.index]:
+                        del restart_at[worker.index]
+                        self._start(worker)
+                    continue
+                code = worker.process.poll()
+                if code is not None:
+                    delay = self._restart_delay(worker)
+                    print(f"{worker.name} exited with code {code}, restarting in {delay}s")
+                    restart_at[worker.index] = time.monotonic() + delay
+
+        print("Stopping workers...")
+        for worker in self.workers:
+            if worker.process is not None and worker.process.poll() is None:
+                worker.process.terminate()
+        for worker in self.workers:
+            if worker.process is not None:
+                try:
+                    worker.process.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    worker.process.kill()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run the bot as several processes, each owning a range of shards")
+    parser.add_argument("--shard-count", type=int, required=True, help="total shards across all processes")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--stagger", type=float, default=5.0, help="seconds between worker starts")
+    parser.add_argument("--metrics-port", type=int, help="first worker's METRICS_PORT; the others count up from it")
+    parser.add_argument("--mock-gateway", type=int, metavar="GUILDS",
+                        help="run against a local mock Discord with this many guilds instead of the real one")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.processes > 1 and env.get('STORAGE_BACKEND', 'json') != 'redis':
+        print("Error: several worker processes need STORAGE_BACKEND=redis to share data")
+        print("The JSON and SQLite backends keep rows cached per process, so workers would lose each other's updates.")
+        print("For local testing, `python kvstore.py --port 6379` runs a stand-in Redis.")
+        sys.exit(1)
+
+    mock = None
+    if args.mock_gateway is not None:
+        port = 8765
+        mock = subprocess.Popen([sys.executable, "mockgateway.py", "--port", str(port),
+                                 "--guilds", str(args.mock_gateway), "--shard-count", str(args.shard_count)])
+        env['DISCORD_API_URL'] = f"http://127.0.0.1:{port}/api/v10"
+        env['DISCORD_GATEWAY_URL'] = f"ws://127.0.0.1:{port}/gateway"
+        env['DISCORD_BOT_TOKEN'] = "mock-token"  # Never send the real token to the mock
+        time.sleep(1)
+
+    try:
+        ShardLauncher(args.shard_count, args.processes, env=env, stagger=args.stagger,
+                      metrics_port=args.metrics_port).run()
+    finally:
+        if mock is not None:
+            mock.terminate()
+
+
+if __name__ == "__main__":
+    # python sharding.py --shard-count 8 --processes 2 [--mock-gateway 200]
+    main()
@@ -0,0 +1,348 @@
+import asyncio
+import json
+import math
+import os
+import subprocess
+import sys
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+
+from feedback import ALL_GREEN, FeedbackTable, feedback_code
+from words import WordIndex
+
+
+class Solver:
+    """Narrows the answer list from a game's guesses and ranks next guesses by information gain
+
+    Candidate sets are tuples of answer ids into the feedback table. Rankings
+    are memoized per candidate set, so the opening ranking and the common
+    second-move sets are only computed once; the opening ranking is also
+    cached on disk.
+
+    Ranking every allowed guess holds the GIL for up to a second, so with
+    workers rankings and guess ratings are computed in worker processes;
+    run() calls into the solver on its own bounded pool of threads either way.
+    """
+
+    def __init__(self, table, cache_path=None, cache_size=4096, workers=None):
+        self.table = table
+        self.workers = workers
+        self.executor = workers.executor if workers is not None else ThreadPoolExecutor(max_workers=1, thread_name_prefix="solver")
+        self.cache_path = cache_path
+        self.cache_size = cache_size
+        self.all_answers = tuple(range(len(table.answers)))
+        self._nlog2n = [0.0] + [n * math.log2(n) for n in range(1, len(table.answers) + 1)]
+        self._rankings = OrderedDict()  # candidate ids -> [(guess_id, bits), ...] best first
+        self._candidates = OrderedDict()  # ((word, code), ...) -> candidate ids
+        self._opening = None  # The opening ranking, kept out of the LRU as the shortlist for rate_guess
+        self._answer_guess_ids = None  # answer id -> guess id, built on first use
+        self._lock = threading.Lock()
+
+    def _cache_get(self, cache, key):
+        with self._lock:
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
+        return None
+
+    def _cache_put(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+    def filter(self, candidates, guess, code):
+        """Keep the candidates that would have given this feedback for guess"""
+        guess_id = self.table.guess_index.get(guess)
+        if guess_id is None:
+            answers = self.table.answers
+            return tuple(a for a in candidates if feedback_code(guess, answers[a]) == code)
+        row = self.table.row(guess_id)
+        if candidates is self.all_answers:
+            # Opening guess: let bytes.find skip over the row instead of testing every answer
+            found = []
+            needle = bytes([code])
+            a = row.find(needle)
+            while a != -1:
+                found.append(a)
+                a = row.find(needle, a + 1)
+            return tuple(found)
+        return tuple(a for a in candidates if row[a] == code)
+
+    def candidates_after(self, guesses):
+        """Get the answer ids consistent with a list of (guess, code) pairs"""
+        key = tuple(guesses)
+        if not key:
+            return self.all_answers
+        cached = self._cache_get(self._candidates, key)
+        if cached is None:
+            cached = self.filter(self.candidates_after(key[:-1]), *key[-1])
+            self._cache_put(self._candidates, key, cached)
+        return cached
+
+    def expected_bits(self, guess_id, candidates):
+        """Expected information (in bits) from playing a guess against candidates"""
+        n = len(candidates)
+        if n <= 1:
+            return 0.0
+        codes = itemgetter(*candidates)(self.table.row(guess_id))
+        nlog2n = self._nlog2n
+        return math.log2(n) - sum(nlog2n[c] for c in Counter(codes).values()) / n
+
+    def _rank_all(self, candidates):
+        n = len(candidates)
+        getter = itemgetter(*candidates)
+        nlog2n = self._nlog2n
+        log2n = math.log2(n)
+        row = self.table.row
+        scores = []
+        for guess_id in range(len(self.table.guesses)):
+            counts = Counter(getter(row(guess_id))).values()
+            scores.append((log2n - sum(nlog2n[c] for c in counts) / n, guess_id))
+        scores.sort(reverse=True)
+        return [(guess_id, bits) for bits, guess_id in scores[:50]]
+
+    def _ranking(self, candidates):
+        if self.workers is not None:
+            try:
+                return [tuple(r) for r in self.workers.request("rank", candidates)]
+            except (OSError, RuntimeError) as e:
+                print(f"Solver worker failed, ranking in this process instead: {e}")
+        return self._rank_all(candidates)
+
+    def ranking(self, candidates):
+        """Get the top guesses as [(guess_id, bits)], best first, for a candidate set of three or more"""
+        ranking = self._cache_get(self._rankings, candidates)
+        if ranking is None:
+            if candidates == self.all_answers:
+                ranking = self._load_openers()
+            if ranking is None:
+                ranking = self._ranking(candidates)
+                if candidates == self.all_answers:
+                    self._save_openers(ranking)
+            self._cache_put(self._rankings, candidates, ranking)
+        if candidates == self.all_answers:
+            self._opening = ranking
+        return ranking
+
+    def rank(self, candidates, limit=5):
+        """Get the best next guesses as [(word, bits)] for a candidate set"""
+        if len(candidates) <= 2:
+            # Nothing beats guessing one of the remaining answers
+            answers = self.table.answers
+            bits = 1.0 if len(candidates) == 2 else 0.0
+            return [(answers[a], bits) for a in candidates][:limit]
+        ranking = self.ranking(candidates)
+
+        # Among equally informative guesses, prefer ones that could win outright
+        candidate_set = set(candidates)
+        answer_index = self.table.answer_index
+        words = [(self.table.guesses[g], bits) for g, bits in ranking]
+        words.sort(key=lambda x: (-round(x[1], 6), answer_index.get(x[0]) not in candidate_set))
+        return words[:limit]
+
+    def hint(self, guesses, limit=3):
+        """Get (remaining answer count, best next guesses) for a game's guesses"""
+        candidates = self.candidates_after(guesses)
+        if any(code == ALL_GREEN for _, code in guesses):
+            return len(candidates), []
+        return len(candidates), self.rank(candidates, limit)
+
+    def best_guess(self, candidates, max_candidates=200):
+        """Get (word, bits) of a strong next guess, cheaply enough to run after every move
+
+        Uses the full ranking when it is already known (always for the
+        opening). Otherwise only the opening shortlist and up to
+        max_candidates of the remaining answers are scored, which costs a few
+        milliseconds instead of ranking all of the allowed guesses.
+        """
+        ranking = self._cache_get(self._rankings, candidates)
+        if len(candidates) <= 2 or ranking is not None or candidates == self.all_answers:
+            return self.rank(candidates, 1)[0]
+        if self._answer_guess_ids is None:
+            index = self.table.guess_index
+            self._answer_guess_ids = [index.get(word) for word in self.table.answers]
+        pool = [self._answer_guess_ids[a] for a in candidates[:max_candidates]]
+        candidate_guesses = set(pool)
+        pool.extend(g for g, _ in self._opening or () if g not in candidate_guesses)
+
+        n = len(candidates)
+        getter = itemgetter(*candidates)
+        nlog2n = self._nlog2n
+        log2n = math.log2(n)
+        row = self.table.row
+        best = None
+        for guess_id in pool:
+            if guess_id is None:
+                continue
+            bits = log2n - sum(nlog2n[c] for c in Counter(getter(row(guess_id))).values()) / n
+            # Among equally informative guesses, prefer ones that could win outright
+            key = (round(bits, 6), guess_id in candidate_guesses)
+            if best is None or key > best[0]:
+                best = (key, guess_id, bits)
+        return self.table.guesses[best[1]], best[2]
+
+    def rate_guess(self, candidates, guess, code):
+        """Rate a guess made against a candidate set
+
+        skill compares the guess's expected information with the best guess
+        found by best_guess (100 = as good as the best); luck is how many
+        more (or fewer) bits the actual feedback gave than expected.
+        """
+        if self.workers is not None:
+            try:
+                return self.workers.request("rate", candidates, guess, code)
+            except (OSError, RuntimeError) as e:
+                print(f"Solver worker failed, rating in this process instead: {e}")
+        n = len(candidates)
+        guess_id = self.table.guess_index.get(guess)
+        expected = self.expected_bits(guess_id, candidates) if guess_id is not None else 0.0
+        remaining = len(self.filter(candidates, guess, code))
+        actual = math.log2(n / remaining) if remaining else 0.0
+        best_word, best_bits = self.best_guess(candidates) if n else (guess, 0.0)
+        if expected > best_bits:
+            best_word, best_bits = guess, expected  # Better than anything on the shortlist
+        if best_bits > 0:
+            skill = min(100, round(100 * expected / best_bits))
+        else:
+            skill = 100 if code == ALL_GREEN else 0
+        return {'skill': skill, 'luck': actual - expected, 'best': best_word,
+                'expected_bits': expected, 'best_bits': best_bits}
+
+    async def run(self, fn, *args):
+        """Call a solver method on the solver's threads"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def close(self):
+        if self.workers is not None:
+            self.workers.close()
+        else:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self):
+        """Compute the opening ranking ahead of the first /hint"""
+        self.rank(self.all_answers)
+
+    def _load_openers(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('digest') != self.table.digest.hex():
+            return None
+        index = self.table.guess_index
+        return [(index[word], bits) for word, bits in data['openers'] if word in index]
+
+    def _save_openers(self, ranking):
+        if not self.cache_path:
+            return
+        openers = [(self.table.guesses[g], bits) for g, bits in ranking]
+        # The bot and its workers may all save it, so never leave a half-written file
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'digest': self.table.digest.hex(), 'openers': openers}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not save solver cache: {e}")
+
+
+class SolverWorkers:
+    """Worker processes that rank and rate guesses off the bot's GIL
+
+    Each of the executor's threads owns one worker (python solver.py
+    --worker), started on first use and restarted if it dies, and talks to it
+    over its stdin/stdout one JSON line per request.
+    """
+
+    def __init__(self, words, table, cache_path=None, processes=2):
+        self.command = [sys.executable, os.path.abspath(__file__), "--worker", words.path, words.answers_path,
+                        words.guesses_path, table.cache_path, cache_path or ""]
+        self.executor = ThreadPoolExecutor(max_workers=processes, thread_name_prefix="solver")
+        self._local = threading.local()
+        self._processes = []
+        self._lock = threading.Lock()
+
+    def _process(self):
+        process = getattr(self._local, 'process', None)
+        if process is None or process.poll() is not None:
+            process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+            self._local.process = process
+            with self._lock:
+                self._processes.append(process)
+        return process
+
+    def request(self, op, *params):
+        """Send a request to this thread's worker and wait for its result"""
+        process = self._process()
+        try:
+            process.stdin.write(json.dumps([op, *params]) + "\n")
+            process.stdin.flush()
+            line = process.stdout.readline()
+        except (OSError, ValueError):
+            line = ""
+        if not line:
+            self._stop(process)
+            raise OSError(f"solver worker exited with {process.poll()}")
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply['result']
+
+    def _stop(self, process):
+        with self._lock:
+            if process in self._processes:
+                self._processes.remove(process)
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def close(self):
+        """Stop the threads and the worker processes"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            self._stop(process)
+
+
+def serve(index_path, answers_path, guesses_path, table_path, cache_path):
+    """Worker loop: answer SolverWorkers requests from stdin until it closes"""
+    replies = sys.stdout
+    sys.stdout = sys.stderr  # Keep prints out of the replies
+    if hasattr(os, 'nice'):
+        os.nice(10)  # Rankings can wait; the bot's event loop shouldn't wait on them for CPU
+    words = WordIndex(index_path, answers_path, guesses_path).open()
+    solver = Solver(FeedbackTable.for_word_index(words, table_path).open(), cache_path=cache_path or None)
+    solver.warm()
+    for line in sys.stdin:
+        op, *params = json.loads(line)
+        try:
+            if op == "rank":
+                result = solver.ranking(tuple(params[0]))
+            elif op == "rate":
+                result = solver.rate_guess(tuple(params[0]), params[1], params[2])
+            else:
+                raise ValueError(f"unknown request {op!r}")
+            reply = {'result': result}
+        except Exception as e:
+            reply = {'error': repr(e)}
+        replies.write(json.dumps(reply) + "\n")
+        replies.flush()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["--worker"] or len(sys.argv) != 7:
+        sys.exit("usage: solver.py --worker <word index> <answers> <guesses> <feedback table> <solver cache>")
+    serve(*sys.argv[2:])
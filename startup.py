@@ -0,0 +1,51 @@
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+class StartupTimings:
+    """How long each startup phase took, for the startup log line"""
+
+    def __init__(self):
+        self.phases = []  # (name, seconds) in the order they ran
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def summary(self):
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        return f"Startup took {self.total:.2f}s ({phases})"
+
+
+def command_tree_hash(tree, application_id):
+    """Hash of the global command definitions as they would be sent to Discord"""
+    payload = sorted((command.to_dict(tree) for command in tree.get_commands()), key=lambda c: c['name'])
+    data = json.dumps({'application_id': application_id, 'commands': payload}, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+async def sync_command_tree(tree, application_id, hash_path, force=False):
+    """Sync the command tree only when its definitions changed since the last sync
+
+    Returns the number of commands synced, or None when the sync was skipped.
+    """
+    current = command_tree_hash(tree, application_id)
+    if not force and os.path.exists(hash_path):
+        with open(hash_path, 'r') as f:
+            if f.read().strip() == current:
+                return None
+    synced = await tree.sync()
+    with open(hash_path, 'w') as f:
+        f.write(current)
+    return len(synced)
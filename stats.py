@@ -0,0 +1,111 @@
+import datetime
+
+
+class PlayerStats:
+    """One player's record in one guild, stored as a compact row"""
+
+    __slots__ = ('games_played', 'games_won', 'distribution', 'current_streak',
+                 'max_streak', 'total_time', 'last_played')
+
+    def __init__(self):
+        self.games_played = 0
+        self.games_won = 0
+        self.distribution = [0, 0, 0, 0, 0, 0]  # wins in 1..6 guesses
+        self.current_streak = 0
+        self.max_streak = 0
+        self.total_time = 0
+        self.last_played = None
+
+    @property
+    def average_guesses(self):
+        """Average guesses over won games"""
+        if self.games_won == 0:
+            return 0.0
+        return round(sum((i + 1) * count for i, count in enumerate(self.distribution)) / self.games_won, 2)
+
+    def record(self, won, guesses, game_time, date):
+        """Add one finished game played on date (YYYY-MM-DD)"""
+        self.games_played += 1
+        if won:
+            self.games_won += 1
+            self.distribution[guesses - 1] += 1
+
+            # Update streak
+            yesterday = (datetime.date.fromisoformat(date) - datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+            if self.last_played == yesterday or self.last_played is None:
+                self.current_streak += 1
+            else:
+                self.current_streak = 1
+            self.max_streak = max(self.max_streak, self.current_streak)
+        else:
+            self.current_streak = 0
+        self.last_played = date
+        if game_time:
+            self.total_time += game_time
+
+    def to_row(self):
+        return [self.games_played, self.games_won, *self.distribution, self.current_streak,
+                self.max_streak, self.total_time, self.last_played]
+
+    @classmethod
+    def from_row(cls, row):
+        stats = cls()
+        (stats.games_played, stats.games_won, *distribution, stats.current_streak,
+         stats.max_streak, stats.total_time, stats.last_played) = row
+        stats.distribution = distribution
+        return stats
+
+
+def combine_stats(guild_stats, first_guesses=None):
+    """Derive a user's overall stats (the /mystats view) from their per-guild stats"""
+    distribution = [0, 0, 0, 0, 0, 0]
+    for stats in guild_stats:
+        for i, count in enumerate(stats.distribution):
+            distribution[i] += count
+    games_won = sum(stats.games_won for stats in guild_stats)
+    total_guesses = sum((i + 1) * count for i, count in enumerate(distribution))
+    last_played = max((s.last_played for s in guild_stats if s.last_played), default=None)
+    return {
+        'games_played': sum(stats.games_played for stats in guild_stats),
+        'games_won': games_won,
+        'guess_distribution': {str(i + 1): count for i, count in enumerate(distribution)},
+        'current_streak': max((stats.current_streak for stats in guild_stats), default=0),
+        'max_streak': max((stats.max_streak for stats in guild_stats), default=0),
+        'total_time': sum(stats.total_time for stats in guild_stats),
+        'first_guesses': first_guesses or {},
+        'average_guesses': round(total_guesses / games_won, 2) if games_won > 0 else 0.0,
+        'last_played': last_played
+    }
+
+
+def backfill_guild_stats(storage):
+    """One-shot: build per-guild stats by replaying stored daily results
+
+    Before per-guild stats, clearing a user's stats zeroed their global
+    counters but kept their results, so only each user's latest
+    games_played results are replayed. The old counters are dropped
+    afterwards, leaving first_guesses.
+    """
+    legacy = {user_id: data for user_id, data in storage.iter_user_stats() if 'games_played' in data}
+    played = {}  # user_id -> [(date, guild_id, result)]
+    for guild_id, date, user_id, result in storage.iter_results():
+        played.setdefault(user_id, []).append((date, guild_id, result))
+    built = {}
+    skipped = 0
+    for user_id, games in played.items():
+        games.sort(key=lambda game: game[:2])
+        if user_id in legacy:
+            cleared = max(0, len(games) - legacy[user_id]['games_played'])
+            skipped += cleared
+            games = games[cleared:]
+        for date, guild_id, result in games:
+            stats = built.get((guild_id, user_id))
+            if stats is None:
+                stats = built[guild_id, user_id] = PlayerStats()
+            stats.record(result['won'], result['guesses'], result.get('game_time'), date)
+    for (guild_id, user_id), stats in built.items():
+        storage.put_guild_stats(guild_id, user_id, stats)
+    for user_id, data in legacy.items():
+        storage.put_user_stats(user_id, {'first_guesses': data.get('first_guesses', {})})
+    print(f"Built per-server stats for {len(built)} players from saved results "
+          f"(skipped {skipped} played before a stats reset)")
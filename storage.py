@@ -0,0 +1,1016 @@
+import asyncio
+import datetime
+import json
+import os
+import sqlite3
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from kvstore import KVError, MemoryKV, RespKV
+from persistence import DataWriter, WriteAheadLog
+from stats import PlayerStats
+
+
+def _guild_stats_record(guild_id, user_id, stats):
+    return {'op': 'guild_stats', 'guild_id': guild_id, 'user_id': user_id, 'stats': stats.to_row()}
+
+
+def _result_record(guild_id, date, user_id, result):
+    if result is None:
+        return {'op': 'result_removed', 'guild_id': guild_id, 'date': date, 'user_id': user_id}
+    return {'op': 'result', 'guild_id': guild_id, 'date': date, 'user_id': user_id, 'result': result}
+
+
+class Storage:
+    """Where game data lives; the bot goes through this instead of raw dicts
+
+    Ids are strings and dates are YYYY-MM-DD strings. Dicts handed out are the
+    stored objects: mutate them and call the matching put_* to persist.
+    add_result and the update_* methods are atomic: here because the bot only
+    touches storage from the event loop, in shared backends by compare-and-set.
+    They and the reads that may miss a shared backend's cache (get_results,
+    known_usernames, get_user_stats, guild_stats, user_guild_stats,
+    has_guild_stats) are coroutines, so shared backends can wait on the store
+    off the loop.
+    """
+
+    writer = None
+    on_invalidate = None  # Shared backends: called with a row another process changed
+
+    def load(self):
+        raise NotImplementedError
+
+    async def get_results(self, guild_id, date):
+        """Get {user_id: result} for one guild and day (do not mutate)"""
+        raise NotImplementedError
+
+    async def get_result(self, guild_id, date, user_id):
+        return (await self.get_results(guild_id, date)).get(user_id)
+
+    def put_result(self, guild_id, date, user_id, result):
+        raise NotImplementedError
+
+    async def add_result(self, guild_id, date, user_id, result):
+        """Store a result unless the user already has one that day, returning whether it was stored
+
+        Atomic: of two callers recording the same user's day, only one gets True.
+        """
+        if await self.get_result(guild_id, date, user_id) is not None:
+            return False
+        self.put_result(guild_id, date, user_id, result)
+        return True
+
+    def remove_result(self, guild_id, date, user_id):
+        """Remove a result, returning whether there was one"""
+        raise NotImplementedError
+
+    async def known_usernames(self, guild_id, user_ids):
+        """Get {user_id: name} from the most recent stored result of each user in a guild"""
+        raise NotImplementedError
+
+    def iter_results(self):
+        """Yield (guild_id, date, user_id, result) for every result, oldest first within a guild"""
+        raise NotImplementedError
+
+    async def get_user_stats(self, user_id):
+        """Get a user's guild-independent data (first_guesses)"""
+        raise NotImplementedError
+
+    def iter_user_stats(self):
+        """Yield (user_id, data) for every user with guild-independent data"""
+        raise NotImplementedError
+
+    def put_user_stats(self, user_id, stats):
+        raise NotImplementedError
+
+    async def update_user_stats(self, user_id, update):
+        """Atomically replace a user's data with update(current data or None), returning the new data"""
+        stats = update(await self.get_user_stats(user_id))
+        self.put_user_stats(user_id, stats)
+        return stats
+
+    async def get_guild_stats(self, guild_id, user_id):
+        """Get a user's PlayerStats in one guild"""
+        return (await self.guild_stats(guild_id)).get(user_id)
+
+    def put_guild_stats(self, guild_id, user_id, stats):
+        raise NotImplementedError
+
+    async def update_guild_stats(self, guild_id, user_id, update):
+        """Atomically replace a user's PlayerStats in a guild with update(current or None), returning them"""
+        stats = update(await self.get_guild_stats(guild_id, user_id))
+        self.put_guild_stats(guild_id, user_id, stats)
+        return stats
+
+    async def guild_stats(self, guild_id):
+        """Get {user_id: PlayerStats} for everyone with stats in a guild (do not mutate)"""
+        raise NotImplementedError
+
+    async def user_guild_stats(self, user_id):
+        """Get {guild_id: PlayerStats} for every guild a user has stats in"""
+        raise NotImplementedError
+
+    async def has_guild_stats(self):
+        raise NotImplementedError
+
+    def get_guild_settings(self, guild_id):
+        raise NotImplementedError
+
+    def put_guild_settings(self, guild_id, settings):
+        raise NotImplementedError
+
+    def all_guild_settings(self):
+        """Get {guild_id: settings} for every guild (do not mutate)"""
+        raise NotImplementedError
+
+    def files(self):
+        """Paths of the files this backend keeps its data in"""
+        raise NotImplementedError
+
+    def disk_size(self):
+        """Bytes the data files take up on disk"""
+        return sum(os.path.getsize(path) for path in self.files() if os.path.exists(path))
+
+    def start(self):
+        """Start flushing changes in the background; call on the event loop"""
+        self.writer.start()
+
+    def is_running(self):
+        return self.writer.is_running()
+
+    async def flush(self):
+        await self.writer.flush()
+
+    def close(self):
+        """Write anything still pending; call after the event loop has stopped"""
+        self.writer.flush_sync()
+
+
+class JsonStorage(Storage):
+    """Everything resident in memory, persisted to a JSON snapshot plus mutation log"""
+
+    def __init__(self, path, compact_after=1000, flush_interval_ms=500):
+        self.wal = WriteAheadLog(path, compact_after=compact_after)
+        self.writer = DataWriter(self.wal, interval_ms=flush_interval_ms)
+        self.daily_results = {}  # guild_id -> {date: {user_id: result}}
+        self.guild_settings = {}
+        self.user_stats = {}
+        self.guild_stats_by_guild = {}  # guild_id -> {user_id: PlayerStats}
+        self._user_guilds = {}  # user_id -> guild ids with stats
+
+    def load(self):
+        data = self.wal.load()
+        self.daily_results = data['daily_results']
+        self.guild_settings = data['guild_settings']
+        self.user_stats = data['user_stats']
+        self.guild_stats_by_guild = {}
+        self._user_guilds = {}
+        for guild_id, rows in data['guild_stats'].items():
+            self.guild_stats_by_guild[guild_id] = {user_id: PlayerStats.from_row(row) for user_id, row in rows.items()}
+            for user_id in rows:
+                self._user_guilds.setdefault(user_id, set()).add(guild_id)
+
+    async def get_results(self, guild_id, date):
+        return self.daily_results.get(guild_id, {}).get(date, {})
+
+    def put_result(self, guild_id, date, user_id, result):
+        self.daily_results.setdefault(guild_id, {}).setdefault(date, {})[user_id] = result
+        self.writer.mark_dirty(('result', guild_id, date, user_id),
+                               lambda: _result_record(guild_id, date, user_id, result))
+
+    def remove_result(self, guild_id, date, user_id):
+        day = self.daily_results.get(guild_id, {}).get(date)
+        if day is None or user_id not in day:
+            return False
+        del day[user_id]
+        if len(day) == 0:
+            del self.daily_results[guild_id][date]
+        self.writer.mark_dirty(('result', guild_id, date, user_id),
+                               lambda: _result_record(guild_id, date, user_id, None))
+        return True
+
+    async def known_usernames(self, guild_id, user_ids):
+        wanted = set(user_ids)
+        names = {}
+        dates = self.daily_results.get(guild_id, {})
+        for date in sorted(dates, reverse=True):
+            for user_id in wanted.intersection(dates[date]):
+                names[user_id] = dates[date][user_id]['username']
+            wanted.difference_update(names)
+            if not wanted:
+                break
+        return names
+
+    def iter_results(self):
+        for guild_id, dates in self.daily_results.items():
+            for date in sorted(dates):
+                for user_id, result in dates[date].items():
+                    yield guild_id, date, user_id, result
+
+    async def get_user_stats(self, user_id):
+        return self.user_stats.get(user_id)
+
+    def iter_user_stats(self):
+        return iter(list(self.user_stats.items()))
+
+    def put_user_stats(self, user_id, stats):
+        self.user_stats[user_id] = stats
+        self.writer.mark_dirty(('user_stats', user_id),
+                               lambda: {'op': 'user_stats', 'user_id': user_id, 'stats': stats})
+
+    def put_guild_stats(self, guild_id, user_id, stats):
+        self.guild_stats_by_guild.setdefault(guild_id, {})[user_id] = stats
+        self._user_guilds.setdefault(user_id, set()).add(guild_id)
+        self.writer.mark_dirty(('guild_stats', guild_id, user_id),
+                               lambda: _guild_stats_record(guild_id, user_id, stats))
+
+    async def guild_stats(self, guild_id):
+        return self.guild_stats_by_guild.get(guild_id, {})
+
+    async def user_guild_stats(self, user_id):
+        return {guild_id: self.guild_stats_by_guild[guild_id][user_id]
+                for guild_id in self._user_guilds.get(user_id, ())}
+
+    async def has_guild_stats(self):
+        return len(self.guild_stats_by_guild) > 0
+
+    def get_guild_settings(self, guild_id):
+        return self.guild_settings.get(guild_id)
+
+    def put_guild_settings(self, guild_id, settings):
+        self.guild_settings[guild_id] = settings
+        self.writer.mark_dirty(('guild_settings', guild_id),
+                               lambda: {'op': 'guild_settings', 'guild_id': guild_id, 'settings': settings})
+
+    def all_guild_settings(self):
+        return self.guild_settings
+
+    def files(self):
+        return [self.wal.snapshot_path, self.wal.log_path, self.wal.compacting_path]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_results (
+    guild_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (guild_id, date, user_id)  -- also serves (guild_id, date) lookups
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_daily_results_user ON daily_results (user_id);
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id TEXT PRIMARY KEY,
+    stats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS guild_stats (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    stats TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_guild_stats_user ON guild_stats (user_id);
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id TEXT PRIMARY KEY,
+    settings TEXT NOT NULL
+);
+"""
+
+
+def connect_sqlite(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SqliteSink:
+    """DataWriter sink that upserts records into SQLite on the writer thread"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+
+    def encode(self, records):
+        statements = []
+        for r in records:
+            op = r['op']
+            if op == 'result':
+                statements.append(("INSERT OR REPLACE INTO daily_results VALUES (?, ?, ?, ?)",
+                                   (r['guild_id'], r['date'], r['user_id'], json.dumps(r['result']))))
+            elif op == 'result_removed':
+                statements.append(("DELETE FROM daily_results WHERE guild_id = ? AND date = ? AND user_id = ?",
+                                   (r['guild_id'], r['date'], r['user_id'])))
+            elif op == 'user_stats':
+                statements.append(("INSERT OR REPLACE INTO user_stats VALUES (?, ?)",
+                                   (r['user_id'], json.dumps(r['stats']))))
+            elif op == 'guild_stats':
+                statements.append(("INSERT OR REPLACE INTO guild_stats VALUES (?, ?, ?)",
+                                   (r['guild_id'], r['user_id'], json.dumps(r['stats']))))
+            elif op == 'guild_settings':
+                statements.append(("INSERT OR REPLACE INTO guild_settings VALUES (?, ?)",
+                                   (r['guild_id'], json.dumps(r['settings']))))
+        return statements
+
+    def write_batch(self, batch):
+        if self._conn is None:
+            self._conn = connect_sqlite(self.path)
+        with self._conn:
+            for sql, params in batch:
+                self._conn.execute(sql, params)
+
+    def batch_size(self, batch):
+        return sum(len(p) for _, params in batch for p in params if isinstance(p, str))
+
+    def maintain(self):
+        pass
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SqliteStorage(Storage):
+    """SQLite-backed storage keeping only recent days and recently used stats in memory"""
+
+    def __init__(self, path, flush_interval_ms=500, hot_days=2, stats_cache_size=10000):
+        self.path = path
+        self.hot_days = hot_days
+        self.stats_cache_size = stats_cache_size
+        self.writer = DataWriter(SqliteSink(path), interval_ms=flush_interval_ms)
+        self._conn = None  # read connection, used from the event loop
+        self._guild_settings = {}
+        self._days = {}  # (guild_id, date) -> {user_id: result} for hot dates
+        self._stats = OrderedDict()  # LRU of user_id -> stats
+        self._guild_stats = {}  # guild_id -> {user_id: PlayerStats}, loaded per guild on demand
+        self._hot_cutoff = None
+
+    def load(self):
+        if self._conn is None:
+            self._conn = connect_sqlite(self.path)
+        self._guild_settings = {
+            guild_id: json.loads(settings)
+            for guild_id, settings in self._conn.execute("SELECT guild_id, settings FROM guild_settings")
+        }
+        self._days = {}
+        self._stats = OrderedDict()
+        self._guild_stats = {}
+
+    def _evict_cold_days(self):
+        cutoff = (datetime.date.today() - datetime.timedelta(days=self.hot_days - 1)).strftime("%Y-%m-%d")
+        if cutoff == self._hot_cutoff:
+            return cutoff
+        self._hot_cutoff = cutoff
+        for key in [k for k in self._days if k[1] < cutoff]:
+            guild_id, date = key
+            if not any(self.writer.is_pending(('result', guild_id, date, u)) for u in self._days[key]):
+                del self._days[key]
+        return cutoff
+
+    def _query_day(self, guild_id, date):
+        rows = self._conn.execute(
+            "SELECT user_id, result FROM daily_results WHERE guild_id = ? AND date = ?", (guild_id, date))
+        return {user_id: json.loads(result) for user_id, result in rows}
+
+    async def get_results(self, guild_id, date):
+        key = (guild_id, date)
+        if key in self._days:
+            return self._days[key]
+        day = self._query_day(guild_id, date)
+        if date >= self._evict_cold_days():
+            self._days[key] = day
+        return day
+
+    def _hot_day(self, guild_id, date):
+        """Get a day's results dict, pinned in memory so pending writes stay visible"""
+        key = (guild_id, date)
+        if key not in self._days:
+            self._days[key] = self._query_day(guild_id, date)
+        return self._days[key]
+
+    def put_result(self, guild_id, date, user_id, result):
+        self._hot_day(guild_id, date)[user_id] = result
+        self.writer.mark_dirty(('result', guild_id, date, user_id),
+                               lambda: _result_record(guild_id, date, user_id, result))
+
+    def remove_result(self, guild_id, date, user_id):
+        day = self._hot_day(guild_id, date)
+        if user_id not in day:
+            return False
+        del day[user_id]
+        self.writer.mark_dirty(('result', guild_id, date, user_id),
+                               lambda: _result_record(guild_id, date, user_id, None))
+        return True
+
+    async def known_usernames(self, guild_id, user_ids):
+        names = {}
+        user_ids = list(user_ids)
+        for i in range(0, len(user_ids), 500):
+            batch = user_ids[i:i + 500]
+            rows = self._conn.execute(
+                f"SELECT user_id, result FROM daily_results WHERE guild_id = ? "
+                f"AND user_id IN ({', '.join('?' * len(batch))}) ORDER BY date",
+                (guild_id, *batch))
+            for user_id, result in rows:
+                names[user_id] = json.loads(result)['username']
+        # Results not flushed yet are newer than anything in the database
+        for (g, _), day in sorted(self._days.items()):
+            if g == guild_id:
+                for user_id in set(user_ids).intersection(day):
+                    names[user_id] = day[user_id]['username']
+        return names
+
+    def iter_results(self):
+        rows = self._conn.execute("SELECT guild_id, date, user_id, result FROM daily_results ORDER BY guild_id, date")
+        for guild_id, date, user_id, result in rows:
+            yield guild_id, date, user_id, json.loads(result)
+
+    def iter_user_stats(self):
+        for user_id, stats in self._conn.execute("SELECT user_id, stats FROM user_stats").fetchall():
+            yield user_id, self._stats.get(user_id, json.loads(stats))
+
+    def _cache_stats(self, user_id, stats):
+        self._stats[user_id] = stats
+        self._stats.move_to_end(user_id)
+        while len(self._stats) > self.stats_cache_size:
+            oldest = next(iter(self._stats))
+            if self.writer.is_pending(('user_stats', oldest)):
+                break
+            del self._stats[oldest]
+
+    async def get_user_stats(self, user_id):
+        if user_id in self._stats:
+            self._stats.move_to_end(user_id)
+            return self._stats[user_id]
+        row = self._conn.execute("SELECT stats FROM user_stats WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        stats = json.loads(row[0])
+        self._cache_stats(user_id, stats)
+        return stats
+
+    def put_user_stats(self, user_id, stats):
+        self._cache_stats(user_id, stats)
+        self.writer.mark_dirty(('user_stats', user_id),
+                               lambda: {'op': 'user_stats', 'user_id': user_id, 'stats': stats})
+
+    def _guild(self, guild_id):
+        if guild_id not in self._guild_stats:
+            rows = self._conn.execute("SELECT user_id, stats FROM guild_stats WHERE guild_id = ?", (guild_id,))
+            self._guild_stats[guild_id] = {user_id: PlayerStats.from_row(json.loads(row)) for user_id, row in rows}
+        return self._guild_stats[guild_id]
+
+    async def guild_stats(self, guild_id):
+        return self._guild(guild_id)
+
+    def put_guild_stats(self, guild_id, user_id, stats):
+        self._guild(guild_id)[user_id] = stats
+        self.writer.mark_dirty(('guild_stats', guild_id, user_id),
+                               lambda: _guild_stats_record(guild_id, user_id, stats))
+
+    async def user_guild_stats(self, user_id):
+        rows = self._conn.execute("SELECT guild_id, stats FROM guild_stats WHERE user_id = ?", (user_id,))
+        found = {guild_id: PlayerStats.from_row(json.loads(row)) for guild_id, row in rows}
+        # Loaded guilds may hold changes that haven't been flushed yet
+        for guild_id, players in self._guild_stats.items():
+            if user_id in players:
+                found[guild_id] = players[user_id]
+        return found
+
+    async def has_guild_stats(self):
+        if any(self._guild_stats.values()):
+            return True
+        return self._conn.execute("SELECT 1 FROM guild_stats LIMIT 1").fetchone() is not None
+
+    def get_guild_settings(self, guild_id):
+        return self._guild_settings.get(guild_id)
+
+    def put_guild_settings(self, guild_id, settings):
+        self._guild_settings[guild_id] = settings
+        self.writer.mark_dirty(('guild_settings', guild_id),
+                               lambda: {'op': 'guild_settings', 'guild_id': guild_id, 'settings': settings})
+
+    def all_guild_settings(self):
+        return self._guild_settings
+
+    def files(self):
+        return [self.path, self.path + "-wal", self.path + "-shm"]
+
+    def close(self):
+        super().close()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class KVSink:
+    """DataWriter sink that writes records to a key-value store as one transaction
+
+    The transaction ends by announcing the changed rows on the storage's
+    invalidation channel, so other processes drop their cached copies.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def encode(self, records):
+        key = self.storage.key
+        commands = []
+        rows = []
+        for r in records:
+            op = r['op']
+            if op == 'result':
+                guild_id, date, user_id = r['guild_id'], r['date'], r['user_id']
+                commands.extend(self.storage.result_commands(guild_id, date, user_id, r['result']))
+                rows.append(('results', guild_id, date))
+            elif op == 'result_removed':
+                commands.append(('HDEL', key('results', r['guild_id'], r['date']), r['user_id']))
+                rows.append(('results', r['guild_id'], r['date']))
+            elif op == 'user_stats':
+                commands.append(('SET', key('user_stats', r['user_id']), json.dumps(r['stats'])))
+                rows.append(('user_stats', r['user_id']))
+            elif op == 'guild_stats':
+                commands.extend(self.storage.guild_stats_commands(r['guild_id'], r['user_id'], r['stats']))
+                rows.append(('guild_stats', r['guild_id'], r['user_id']))
+            elif op == 'guild_settings':
+                commands.append(('HSET', key('guild_settings'), r['guild_id'], json.dumps(r['settings'])))
+                rows.append(('guild_settings', r['guild_id']))
+        commands.append(self.storage.announce(*rows))
+        return commands
+
+    def write_batch(self, batch):
+        self.storage.kv.pipeline(batch, atomic=True)
+
+    def batch_size(self, batch):
+        return sum(len(str(arg)) for command in batch for arg in command)
+
+    def maintain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SharedStorage(Storage):
+    """Storage in a key-value store shared by several bot processes, cached locally
+
+    Plain puts are batched by the DataWriter like the other backends, while
+    add_result and the update_* methods go to the store straight away as
+    transactions, so a result is only recorded once and concurrent stats
+    updates from different processes don't overwrite each other. Reads go
+    through a local cache. Cache misses and transactions run on a small thread
+    pool, so the event loop doesn't wait on the network; a miss that another
+    process changes while it is being read is read again. Every write is
+    announced on a pub/sub channel;
+    other processes re-read the rows it names on the subscription's thread,
+    swap them into their cache and then call on_invalidate on their event
+    loop with each row, e.g. ('guild_stats', guild_id, user_id) or
+    ('results', guild_id, date).
+    """
+
+    def __init__(self, kv, prefix="wordle:", flush_interval_ms=500, cache_size=20000):
+        self.kv = kv
+        self.prefix = prefix
+        self.channel = prefix + "invalidate"
+        self.node_id = os.urandom(8).hex()  # To ignore our own announcements
+        self.cache_size = cache_size
+        self.writer = DataWriter(KVSink(self), interval_ms=flush_interval_ms)
+        self.invalidations = 0  # Rows changed by other processes
+        self._loop = None
+        self._settings = {}
+        self._days = OrderedDict()  # LRU of (guild_id, date) -> {user_id: result}
+        self._stats = OrderedDict()  # LRU of user_id -> user data
+        self._guild_stats = {}  # guild_id -> {user_id: PlayerStats}, loaded per guild on demand
+        self._user_guilds = OrderedDict()  # LRU of user_id -> {guild_id: PlayerStats}
+        self._fetching = {}  # cache key -> [reads in flight, changes seen meanwhile]
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="kv")
+
+    def key(self, *parts):
+        return self.prefix + ":".join(parts)
+
+    def announce(self, *rows):
+        """Command publishing that rows changed"""
+        return ('PUBLISH', self.channel, json.dumps({'node': self.node_id, 'rows': rows}))
+
+    def result_commands(self, guild_id, date, user_id, result):
+        return [('HSET', self.key('results', guild_id, date), user_id, json.dumps(result)),
+                ('HSET', self.key('names', guild_id), user_id, result['username']),
+                ('SADD', self.key('result_days', guild_id), date),
+                ('SADD', self.key('result_guilds'), guild_id)]
+
+    def guild_stats_commands(self, guild_id, user_id, row):
+        return [('SET', self.key('guild_stats', guild_id, user_id), json.dumps(row)),
+                ('SADD', self.key('stats_members', guild_id), user_id),
+                ('SADD', self.key('user_guilds', user_id), guild_id),
+                ('SADD', self.key('stats_guilds'), guild_id)]
+
+    async def _run(self, call):
+        """Run a blocking round trip to the store on the thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+    async def _fetch(self, key, query):
+        """Read a missing cache entry on the thread pool, again if it changed while being read"""
+        entry = self._fetching.setdefault(key, [0, 0])
+        entry[0] += 1
+        try:
+            while True:
+                changes = entry[1]
+                value = await self._run(query)
+                if entry[1] == changes:
+                    return value
+        finally:
+            entry[0] -= 1
+            if entry[0] == 0:
+                del self._fetching[key]
+
+    def _changed(self, key):
+        entry = self._fetching.get(key)
+        if entry is not None:
+            entry[1] += 1
+
+    def load(self):
+        self._settings = {guild_id: json.loads(settings) for guild_id, settings
+                          in self.kv.execute('HGETALL', self.key('guild_settings')).items()}
+        self._days = OrderedDict()
+        self._stats = OrderedDict()
+        self._guild_stats = {}
+        self._user_guilds = OrderedDict()
+
+    def _query_day(self, guild_id, date):
+        day = {}
+        for user_id, row in self.kv.execute('HGETALL', self.key('results', guild_id, date)).items():
+            result = day[user_id] = json.loads(row)
+            result.pop('_token', None)  # Only add_result looks at it
+        return day
+
+    def _day_pending(self, guild_id, date, user_ids):
+        return any(self.writer.is_pending(('result', guild_id, date, u)) for u in user_ids)
+
+    def _cache_day(self, key, day):
+        self._days[key] = day
+        while len(self._days) > self.cache_size:
+            (g, d), oldest = next(iter(self._days.items()))
+            if self._day_pending(g, d, oldest):
+                break
+            del self._days[g, d]
+        return day
+
+    def _day(self, guild_id, date):
+        """A day's cached results to write to, read from the store right here if needed"""
+        day = self._days.get((guild_id, date))
+        return day if day is not None else self._cache_day((guild_id, date), self._query_day(guild_id, date))
+
+    async def get_results(self, guild_id, date):
+        key = (guild_id, date)
+        if key not in self._days:
+            day = await self._fetch(('results', guild_id, date), lambda: self._query_day(guild_id, date))
+            if key not in self._days:  # Unless a write cached it meanwhile
+                return self._cache_day(key, day)
+        self._days.move_to_end(key)
+        return self._days[key]
+
+    def put_result(self, guild_id, date, user_id, result):
+        self._day(guild_id, date)[user_id] = result
+        self.writer.mark_dirty(('result', guild_id, date, user_id),
+                               lambda: _result_record(guild_id, date, user_id, result))
+
+    async def add_result(self, guild_id, date, user_id, result):
+        # HSETNX decides; the index updates after it are harmless if it didn't set anything.
+        # The stored copy carries a token, so if the connection drops before the
+        # reply comes back we can still tell whether our transaction stored it
+        token = os.urandom(8).hex()
+        commands = self.result_commands(guild_id, date, user_id, dict(result, _token=token))
+        commands[0] = ('HSETNX',) + commands[0][1:]
+        commands.append(self.announce(('results', guild_id, date)))
+
+        def store():
+            try:
+                return bool(self.kv.pipeline(commands, atomic=True)[0])
+            except (ConnectionError, OSError):
+                stored = self.kv.execute('HGET', commands[0][1], user_id)
+                if stored is None:  # The transaction never ran
+                    return bool(self.kv.pipeline(commands, atomic=True)[0])
+                return json.loads(stored).get('_token') == token
+
+        stored = await self._run(store)
+        self._changed(('results', guild_id, date))
+        if not stored:
+            self._days.pop((guild_id, date), None)  # Someone else's result is newer than our copy
+            return False
+        if (guild_id, date) in self._days:
+            self._days[guild_id, date][user_id] = result
+        return True
+
+    def remove_result(self, guild_id, date, user_id):
+        day = self._day(guild_id, date)
+        if user_id not in day:
+            return False
+        del day[user_id]
+        self.writer.mark_dirty(('result', guild_id, date, user_id),
+                               lambda: _result_record(guild_id, date, user_id, None))
+        return True
+
+    def _query_names(self, guild_id, user_ids):
+        names = {}
+        for i in range(0, len(user_ids), 500):
+            batch = user_ids[i:i + 500]
+            for user_id, name in zip(batch, self.kv.execute('HMGET', self.key('names', guild_id), *batch)):
+                if name is not None:
+                    names[user_id] = name
+        return names
+
+    async def known_usernames(self, guild_id, user_ids):
+        user_ids = list(user_ids)
+        names = await self._run(lambda: self._query_names(guild_id, user_ids))
+        # Results not flushed yet are newer than anything in the store
+        for (g, _), day in sorted(self._days.items()):
+            if g == guild_id:
+                for user_id in set(user_ids).intersection(day):
+                    names[user_id] = day[user_id]['username']
+        return names
+
+    def iter_results(self):
+        for guild_id in sorted(self.kv.execute('SMEMBERS', self.key('result_guilds'))):
+            for date in sorted(self.kv.execute('SMEMBERS', self.key('result_days', guild_id))):
+                for user_id, result in self._query_day(guild_id, date).items():
+                    yield guild_id, date, user_id, result
+
+    def iter_user_stats(self):
+        return iter(())  # The store only ever held user data in the current format, and doesn't list it
+
+    def _cache_stats(self, user_id, stats):
+        self._stats[user_id] = stats
+        self._stats.move_to_end(user_id)
+        while len(self._stats) > self.cache_size:
+            oldest = next(iter(self._stats))
+            if self.writer.is_pending(('user_stats', oldest)):
+                break
+            del self._stats[oldest]
+
+    async def get_user_stats(self, user_id):
+        if user_id not in self._stats:
+            key = self.key('user_stats', user_id)
+            row = await self._fetch(('user_stats', user_id), lambda: self.kv.execute('GET', key))
+            if user_id not in self._stats:  # Unless a write cached it meanwhile
+                if row is None:
+                    return None
+                self._cache_stats(user_id, json.loads(row))
+        self._stats.move_to_end(user_id)
+        return self._stats[user_id]
+
+    def put_user_stats(self, user_id, stats):
+        self._cache_stats(user_id, stats)
+        self.writer.mark_dirty(('user_stats', user_id),
+                               lambda: {'op': 'user_stats', 'user_id': user_id, 'stats': stats})
+
+    async def update_user_stats(self, user_id, update):
+        # Not retried if the connection drops mid-transaction, as it may have been applied
+        key = self.key('user_stats', user_id)
+        updated = {}
+
+        def build(execute):
+            row = execute('GET', key)
+            stats = updated['stats'] = update(json.loads(row) if row is not None else None)
+            return [('SET', key, json.dumps(stats)), self.announce(('user_stats', user_id))]
+
+        await self._run(lambda: self.kv.update([key], build))
+        self._cache_stats(user_id, updated['stats'])
+        return updated['stats']
+
+    def _query_guild(self, guild_id):
+        user_ids = sorted(self.kv.execute('SMEMBERS', self.key('stats_members', guild_id)))
+        players = {}
+        for i in range(0, len(user_ids), 500):
+            batch = user_ids[i:i + 500]
+            rows = self.kv.execute('MGET', *(self.key('guild_stats', guild_id, u) for u in batch))
+            players.update((u, PlayerStats.from_row(json.loads(row))) for u, row in zip(batch, rows) if row)
+        return players
+
+    async def guild_stats(self, guild_id):
+        if guild_id not in self._guild_stats:
+            players = await self._fetch(('guild_stats', guild_id), lambda: self._query_guild(guild_id))
+            self._guild_stats.setdefault(guild_id, players)  # Unless a write loaded it meanwhile
+        return self._guild_stats[guild_id]
+
+    def _cache_user_guild(self, guild_id, user_id, stats):
+        if user_id in self._user_guilds:
+            self._user_guilds[user_id][guild_id] = stats
+
+    def put_guild_stats(self, guild_id, user_id, stats):
+        if guild_id not in self._guild_stats:
+            self._guild_stats[guild_id] = self._query_guild(guild_id)
+        self._guild_stats[guild_id][user_id] = stats
+        self._cache_user_guild(guild_id, user_id, stats)
+        self.writer.mark_dirty(('guild_stats', guild_id, user_id),
+                               lambda: _guild_stats_record(guild_id, user_id, stats))
+
+    async def update_guild_stats(self, guild_id, user_id, update):
+        key = self.key('guild_stats', guild_id, user_id)
+        updated = {}
+
+        def build(execute):
+            row = execute('GET', key)
+            stats = updated['stats'] = update(PlayerStats.from_row(json.loads(row)) if row is not None else None)
+            return (self.guild_stats_commands(guild_id, user_id, stats.to_row())
+                    + [self.announce(('guild_stats', guild_id, user_id))])
+
+        await self._run(lambda: self.kv.update([key], build))
+        self._changed(('guild_stats', guild_id))
+        self._changed(('user_guilds', user_id))
+        if guild_id in self._guild_stats:
+            self._guild_stats[guild_id][user_id] = updated['stats']
+        self._cache_user_guild(guild_id, user_id, updated['stats'])
+        return updated['stats']
+
+    def _query_user_guilds(self, user_id):
+        guild_ids = sorted(self.kv.execute('SMEMBERS', self.key('user_guilds', user_id)))
+        if not guild_ids:
+            return {}
+        rows = self.kv.execute('MGET', *(self.key('guild_stats', g, user_id) for g in guild_ids))
+        return {g: PlayerStats.from_row(json.loads(row)) for g, row in zip(guild_ids, rows) if row}
+
+    async def user_guild_stats(self, user_id):
+        if user_id not in self._user_guilds:
+            found = await self._fetch(('user_guilds', user_id), lambda: self._query_user_guilds(user_id))
+            self._user_guilds.setdefault(user_id, found)
+            while len(self._user_guilds) > self.cache_size:
+                self._user_guilds.popitem(last=False)
+        self._user_guilds.move_to_end(user_id)
+        found = dict(self._user_guilds[user_id])
+        # Loaded guilds may hold changes that haven't been flushed yet
+        for guild_id, players in self._guild_stats.items():
+            if user_id in players:
+                found[guild_id] = players[user_id]
+        return found
+
+    async def has_guild_stats(self):
+        if any(self._guild_stats.values()):
+            return True
+        return await self._run(lambda: self.kv.execute('SCARD', self.key('stats_guilds'))) > 0
+
+    def get_guild_settings(self, guild_id):
+        return self._settings.get(guild_id)
+
+    def put_guild_settings(self, guild_id, settings):
+        self._settings[guild_id] = settings
+        self.writer.mark_dirty(('guild_settings', guild_id),
+                               lambda: {'op': 'guild_settings', 'guild_id': guild_id, 'settings': settings})
+
+    def all_guild_settings(self):
+        return self._settings
+
+    def files(self):
+        return []  # Nothing on this machine's disk
+
+    def _on_message(self, channel, message):
+        # On the subscription's thread: re-read the rows here, then hand them to the event loop
+        data = json.loads(message)
+        if data['node'] == self.node_id or self._loop is None:
+            return
+        try:
+            fresh = self._read_rows(data['rows'])
+        except (KVError, ConnectionError, OSError) as e:
+            print(f"Could not re-read rows changed by another process, cached copies may be stale: {e}")
+            fresh = {}
+        self._loop.call_soon_threadsafe(self._invalidate, data['rows'], fresh)
+
+    def _read_rows(self, rows):
+        """Get {index in rows: stored value} for the changed rows we have cached copies of"""
+        fresh = {}
+        for i, row in enumerate(rows):
+            kind = row[0]
+            if kind == 'results' and (row[1], row[2]) in self._days:
+                fresh[i] = self._query_day(row[1], row[2])
+            elif kind == 'guild_stats' and (row[1] in self._guild_stats or row[2] in self._user_guilds):
+                stored = self.kv.execute('GET', self.key('guild_stats', row[1], row[2]))
+                fresh[i] = PlayerStats.from_row(json.loads(stored)) if stored is not None else None
+            elif kind == 'guild_settings':
+                stored = self.kv.execute('HGET', self.key('guild_settings'), row[1])
+                fresh[i] = json.loads(stored) if stored is not None else None
+        return fresh
+
+    def _invalidate(self, rows, fresh):
+        """Swap in re-read copies of rows another process changed, or drop them"""
+        for i, row in enumerate(rows):
+            kind = row[0]
+            if kind == 'results':
+                guild_id, date = row[1], row[2]
+                self._changed(('results', guild_id, date))
+                day = self._days.get((guild_id, date))
+                if day is not None and i in fresh:
+                    stored = fresh[i]
+                    # Our own unflushed changes still win until they are written
+                    for user_id in set(day).union(stored):
+                        if self.writer.is_pending(('result', guild_id, date, user_id)):
+                            if user_id in day:
+                                stored[user_id] = day[user_id]
+                            else:
+                                stored.pop(user_id, None)
+                    day.clear()
+                    day.update(stored)
+                elif day is not None and not self._day_pending(guild_id, date, day):
+                    del self._days[guild_id, date]  # Read again when it's next needed
+            elif kind == 'user_stats':
+                self._changed(('user_stats', row[1]))
+                if not self.writer.is_pending(('user_stats', row[1])):
+                    self._stats.pop(row[1], None)
+            elif kind == 'guild_stats':
+                guild_id, user_id = row[1], row[2]
+                self._changed(('guild_stats', guild_id))
+                self._changed(('user_guilds', user_id))
+                guilds = self._user_guilds.get(user_id)
+                if self.writer.is_pending(('guild_stats', guild_id, user_id)):
+                    pass  # Our own unflushed change still wins until it is written
+                elif i in fresh:
+                    for cached, key in ((self._guild_stats.get(guild_id), user_id), (guilds, guild_id)):
+                        if cached is None:
+                            continue
+                        if fresh[i] is None:
+                            cached.pop(key, None)
+                        else:
+                            cached[key] = fresh[i]
+                elif guilds is not None:
+                    # Guilds loaded after the change was read already have it; users are read again
+                    del self._user_guilds[user_id]
+            elif kind == 'guild_settings':
+                guild_id = row[1]
+                if i in fresh and not self.writer.is_pending(('guild_settings', guild_id)):
+                    if fresh[i] is None:
+                        self._settings.pop(guild_id, None)
+                    else:
+                        self._settings[guild_id] = fresh[i]
+            self.invalidations += 1
+            if self.on_invalidate is not None:
+                try:
+                    self.on_invalidate(tuple(row))
+                except Exception as e:
+                    print(f"Error handling change to {row}: {e}")
+
+    def start(self):
+        super().start()
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self.kv.subscribe(self.channel, self._on_message)
+
+    def close(self):
+        super().close()
+        if self._loop is not None:
+            self.kv.unsubscribe(self.channel, self._on_message)
+            self._loop = None
+        self._executor.shutdown()
+        self.kv.close()
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """One-shot copy of wordle_data.json (plus its log) into a SQLite database"""
+    state = WriteAheadLog(json_path).load()
+    conn = connect_sqlite(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO daily_results VALUES (?, ?, ?, ?)",
+            ((guild_id, date, user_id, json.dumps(result))
+             for guild_id, dates in state['daily_results'].items()
+             for date, results in dates.items()
+             for user_id, result in results.items()))
+        conn.executemany("INSERT OR REPLACE INTO user_stats VALUES (?, ?)",
+                         ((user_id, json.dumps(stats)) for user_id, stats in state['user_stats'].items()))
+        conn.executemany("INSERT OR REPLACE INTO guild_stats VALUES (?, ?, ?)",
+                         ((guild_id, user_id, json.dumps(row))
+                          for guild_id, rows in state['guild_stats'].items()
+                          for user_id, row in rows.items()))
+        conn.executemany("INSERT OR REPLACE INTO guild_settings VALUES (?, ?)",
+                         ((guild_id, json.dumps(s)) for guild_id, s in state['guild_settings'].items()))
+    conn.close()
+    results = sum(len(r) for dates in state['daily_results'].values() for r in dates.values())
+    print(f"Migrated {results} results, {len(state['user_stats'])} users and "
+          f"{len(state['guild_settings'])} guilds into {db_path}")
+
+
+def open_storage(backend, path=None, flush_interval_ms=500, compact_after=1000):
+    """Create the storage backend named by STORAGE_BACKEND"""
+    if backend == 'sqlite':
+        path = path or "wordle_data.db"
+        json_path = "wordle_data.json"
+        json_exists = os.path.exists(json_path) or os.path.exists(WriteAheadLog(json_path).log_path)
+        if not os.path.exists(path) and json_exists:
+            print(f"Migrating {json_path} to {path}...")
+            migrate_json_to_sqlite(json_path, path)
+        return SqliteStorage(path, flush_interval_ms=flush_interval_ms)
+    if backend == 'json':
+        return JsonStorage(path or "wordle_data.json", compact_after=compact_after,
+                           flush_interval_ms=flush_interval_ms)
+    if backend == 'redis':
+        # Shared by every bot process pointed at the same server; path is its URL
+        return SharedStorage(RespKV.from_url(path or "redis://127.0.0.1:6379/0"), flush_interval_ms=flush_interval_ms)
+    if backend == 'memory':
+        # Nothing is kept after the bot stops; for tests and local runs
+        return SharedStorage(MemoryKV(), flush_interval_ms=flush_interval_ms)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+if __name__ == "__main__":
+    # python storage.py [wordle_data.json] [wordle_data.db]
+    migrate_json_to_sqlite(sys.argv[1] if len(sys.argv) > 1 else "wordle_data.json",
+                           sys.argv[2] if len(sys.argv) > 2 else "wordle_data.db")
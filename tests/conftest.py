@@ -0,0 +1,85 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+# The bot's modules live in the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    """The bot module on in-memory storage, never connected to Discord"""
+    os.environ['STORAGE_BACKEND'] = 'memory'
+    cwd = os.getcwd()
+    os.chdir(ROOT)  # Word lists and caches are found relative to the working directory
+    try:
+        import app
+    finally:
+        os.chdir(cwd)
+    app.active_games.snapshot_path = str(tmp_path_factory.mktemp("sessions") / "active_games.json")
+    return app
+
+
+class FakeDiscord:
+    """Builds real discord.Interaction objects for the bot and answers their API calls locally"""
+
+    ids = itertools.count(10 ** 17)
+
+    def __init__(self, app):
+        import discord
+        self.discord = discord
+        self.state = app.bot._connection
+        self.state.user = discord.ClientUser(state=self.state, data=self.user_data(1, "bot"))
+        self.responses = []  # Payloads of interaction responses, oldest first
+
+    def user_data(self, user_id, name):
+        return {'id': str(user_id), 'username': name, 'discriminator': "0", 'avatar': None, 'global_name': name}
+
+    def interaction(self, kind, data, user_id, message=None):
+        payload = {
+            'id': str(next(self.ids)), 'application_id': "1", 'type': kind, 'token': "token", 'version': 1,
+            'guild_id': "900", 'channel_id': "901", 'data': data, 'locale': "en-US", 'app_permissions': "0",
+            'member': {'user': self.user_data(user_id, f"player{user_id}"), 'roles': [], 'flags': 0,
+                       'joined_at': "2026-01-01T00:00:00+00:00", 'deaf': False, 'mute': False, 'permissions': "0"},
+        }
+        if message is not None:
+            payload['message'] = message
+        return self.discord.Interaction(data=payload, state=self.state)
+
+    def command(self, name, user_id):
+        return self.interaction(2, {'id': "5", 'name': name, 'type': 1}, user_id)
+
+    def message(self, command):
+        """The ephemeral message a command's response created"""
+        return {'id': str(command.id + 1), 'channel_id': "901", 'type': 0, 'content': "", 'flags': 64,
+                'author': self.user_data(1, "bot"), 'attachments': [], 'embeds': [], 'mentions': [],
+                'mention_roles': [], 'pinned': False, 'mention_everyone': False, 'tts': False,
+                'timestamp': "2026-01-01T00:00:00+00:00", 'edited_timestamp': None, 'components': [],
+                'interaction_metadata': {'id': str(command.id), 'type': 2, 'authorizing_integration_owners': {},
+                                         'user': self.user_data(command.user.id, command.user.name)}}
+
+    def modal_submit(self, modal, command):
+        """Submitting a modal opened from the message that command's response created"""
+        return self.interaction(5, {'custom_id': modal.custom_id, 'components': []}, command.user.id,
+                                message=self.message(command))
+
+
+@pytest.fixture
+def discord_api(app, monkeypatch):
+    from discord.webhook.async_ import AsyncWebhookAdapter
+    fake = FakeDiscord(app)
+
+    async def create_interaction_response(adapter, interaction_id, token, *, params, **kwargs):
+        fake.responses.append(params.payload)
+        return {'interaction': {'id': str(interaction_id), 'type': 2}}
+
+    async def edit_original_interaction_response(adapter, application_id, token, *, payload=None, **kwargs):
+        fake.responses.append(payload)
+        return fake.message(fake.command("edit", 1))
+
+    monkeypatch.setattr(AsyncWebhookAdapter, 'create_interaction_response', create_interaction_response)
+    monkeypatch.setattr(AsyncWebhookAdapter, 'edit_original_interaction_response', edit_original_interaction_response)
+    return fake
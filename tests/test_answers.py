@@ -0,0 +1,54 @@
+import datetime
+import os
+import random
+
+from answers import AnswerSchedule
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Words the bot already served on these dates; they must never change
+PINNED = {
+    "2020-03-01": "forge",
+    "2024-01-01": "final",
+    "2025-02-28": "scope",
+    "2025-06-15": "lurch",
+    "2026-01-01": "adopt",
+    "2026-10-15": "blurb",
+    "2026-10-16": "swine",
+    "2031-12-31": "sinew",
+}
+
+
+def answer_words():
+    with open(os.path.join(ROOT, "wordle-answers-alphabetical.txt")) as f:
+        return [line.strip() for line in f]
+
+
+def test_served_words_are_pinned():
+    answers = answer_words()
+    # Inside and outside the precomputed window
+    for schedule in (AnswerSchedule(answers).precompute(today=datetime.date(2026, 1, 1)), AnswerSchedule(answers)):
+        for date, word in PINNED.items():
+            assert schedule.word(datetime.date.fromisoformat(date)) == word, date
+
+
+def test_matches_reseeding_the_global_random_module():
+    """The way daily words were picked before the schedule existed"""
+    answers = answer_words()
+    schedule = AnswerSchedule(answers).precompute(days_back=30, days_ahead=30, today=datetime.date(2026, 10, 16))
+    state = random.getstate()
+    try:
+        for date, word in schedule.words_between(datetime.date(2026, 8, 1), datetime.date(2026, 12, 31)):
+            random.seed(date.toordinal())
+            assert word == random.choice(answers), date
+    finally:
+        random.setstate(state)
+
+
+def test_bulk_lookups():
+    schedule = AnswerSchedule(answer_words()).precompute(today=datetime.date(2026, 10, 16))
+    assert schedule.past(2, end=datetime.date(2026, 10, 15)) == [
+        (datetime.date(2026, 10, 14), schedule.word(datetime.date(2026, 10, 14))),
+        (datetime.date(2026, 10, 15), "blurb"),
+    ]
+    assert schedule.upcoming(1, start=datetime.date(2026, 10, 16)) == [(datetime.date(2026, 10, 16), "swine")]
@@ -0,0 +1,66 @@
+from feedback import FeedbackTable, encode_feedback, feedback_code, render_feedback
+
+# Heavy on repeated letters, where yellows are easy to get wrong
+GUESSES = ["speed", "eerie", "geese", "llama", "allay", "sassy", "mamma", "robot", "crane", "abbey", "tepee", "eagle"]
+ANSWERS = ["abide", "crepe", "those", "lever", "allay", "sassy", "eerie", "mommy", "otter", "flood", "geese", "apple"]
+
+
+def reference_feedback(guess, answer):
+    """Two-pass scoring the bot used before the table: greens first, then yellows from what is left"""
+    feedback = [None] * 5
+    answer_chars = list(answer)
+    guess_chars = list(guess)
+    for i in range(5):
+        if guess_chars[i] == answer_chars[i]:
+            feedback[i] = "🟩"
+            answer_chars[i] = guess_chars[i] = None
+    for i in range(5):
+        if feedback[i] is None:
+            if guess_chars[i] in answer_chars:
+                feedback[i] = "🟨"
+                answer_chars[answer_chars.index(guess_chars[i])] = None
+            else:
+                feedback[i] = "⬜"
+    return "".join(feedback)
+
+
+def test_feedback_code_matches_reference():
+    for guess in GUESSES:
+        for answer in ANSWERS:
+            assert render_feedback(feedback_code(guess, answer)) == reference_feedback(guess, answer), (guess, answer)
+
+
+def test_repeated_letters():
+    # One E in the answer: only the first of the guess's two Es is yellow
+    assert render_feedback(feedback_code("speed", "abide")) == "⬜⬜🟨⬜🟨"
+    # The green E uses up one of the answer's Es before yellows are given out
+    assert render_feedback(feedback_code("eerie", "crepe")) == "🟨⬜🟨⬜🟩"
+    assert render_feedback(feedback_code("mamma", "mommy")) == "🟩⬜🟩🟩⬜"
+    assert encode_feedback(reference_feedback("geese", "geese")) == 242
+
+
+def test_table_matches_reference(tmp_path):
+    guesses = sorted(set(GUESSES) | set(ANSWERS))
+    table = FeedbackTable(guesses, ANSWERS, str(tmp_path / "table.bin")).open()
+    try:
+        for g, guess in enumerate(guesses):
+            row = table.row(g)
+            for a, answer in enumerate(ANSWERS):
+                expected = encode_feedback(reference_feedback(guess, answer))
+                assert table.code(guess, answer) == expected, (guess, answer)
+                assert table.code_by_index(g, a) == row[a] == expected, (guess, answer)
+        # Words outside the table are scored directly
+        assert render_feedback(table.code("tepee", "level")) == reference_feedback("tepee", "level")
+    finally:
+        table.close()
+
+
+def test_table_rebuilds_for_other_words(tmp_path):
+    path = str(tmp_path / "table.bin")
+    FeedbackTable(GUESSES, ANSWERS, path).open().close()
+    # Same file, different word lists: the stale cache must not be used
+    table = FeedbackTable(ANSWERS, GUESSES, path).open()
+    try:
+        assert table.code("crepe", "eerie") == encode_feedback(reference_feedback("crepe", "eerie"))
+    finally:
+        table.close()
@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import aiohttp
+from aiohttp import web
+
+from metrics import Metrics
+
+
+def test_handler_response_sizes_are_recorded_per_handler():
+    metrics = Metrics()
+    body = json.dumps({'type': 4, 'data': {'content': "x" * 3000}}).encode()
+
+    async def run():
+        async def reply(request):
+            await request.read()
+            return web.json_response({})
+
+        server = web.Application()
+        server.router.add_post("/reply", reply)
+        runner = web.AppRunner(server)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/reply"
+        try:
+            async with aiohttp.ClientSession(trace_configs=[metrics.http_trace()]) as session:
+                async def send():
+                    async with session.post(url, data=body) as response:
+                        await response.read()
+
+                @metrics.instrument("guess_submit")
+                async def handler():
+                    await send()
+                    await send()
+
+                await handler()
+                await send()  # Not in a handler
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+    sizes = metrics._histograms["wordle_handler_response_bytes"]
+    assert list(sizes) == [(('handler', "guess_submit"),)]
+    histogram = sizes[(('handler', "guess_submit"),)]
+    assert histogram.count == 2 and histogram.sum == 2 * len(body)
+    assert 'wordle_handler_response_bytes_bucket{handler="guess_submit",le="4096"} 2' in metrics.render()
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+
+import persistence
+from persistence import DataWriter, WriteAheadLog
+
+
+class FlakySink:
+    """Sink whose writes fail until failures runs out, remembering what got written"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.written = []
+
+    def encode(self, records):
+        return list(records)
+
+    def write_batch(self, batch):
+        if self.failures > 0:
+            self.failures -= 1
+            raise OSError("No space left on device")
+        self.written.extend(batch)
+
+    def batch_size(self, batch):
+        return len(batch)
+
+    def maintain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_failed_write_keeps_rows_pending():
+    sink = FlakySink(failures=1)
+    writer = DataWriter(sink)
+
+    async def run():
+        writer.mark_dirty('a', lambda: {'row': 'a', 'value': 1})
+        try:
+            await writer.flush()
+        except OSError:
+            pass
+        else:
+            raise AssertionError("flush should have failed")
+        assert writer.is_pending('a')
+        await writer.flush()
+
+    asyncio.run(run())
+    assert sink.written == [{'row': 'a', 'value': 1}]
+    assert not writer.is_pending('a')
+
+
+def test_failed_write_does_not_overwrite_newer_changes():
+    sink = FlakySink(failures=1)
+    writer = DataWriter(sink)
+    values = {'a': 1}
+
+    async def run():
+        writer.mark_dirty('a', lambda: {'row': 'a', 'value': values['a']})
+        writer.mark_dirty('b', lambda: {'row': 'b'})
+        flush = asyncio.create_task(writer.flush())
+        await asyncio.sleep(0)  # The batch is drained, and its write is failing on the writer thread
+        values['a'] = 2
+        writer.mark_dirty('a', lambda: {'row': 'a', 'value': 2, 'newer': True})
+        try:
+            await flush
+        except OSError:
+            pass
+        await writer.flush()
+
+    asyncio.run(run())
+    assert sorted(sink.written, key=lambda r: r['row']) == [{'row': 'a', 'value': 2, 'newer': True}, {'row': 'b'}]
+
+
+def test_background_flush_retries_until_written():
+    sink = FlakySink(failures=2)
+    writer = DataWriter(sink, interval_ms=10, max_retry_delay=0.05)
+
+    async def run():
+        writer.start()
+        writer.mark_dirty('a', lambda: {'row': 'a'})
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if sink.written:
+                break
+
+    asyncio.run(run())
+    assert sink.written == [{'row': 'a'}]
+    assert sink.failures == 0
+    assert not writer.is_pending('a')
+
+
+def result_record(user_id):
+    return {'op': 'result', 'guild_id': "g", 'date': "2026-10-16", 'user_id': user_id, 'result': {'won': True}}
+
+
+def test_compaction_after_an_unfinished_one_still_compacts_the_log(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / "data.json"), compact_after=2)
+    wal.append(result_record("1"))
+    wal.close()
+    # Left behind by a compaction that was interrupted
+    os.replace(wal.log_path, wal.compacting_path)
+    wal.append_many([result_record("2"), result_record("3")])
+
+    wal.maintain()  # Folds in the leftover file only
+    assert not os.path.exists(wal.compacting_path)
+    assert wal.needs_compaction()
+    wal.maintain()
+    assert not os.path.exists(wal.log_path)
+    assert not wal.needs_compaction()
+    wal.close()
+
+    with open(wal.snapshot_path) as f:
+        snapshot = json.load(f)
+    assert sorted(snapshot['daily_results']["g"]["2026-10-16"]) == ["1", "2", "3"]
+
+
+def test_failed_compaction_is_retried(tmp_path, monkeypatch):
+    wal = WriteAheadLog(str(tmp_path / "data.json"), compact_after=1)
+    wal.append(result_record("1"))
+
+    def disk_full(path, data):
+        raise OSError("No space left on device")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(persistence, 'write_json_atomic', disk_full)
+        try:
+            wal.maintain()
+        except OSError:
+            pass
+    wal.append(result_record("2"))
+    assert wal.needs_compaction()
+    wal.maintain()
+    wal.maintain()
+    wal.close()
+
+    assert WriteAheadLog(wal.snapshot_path).load()['daily_results']["g"]["2026-10-16"].keys() == {"1", "2"}
+    assert not os.path.exists(wal.log_path) and not os.path.exists(wal.compacting_path)
@@ -0,0 +1,42 @@
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+import discord
+
+from scheduler import Job
+
+
+def call(app, error, fail_times=1):
+    """Run a request through a job that fails fail_times with error; returns how often it was sent"""
+    job = Job("test", None, max_attempts=4, base_delay=0, retryable=app.is_retryable_error)
+    sent = []
+
+    async def request():
+        sent.append(1)
+        if len(sent) <= fail_times:
+            raise error
+        return "posted"
+
+    try:
+        result = asyncio.run(job.call(request))
+    except Exception as e:
+        result = e
+    return result, len(sent)
+
+
+def http_error(status):
+    return discord.HTTPException(SimpleNamespace(status=status, reason="error"), "error")
+
+
+def test_server_errors_are_not_sent_again(app):
+    # discord.py has already retried these, and the message may have been posted
+    for error in (http_error(503), http_error(429), asyncio.TimeoutError(), aiohttp.ServerDisconnectedError()):
+        result, sent = call(app, error)
+        assert result is error and sent == 1
+
+
+def test_failed_connections_are_retried(app):
+    key = SimpleNamespace(host="discord.com", port=443, ssl=True)
+    result, sent = call(app, aiohttp.ClientConnectorError(key, OSError(111, "Connection refused")), fail_times=2)
+    assert result == "posted" and sent == 3
@@ -0,0 +1,180 @@
+import asyncio
+
+import sessions
+from sessions import KeyedLocks, RecentKeys, SessionManager, TimerWheel
+
+
+def test_keyed_locks_run_one_holder_per_key_at_a_time():
+    locks = KeyedLocks()
+    events = []
+
+    async def work(key, name):
+        async with locks.hold(key):
+            events.append(("start", name))
+            await asyncio.sleep(0.01)
+            events.append(("end", name))
+
+    async def run():
+        await asyncio.gather(work("u1", "a"), work("u1", "b"))
+        return len(locks)
+
+    assert asyncio.run(run()) == 0  # Nothing kept once released
+    assert events == [("start", "a"), ("end", "a"), ("start", "b"), ("end", "b")]
+
+
+def test_keyed_locks_keys_do_not_wait_for_each_other():
+    locks = KeyedLocks()
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold_u1():
+            async with locks.hold("u1"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold_u1())
+        await asyncio.sleep(0)
+        async with locks.hold("u2"):
+            held = len(locks)
+        release.set()
+        await holder
+        return held
+
+    assert asyncio.run(run()) == 2
+
+
+def test_keyed_locks_past_max_keys_a_new_key_waits():
+    locks = KeyedLocks(max_keys=1)
+
+    async def run():
+        release = asyncio.Event()
+        order = []
+
+        async def hold(key):
+            async with locks.hold(key):
+                order.append(key)
+                if key == "u1":
+                    await release.wait()
+
+        first = asyncio.create_task(hold("u1"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(hold("u2"))
+        await asyncio.sleep(0.01)
+        waiting = order == ["u1"]
+        release.set()
+        await asyncio.gather(first, second)
+        return waiting, order
+
+    waiting, order = asyncio.run(run())
+    assert waiting
+    assert order == ["u1", "u2"]
+
+
+def test_recent_keys_notice_repeats():
+    keys = RecentKeys(max_size=2)
+    assert keys.first_time(1)
+    assert not keys.first_time(1)
+    assert keys.first_time(2)
+    assert keys.first_time(3)  # Pushes 1 out
+    assert keys.first_time(1)
+    assert not keys.first_time(3)
+
+
+class FakeGame:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def to_snapshot(self):
+        return {'name': self.name}
+
+    def close(self):
+        self.closed = True
+
+
+def fake_clock(monkeypatch, start=1000.0):
+    clock = [start]
+    monkeypatch.setattr(sessions.time, 'monotonic', lambda: clock[0])
+    return clock
+
+
+def test_timer_wheel_fires_keys_when_due(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    wheel = TimerWheel(tick=1.0, slots=8)
+    wheel.schedule("a", clock[0] + 3)
+    wheel.schedule("b", clock[0] + 20)  # More than one turn of the wheel out
+    wheel.schedule("c", clock[0] + 5)
+    wheel.schedule("c", clock[0] + 6)  # Moved, not added twice
+    assert wheel.advance(clock[0] + 2) == []
+    assert wheel.advance(clock[0] + 3) == ["a"]
+    wheel.cancel("b")
+    assert wheel.advance(clock[0] + 5) == []
+    assert wheel.advance(clock[0] + 30) == ["c"]
+    assert len(wheel) == 0
+
+
+def test_idle_games_expire(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    manager = SessionManager(ttl=10, tick=1.0)
+    first, second = FakeGame("first"), FakeGame("second")
+    manager.add(1, first)
+    manager.add(2, second)
+    clock[0] += 8
+    manager.touch(2)  # Played again, so idle for less time
+    clock[0] += 3
+    assert manager.expire() == [1]
+    assert first.closed and not second.closed
+    assert manager.get(1) is None and manager.get(2) is second
+    clock[0] += 10
+    assert manager.expire() == [2]
+    assert second.closed and len(manager) == 0
+    assert manager.expired_count == 2
+
+
+def test_games_over_the_limit_are_dropped_oldest_first(monkeypatch):
+    fake_clock(monkeypatch)
+    manager = SessionManager(ttl=10, max_sessions=2)
+    games = [FakeGame(str(n)) for n in range(3)]
+    manager.add(0, games[0])
+    manager.add(1, games[1])
+    manager.touch(0)
+    manager.add(2, games[2])
+    assert sorted(manager.games) == [0, 2]
+    assert games[1].closed
+    assert manager.wheel.advance(sessions.time.monotonic() + 100) == [0, 2]  # Nothing left scheduled for 1
+
+
+def test_snapshot_restore(tmp_path):
+    path = str(tmp_path / "active_games.json")
+    manager = SessionManager(snapshot_path=path)
+    manager.add(1, FakeGame("kept"))
+    manager.add(2, FakeGame("old"))
+    manager.save()
+
+    restored = SessionManager(snapshot_path=path)
+    count = restored.restore(lambda data: FakeGame(data['name']) if data['name'] != "old" else None)
+    assert count == 1
+    assert restored.get(1).name == "kept" and 2 not in restored
+    assert 1 in restored.wheel._due  # Restored games expire like new ones
+
+
+def test_snapshot_restore_replays_guesses(app, tmp_path):
+    today = app.get_today_string()
+    game = app.WordleGame("moist", 7, 900, app.SOLVER, today)
+    game.make_guess("crane")
+    game.make_guess("toils")
+    path = str(tmp_path / "active_games.json")
+    manager = SessionManager(snapshot_path=path)
+    manager.add(7, game)
+    manager.save()
+
+    restored = SessionManager(snapshot_path=path)
+    assert restored.restore(lambda data: app.WordleGame.from_snapshot(data, app.SOLVER, today)) == 1
+    again = restored.get(7)
+    assert again.answer == "moist" and again.guild_id == 900
+    assert again.guesses == game.guesses and again.num_guesses == 2
+    assert not again.completed
+
+    # A game from another day is not brought back
+    assert SessionManager(snapshot_path=path).restore(
+        lambda data: app.WordleGame.from_snapshot(data, app.SOLVER, "2000-01-01")) == 0
@@ -0,0 +1,52 @@
+import asyncio
+
+from stats import backfill_guild_stats
+from storage import JsonStorage
+
+
+def result(won=True, guesses=4):
+    return {'won': won, 'guesses': guesses, 'result_string': "x", 'username': "player", 'game_time': 60}
+
+
+def legacy_stats(games_played):
+    """User data as kept before per-server stats, reduced to what backfill looks at"""
+    return {'games_played': games_played, 'games_won': games_played, 'current_streak': 0,
+            'first_guesses': {'crane': 2}}
+
+
+def read(call):
+    return asyncio.run(call)
+
+
+def storage_with_results(tmp_path, results):
+    storage = JsonStorage(str(tmp_path / "wordle_data.json"))
+    storage.load()
+    for guild_id, date, user_id in results:
+        storage.put_result(guild_id, date, user_id, result())
+    return storage
+
+
+def test_backfill_replays_every_result(tmp_path):
+    storage = storage_with_results(tmp_path, [("g1", "2026-01-01", "u1"), ("g1", "2026-01-02", "u1"),
+                                              ("g2", "2026-01-02", "u1")])
+    backfill_guild_stats(storage)
+    assert read(storage.get_guild_stats("g1", "u1")).games_played == 2
+    assert read(storage.get_guild_stats("g1", "u1")).current_streak == 2
+    assert read(storage.get_guild_stats("g2", "u1")).games_played == 1
+
+
+def test_backfill_skips_results_from_before_a_stats_reset(tmp_path):
+    storage = storage_with_results(tmp_path, [("g1", "2026-01-01", "cleared"), ("g1", "2026-01-02", "cleared"),
+                                              ("g1", "2026-01-01", "u2"), ("g2", "2026-01-02", "u2"),
+                                              ("g1", "2026-01-03", "u2")])
+    storage.put_user_stats("cleared", legacy_stats(0))
+    storage.put_user_stats("u2", legacy_stats(2))  # Cleared after their first game
+    backfill_guild_stats(storage)
+
+    assert read(storage.user_guild_stats("cleared")) == {}
+    assert read(storage.get_guild_stats("g1", "u2")).games_played == 1
+    assert read(storage.get_guild_stats("g1", "u2")).last_played == "2026-01-03"
+    assert read(storage.get_guild_stats("g2", "u2")).games_played == 1
+    # The old global counters are gone, first guesses stay
+    assert read(storage.get_user_stats("cleared")) == {'first_guesses': {'crane': 2}}
+    assert read(storage.get_user_stats("u2")) == {'first_guesses': {'crane': 2}}
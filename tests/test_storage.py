@@ -0,0 +1,80 @@
+import asyncio
+
+from kvstore import MemoryKV
+from stats import PlayerStats
+from storage import SharedStorage
+
+
+class LostReplyKV(MemoryKV):
+    """Store whose next transactions run but lose their reply, like a connection dropping after EXEC"""
+
+    def __init__(self, lost=0):
+        super().__init__()
+        self.lost = lost
+
+    def pipeline(self, commands, atomic=False):
+        replies = super().pipeline(commands, atomic)
+        if self.lost > 0:
+            self.lost -= 1
+            raise ConnectionError("Connection closed by the key-value server")
+        return replies
+
+
+def result(name):
+    return {'won': True, 'guesses': 3, 'result_string': "x", 'username': name, 'game_time': 30}
+
+
+def add_results(kv, *names):
+    storage = SharedStorage(kv)
+    storage.load()
+
+    async def run():
+        return [await storage.add_result("g1", "2026-10-16", "u1", result(name)) for name in names]
+    return storage, asyncio.run(run())
+
+
+def test_add_result_stored_once():
+    storage, added = add_results(MemoryKV(), "alice", "alice again")
+    assert added == [True, False]
+    assert asyncio.run(storage.get_result("g1", "2026-10-16", "u1")) == result("alice")
+
+
+def test_add_result_with_lost_reply_counts_as_stored():
+    storage, added = add_results(LostReplyKV(lost=1), "alice")
+    assert added == [True]
+    assert asyncio.run(storage.get_result("g1", "2026-10-16", "u1")) == result("alice")
+
+
+def test_add_result_with_lost_reply_still_sees_duplicates():
+    kv = LostReplyKV()
+    add_results(kv, "alice")
+    kv.lost = 1
+    _, added = add_results(kv, "alice again")
+    assert added == [False]
+
+
+def record_win(stats):
+    stats = stats or PlayerStats()
+    stats.record(True, 3, 30, "2026-10-16")
+    return stats
+
+
+def test_user_guild_stats_cache_follows_other_processes():
+    kv = MemoryKV()
+
+    async def run():
+        a, b = SharedStorage(kv), SharedStorage(kv)
+        for storage in (a, b):
+            storage.load()
+            storage.start()
+        await b.update_guild_stats("g1", "u1", record_win)
+        before = await a.user_guild_stats("u1")
+        await b.update_guild_stats("g1", "u1", record_win)
+        await b.update_guild_stats("g2", "u1", record_win)
+        await asyncio.sleep(0.05)  # Announcements reach a's event loop
+        after = await a.user_guild_stats("u1")
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert {g: s.games_played for g, s in before.items()} == {"g1": 1}
+    assert {g: s.games_played for g, s in after.items()} == {"g1": 2, "g2": 1}
@@ -0,0 +1,86 @@
+import asyncio
+
+
+def view_store_size(app):
+    store = app.bot._connection._view_store
+    return len(store._views), len(store._synced_message_views)
+
+
+def test_finished_game_leaves_no_view_behind(app, discord_api):
+    user_id = 4201
+
+    async def play():
+        app.bot.add_view(app.WordleView())
+        before = view_store_size(app)
+        command = discord_api.command("betterwordle", user_id)
+        await app.betterwordle.callback(command)
+        game = app.active_games.get(user_id)
+        for word in ("zzzzz", "crane" if game.answer != "crane" else "slate", game.answer):
+            modal = app.GuessModal(game)
+            modal.guess._value = word
+            await modal.on_submit(discord_api.modal_submit(modal, command))
+        return before, game
+
+    before, game = asyncio.run(play())
+    assert game.completed and game.won
+    assert view_store_size(app) == before
+    # The game message still got its buttons
+    buttons = discord_api.responses[0]['data']['components'][0]['components']
+    assert [b['custom_id'] for b in buttons] == ['betterwordle:guess', 'betterwordle:give_up']
+
+
+
+async def start_game(app, discord_api, user_id):
+    command = discord_api.command("betterwordle", user_id)
+    await app.betterwordle.callback(command)
+    return command, app.active_games.get(user_id)
+
+
+async def submit(app, discord_api, game, command, word):
+    modal = app.GuessModal(game)
+    modal.guess._value = word
+    await modal.on_submit(discord_api.modal_submit(modal, command))
+
+
+def test_redelivered_guess_is_only_played_once(app, discord_api):
+
+    async def play():
+        command, game = await start_game(app, discord_api, 4202)
+        answered = len(discord_api.responses)
+        modal = app.GuessModal(game)
+        modal.guess._value = "crane" if game.answer != "crane" else "slate"
+        interaction = discord_api.modal_submit(modal, command)
+        await modal.on_submit(interaction)
+        await modal.on_submit(interaction)  # Gateway delivered it again
+        return game, answered
+
+    game, answered = asyncio.run(play())
+    assert game.num_guesses == 1
+    assert len(discord_api.responses) == answered + 1
+
+
+def test_concurrent_submits_finish_the_game_once(app, discord_api, monkeypatch):
+    added = []
+    add_result = app.storage.add_result
+
+    async def counting_add_result(*args):
+        added.append(args)
+        await asyncio.sleep(0.01)  # A slow save, for the other submit to run into
+        return await add_result(*args)
+
+    monkeypatch.setattr(app.storage, 'add_result', counting_add_result)
+
+    async def play():
+        command, game = await start_game(app, discord_api, 4203)
+        # Two guess boxes open on the same game, both submitted with the answer at once
+        await asyncio.gather(submit(app, discord_api, game, command, game.answer),
+                             submit(app, discord_api, game, command, game.answer))
+        return game
+
+    game = asyncio.run(play())
+    assert game.num_guesses == 1 and game.won
+    assert len(added) == 1
+    # The second submit waited for the first to finish before answering
+    winning, repeat = discord_api.responses[-2:]
+    assert winning['data']['embeds']
+    assert "already over" in repeat['data']['content']
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+class UsernameResolver:
+    """Finds display names for user ids without a REST call per user
+
+    Lookup order: the TTL/LRU cache, the guild's member cache, the names
+    stored with each player's daily results, and only then the Discord API,
+    in bounded parallel batches.
+    """
+
+    def __init__(self, bot, storage, ttl=3600, max_size=50000, concurrency=8):
+        self.bot = bot
+        self.storage = storage
+        self.ttl = ttl
+        self.max_size = max_size
+        self.concurrency = concurrency
+        self._cache = OrderedDict()  # (guild_id, user_id) -> (name, expires at)
+
+    def remember(self, guild_id, user_id, name):
+        key = (str(guild_id), str(user_id))
+        self._cache[key] = (name, time.monotonic() + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def _cached(self, guild_id, user_id):
+        key = (guild_id, user_id)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry[0]
+
+    async def lookup(self, guild, guild_id, user_ids):
+        """Resolve names without any Discord API calls, returning (names, missing user ids)"""
+        guild_id = str(guild_id)
+        names = {}
+        missing = []
+        for user_id in user_ids:
+            name = self._cached(guild_id, user_id)
+            if name is None and guild is not None:
+                member = guild.get_member(int(user_id))
+                if member is not None:
+                    name = member.display_name
+                    self.remember(guild_id, user_id, name)
+            if name is None:
+                missing.append(user_id)
+            else:
+                names[user_id] = name
+
+        if missing:
+            stored = await self.storage.known_usernames(guild_id, missing)
+            for user_id, name in stored.items():
+                names[user_id] = name
+                self.remember(guild_id, user_id, name)
+            missing = [user_id for user_id in missing if user_id not in stored]
+        return names, missing
+
+    async def fetch(self, guild_id, user_ids):
+        """Fetch names from the Discord API, a few at a time"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_one(user_id):
+            async with semaphore:
+                try:
+                    user = await self.bot.fetch_user(int(user_id))
+                    name = user.display_name
+                    self.remember(guild_id, user_id, name)
+                    return user_id, name
+                except Exception:
+                    return user_id, f"User {user_id[:8]}"
+
+        return dict(await asyncio.gather(*(fetch_one(user_id) for user_id in user_ids)))
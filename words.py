@@ -0,0 +1,234 @@
+import mmap
+import os
+import struct
+from array import array
+
+from feedback import word_list_digest
+
+# word_index.bin layout, after the header:
+#   every allowed word, sorted, as 5-byte records
+#   the word id of each answer, in answer list order (uint16)
+#   the answer position of each word id, 0xFFFF if it isn't an answer (uint16)
+#   a hash table of word id + 1 (uint16, 0 = empty slot): a record's slot is its
+#   big-endian value modulo the slot count, moving on to the next slot when taken
+_MAGIC = b"WRDIDX3\0"
+# magic, words, answers, hash slots, answers file size and mtime, guesses file size and mtime, word list digest
+_HEADER = struct.Struct("<8sIIIQqQq20s")
+_NOT_ANSWER = 0xFFFF
+
+
+def _is_word(word):
+    return len(word) == 5 and word.isascii() and word.isalpha()
+
+
+def _slot_count(words):
+    """Smallest prime at least twice the word count, so probes stay short and spread over every slot"""
+    n = max(3, 2 * words + 1)
+    while any(n % d == 0 for d in range(2, int(n ** 0.5) + 1)):
+        n += 1
+    return n
+
+
+class _WordList:
+    """Read-only list of words backed by the index"""
+
+    def __init__(self, index, ids=None):
+        self._index = index
+        self._ids = ids  # answer position -> word id, or None for all words
+
+    def __len__(self):
+        return self._index.answer_count if self._ids is not None else self._index.word_count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._index.word(self._ids[i] if self._ids is not None else i)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __contains__(self, word):
+        return self._index.is_answer(word) if self._ids is not None else word in self._index
+
+
+class _WordIds:
+    """Read-only word -> id mapping backed by the index"""
+
+    def __init__(self, index, answers=False):
+        self._index = index
+        self._answers = answers
+
+    def get(self, word, default=None):
+        word_id = self._index.word_id(word)
+        if word_id is not None and self._answers:
+            word_id = self._index.answer_position(word_id)
+        return default if word_id is None else word_id
+
+    def __getitem__(self, word):
+        word_id = self.get(word)
+        if word_id is None:
+            raise KeyError(word)
+        return word_id
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+
+class WordIndex:
+    """Answer and allowed-guess lists packed into one memory-mapped file
+
+    Nothing is decoded when the index is opened. The word lists read their
+    words from the mapped records, and word -> id lookups go through the
+    hash table stored in the file. The index is rebuilt when the text files'
+    size or modification time no longer match the ones it was built from; if
+    it can't be written, the freshly built index is used from memory instead.
+    """
+
+    def __init__(self, path, answers_path, guesses_path):
+        self.path = path
+        self.answers_path = answers_path
+        self.guesses_path = guesses_path
+        self.word_count = 0
+        self.answer_count = 0
+        self.digest = None
+        self._file = None
+        self._data = None
+        self._answer_ids = None
+        self._answer_positions = None
+        self._slots = None
+        self.guesses = _WordList(self)  # every allowed word, sorted; ids match the feedback table
+        self.answers = None
+        self.guess_index = _WordIds(self)  # word -> id
+        self.answer_index = _WordIds(self, answers=True)  # answer -> position in the answer list
+
+    def _source_stats(self):
+        """(size, mtime_ns) of each text file, or None if they aren't there"""
+        try:
+            stats = [os.stat(path) for path in (self.answers_path, self.guesses_path)]
+        except FileNotFoundError:
+            return None
+        return tuple(value for st in stats for value in (st.st_size, st.st_mtime_ns))
+
+    def open(self):
+        """Map the index, rebuilding it first if missing or stale"""
+        source = self._source_stats()
+        if self._load(source):
+            return self
+        if source is None:
+            raise FileNotFoundError(f"No word lists and no usable {self.path}")
+        data = self.build(source)
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save word index, using it from memory: {e}")
+        if not self._load(source):
+            self._use(data)
+        return self
+
+    def _load(self, source):
+        if not os.path.exists(self.path):
+            return False
+        f = open(self.path, 'rb')
+        header = f.read(_HEADER.size)
+        if len(header) != _HEADER.size:
+            f.close()
+            return False
+        magic, words, answers, slots, *built_from, _ = _HEADER.unpack(header)
+        size = _HEADER.size + words * 7 + answers * 2 + slots * 2
+        if magic != _MAGIC or os.fstat(f.fileno()).st_size != size or (source is not None and tuple(built_from) != source):
+            f.close()
+            return False
+        self._file = f
+        self._use(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return True
+
+    def _use(self, data):
+        _, self.word_count, self.answer_count, slots, _, _, _, _, self.digest = _HEADER.unpack_from(data)
+        self._data = data
+        view = memoryview(data)
+        start = _HEADER.size + self.word_count * 5
+        self._answer_ids = view[start:start + self.answer_count * 2].cast('H')
+        start += self.answer_count * 2
+        self._answer_positions = view[start:start + self.word_count * 2].cast('H')
+        start += self.word_count * 2
+        self._slots = view[start:start + slots * 2].cast('H')
+        view.release()
+        self.answers = _WordList(self, self._answer_ids)
+
+    def build(self, source=None):
+        """Pack the text files into index bytes; source is their _source_stats() from before reading them"""
+        if source is None:
+            source = self._source_stats()
+        with open(self.answers_path) as f:
+            answers = [word for word in (line.strip().lower() for line in f) if _is_word(word)]
+        with open(self.guesses_path) as f:
+            words = sorted(set(word for word in (line.strip().lower() for line in f) if _is_word(word)) | set(answers))
+        word_ids = {w: i for i, w in enumerate(words)}
+        records = "".join(words).encode('ascii')
+        answer_ids = array('H', (word_ids[w] for w in answers))
+        answer_positions = array('H', [_NOT_ANSWER]) * len(words)
+        for position, word_id in enumerate(answer_ids):
+            answer_positions[word_id] = position
+        slots = array('H', [0]) * _slot_count(len(words))
+        for word_id in range(len(words)):
+            slot = int.from_bytes(records[word_id * 5:word_id * 5 + 5], 'big') % len(slots)
+            while slots[slot]:
+                slot = (slot + 1) % len(slots)
+            slots[slot] = word_id + 1
+
+        header = _HEADER.pack(_MAGIC, len(words), len(answers), len(slots), *source, word_list_digest(words, answers))
+        return header + records + answer_ids.tobytes() + answer_positions.tobytes() + slots.tobytes()
+
+    def word(self, word_id):
+        start = _HEADER.size + word_id * 5
+        return self._data[start:start + 5].decode('ascii')
+
+    def word_id(self, word):
+        """Get a word's id, or None if it isn't allowed"""
+        try:
+            record = word.encode('ascii')
+        except (AttributeError, UnicodeEncodeError):
+            return None
+        if len(record) != 5:
+            return None
+        slots = self._slots
+        slot = int.from_bytes(record, 'big') % len(slots)
+        while True:
+            word_id = slots[slot] - 1
+            if word_id < 0:
+                return None
+            start = _HEADER.size + word_id * 5
+            if self._data[start:start + 5] == record:
+                return word_id
+            slot = slot + 1 if slot + 1 < len(slots) else 0
+
+    def answer_position(self, word_id):
+        """Get a word's position in the answer list, or None if it isn't an answer"""
+        position = self._answer_positions[word_id]
+        return None if position == _NOT_ANSWER else position
+
+    def is_answer(self, word):
+        word_id = self.word_id(word)
+        return word_id is not None and self._answer_positions[word_id] != _NOT_ANSWER
+
+    def __contains__(self, word):
+        return self.word_id(word) is not None
+
+    def close(self):
+        if self._file is not None:
+            for view in (self._answer_ids, self._answer_positions, self._slots):
+                view.release()
+            self._data.close()
+            self._file.close()
+            self._file = None
+
+
+if __name__ == "__main__":
+    # python words.py - prebuild the word index before deploying
+    index = WordIndex("word_index.bin", "wordle-answers-alphabetical.txt", "wordle-allowed-guesses.txt").open()
+    print(f"Word index has {index.word_count} words, {index.answer_count} answers")